@@ -7,3 +7,4 @@
 def load_aci_arguments(self, _):
     with self.argument_context('container app up') as c:
         c.argument('repository', options_list=['--repository'])
+        c.argument('webhook_port', type=int)
@@ -9,15 +9,18 @@ from knack.log import get_logger
 from azext_deploy_to_azure.dev.common.git import resolve_repository
 from azext_deploy_to_azure.dev.common.github_api_helper import (Files, get_work_flow_check_runID,
                                                                 push_files_to_repository,
-                                                                get_languages_for_repo,
-                                                                get_github_pat_token,
-                                                                get_default_branch,
-                                                                check_file_exists)
-from azext_deploy_to_azure.dev.common.github_workflow_helper import poll_workflow_status, get_new_workflow_yaml_name
+                                                                get_github_pat_token)
+from azext_deploy_to_azure.dev.common.preflight import run_repo_preflight
+from azext_deploy_to_azure.dev.common.templates import compile_template
+from azext_deploy_to_azure.dev.common.azure_cli_resources import (set_account_context, prefetch_resource_inventories,
+                                                                  ACR_INVENTORY, GROUP_INVENTORY)
+from azext_deploy_to_azure.dev.common.github_workflow_helper import poll_workflow_status, resolve_workflow_yaml_path
 from azext_deploy_to_azure.dev.common.github_azure_secrets import get_azure_credentials
 from azext_deploy_to_azure.dev.common.const import (CHECKIN_MESSAGE_ACI, APP_NAME_PLACEHOLDER,
                                                     ACR_PLACEHOLDER, RG_PLACEHOLDER, PORT_NUMBER_DEFAULT,
-                                                    PORT_NUMBER_PLACEHOLDER, LOCATION_PLACEHOLDER)
+                                                    PORT_NUMBER_PLACEHOLDER, LOCATION_PLACEHOLDER,
+                                                    GITHUB_WORKFLOW_PATH, WORKFLOW_FILE_NAME, DOCKERFILE_PATH,
+                                                    WORKFLOW_JOB_NAME)
 from azext_deploy_to_azure.dev.aks.docker_helm_template import get_docker_templates
 
 logger = get_logger(__name__)
@@ -25,8 +28,8 @@ aci_token_prefix = "AciUpCLIExt_"
 
 
 # pylint: disable=too-many-statements
-def aci_up(acr=None, repository=None, port=None, branch_name=None,
-           do_not_wait=False):
+def aci_up(cmd, acr=None, repository=None, port=None, branch_name=None,
+           do_not_wait=False, webhook_url=None, webhook_port=None, refresh=False):
     """Build and Deploy to Azure Container Instances using GitHub Actions
     :param acr: Name of the Azure Container Registry to be used for pushing the image
     :type acr: string
@@ -38,13 +41,27 @@ def aci_up(acr=None, repository=None, port=None, branch_name=None,
     :type branch_name: str
     :param do_not_wait: Do not wait for workflow completion
     :type do_not_wait: bool
+    :param webhook_url: Public URL of a tunnel forwarding to webhook_port, to be notified of workflow completion
+    :type webhook_url: str
+    :param webhook_port: Local port on which to receive the workflow webhook events. Default is 8787
+    :type webhook_port: int
+    :param refresh: List the Azure resources again instead of using the cached lists.
+    :type refresh: bool
     """
     # TODO: Use the ACI Deploy Action when Published
+    # --subscription selects the subscription, otherwise the default one is used
+    set_account_context(cmd.cli_ctx.data.get('subscription_id'))
+    # list the Azure resources in the background while the repository is set up
+    prefetch_resource_inventories([ACR_INVENTORY, GROUP_INVENTORY], refresh=refresh, names={ACR_INVENTORY: acr},
+                                  cli_ctx=cmd.cli_ctx)
     repo_name, repository = resolve_repository(repository)
 
     get_github_pat_token(token_prefix=aci_token_prefix + repo_name, display_warning=True)
     logger.warning("Setting up your workflow")
-    languages = get_languages_for_repo(repo_name)
+    repo_context = run_repo_preflight(repo_name,
+                                      file_paths=[GITHUB_WORKFLOW_PATH + WORKFLOW_FILE_NAME, DOCKERFILE_PATH],
+                                      list_secrets=True)
+    languages = repo_context.languages
     if not languages:
         raise CLIError("Language detection failed for this repository")
 
@@ -55,7 +72,7 @@ def aci_up(acr=None, repository=None, port=None, branch_name=None,
         logger.debug('Languages detected: %s', languages)
         raise CLIError("The language in this repository are not yet supported from up command.")
 
-    from azext_deploy_to_azure.dev.common.azure_cli_resources import get_acr_details
+    from azext_deploy_to_azure.dev.common.azure_cli_resources import get_acr_details, wait_for_provisioning
     acr_details = get_acr_details(acr)
     logger.debug(acr_details)
     print('')
@@ -63,7 +80,7 @@ def aci_up(acr=None, repository=None, port=None, branch_name=None,
     files = []
     if port is None:
         port = PORT_NUMBER_DEFAULT
-    if 'Dockerfile' not in languages.keys():
+    if 'Dockerfile' not in languages.keys() and not repo_context.file_exists(DOCKERFILE_PATH):
         # check in Dockerfile and Dockerignore
         docker_files = get_docker_templates(language, port)
         if docker_files:
@@ -71,38 +88,54 @@ def aci_up(acr=None, repository=None, port=None, branch_name=None,
     else:
         logger.warning('Using the Dockerfile found in repository %s', repo_name)
 
-    # create Azure Service Principal and display JSON on the screen for the user to configure it as GitHub Secrets
-    get_azure_credentials(repo_name)
+    create_deployment_credentials(repo_name, acr_details, repo_context)
 
     print('')
-    workflow_files = get_yaml_template_for_repo(acr_details, repo_name, port)
+    workflow_files = get_yaml_template_for_repo(acr_details, repo_context, port)
     if workflow_files:
         files = files + workflow_files
 
     # File checkin
     for file_name in files:
-        logger.debug("Checkin file path: %s", file_name.path)
-        logger.debug("Checkin file content: %s", file_name.content)
+        logger.debug("Checkin file %s: %s", file_name.path, file_name.get_digest())
 
-    default_branch = get_default_branch(repo_name)
+    # the pushed workflow pushes to the registry, a new registry has to be ready by then
+    wait_for_provisioning()
     workflow_commit_sha = push_files_to_repository(
-        repo_name=repo_name, default_branch=default_branch, files=files,
+        repo_name=repo_name, default_branch=repo_context.default_branch, files=files,
         branch_name=branch_name, message=CHECKIN_MESSAGE_ACI
     )
     if workflow_commit_sha:
-        print('Creating workflow...')
-        check_run_id = get_work_flow_check_runID(repo_name, workflow_commit_sha)
-        workflow_url = 'https://github.com/{repo_id}/runs/{checkID}'.format(repo_id=repo_name,
-                                                                            checkID=check_run_id)
-        print('GitHub Action Workflow has been created - {}'.format(workflow_url))
+        wait_for_deployment(repo_name, workflow_commit_sha, acr_details, port, do_not_wait=do_not_wait,
+                            webhook_url=webhook_url, webhook_port=webhook_port)
 
-        if not do_not_wait:
-            poll_workflow_status(repo_name, check_run_id)
-            list_name = repo_name.split("/")
-            app_name = list_name[1].lower()
-            app_url = get_app_url(acr_details, app_name)
-            app_url_with_port = app_url + ":" + port + "/"
-            print('Your app is deployed at: ', app_url_with_port)
+
+def create_deployment_credentials(repo_name, acr_details, repo_context):
+    """ Creates the Azure Service Principal of the workflow and stores its credentials in the GitHub Secrets.
+    The container group is deployed to the resource group of the registry.
+    """
+    from azext_deploy_to_azure.dev.common.azure_cli_resources import get_resource_group_scope
+    get_azure_credentials(repo_name, acr_details['name'], [get_resource_group_scope(acr_details['resourceGroup'])],
+                          repo_context)
+
+
+def wait_for_deployment(repo_name, workflow_commit_sha, acr_details, port, do_not_wait=False, webhook_url=None,
+                        webhook_port=None):
+    """ Finds the workflow run of the commit, waits for it to complete and prints the address of the app.
+    """
+    print('Creating workflow...')
+    check_run_id = get_work_flow_check_runID(repo_name, workflow_commit_sha, check_name=WORKFLOW_JOB_NAME)
+    workflow_url = 'https://github.com/{repo_id}/runs/{checkID}'.format(repo_id=repo_name,
+                                                                        checkID=check_run_id)
+    print('GitHub Action Workflow has been created - {}'.format(workflow_url))
+
+    if not do_not_wait:
+        poll_workflow_status(repo_name, check_run_id, webhook_url=webhook_url, webhook_port=webhook_port)
+        list_name = repo_name.split("/")
+        app_name = list_name[1].lower()
+        app_url = get_app_url(acr_details, app_name)
+        app_url_with_port = app_url + ":" + port + "/"
+        print('Your app is deployed at: ', app_url_with_port)
 
 
 def choose_supported_language(languages):
@@ -118,34 +151,32 @@ def choose_supported_language(languages):
     return None
 
 
-def get_yaml_template_for_repo(acr_details, repo_name, port):
+def get_yaml_template_for_repo(acr_details, repo_context, port):
     files_to_return = []
-    github_workflow_path = '.github/workflows/'
-    yaml_file_name = 'main.yml'
-    workflow_yaml = github_workflow_path + yaml_file_name
-    list_name = repo_name.split("/")
+    workflow_yaml = GITHUB_WORKFLOW_PATH + WORKFLOW_FILE_NAME
+    list_name = repo_context.repo_name.split("/")
     app_name = list_name[1].lower()
-    if check_file_exists(repo_name, workflow_yaml):
-        yaml_file_name = get_new_workflow_yaml_name()
-        workflow_yaml = github_workflow_path + yaml_file_name
     from azext_deploy_to_azure.dev.resources.resourcefiles import DEPLOY_TO_ACI_TEMPLATE
-    files_to_return.append(Files(path=workflow_yaml,
-                                 content=DEPLOY_TO_ACI_TEMPLATE
-                                 .replace(APP_NAME_PLACEHOLDER, app_name)
-                                 .replace(ACR_PLACEHOLDER, acr_details['name'])
-                                 .replace(RG_PLACEHOLDER, acr_details['resourceGroup'])
-                                 .replace(LOCATION_PLACEHOLDER, acr_details['location'])
-                                 .replace(PORT_NUMBER_PLACEHOLDER, port)))
+    workflow_file = Files(path=workflow_yaml,
+                          template=compile_template(DEPLOY_TO_ACI_TEMPLATE), values={
+                              APP_NAME_PLACEHOLDER: app_name,
+                              ACR_PLACEHOLDER: acr_details['name'],
+                              RG_PLACEHOLDER: acr_details['resourceGroup'],
+                              LOCATION_PLACEHOLDER: acr_details['location'],
+                              PORT_NUMBER_PLACEHOLDER: port})
+    files_to_return.append(resolve_workflow_yaml_path(repo_context, workflow_file))
     return files_to_return
 
 
 def get_app_url(acr_details, app_name):
-    import subprocess as sb
+    from azext_deploy_to_azure.dev.common.azure_cli_resources import invoke_az_command, get_account_context
     resource_group = acr_details['resourceGroup']
-    url_find_command = 'az container show \
-        --name {app_name} --resource-group {resource_group_name} \
-        --query ipAddress.fqdn -o json'.format(app_name=app_name, resource_group_name=resource_group)
-    url_result = sb.check_output(url_find_command, shell=True)
-    url_result = url_result.decode().strip().lstrip('\"').rstrip('\"')
-    app_url = "http://" + url_result
+    container_group = invoke_az_command(['container', 'show', '--name', app_name, '--resource-group', resource_group] +
+                                        get_account_context().get_subscription_args())
+    fqdn = (container_group.get('ipAddress') or {}).get('fqdn')
+    if not fqdn:
+        message = ('The container group {name} has no public DNS name. Check its IP address settings with '
+                   '`az container show --name {name} --resource-group {group}`.')
+        raise CLIError(message.format(name=app_name, group=resource_group))
+    app_url = "http://" + fqdn
     return app_url
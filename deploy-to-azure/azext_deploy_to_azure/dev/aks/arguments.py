@@ -7,3 +7,4 @@
 def load_aks_arguments(self, _):
     with self.argument_context('aks app up') as context:
         context.argument('repository', options_list=('--repository', '-r'))
+        context.argument('webhook_port', type=int)
@@ -9,16 +9,19 @@ from knack.util import CLIError
 from azext_deploy_to_azure.dev.common.git import resolve_repository
 from azext_deploy_to_azure.dev.common.github_api_helper import (Files, get_work_flow_check_runID,
                                                                 push_files_to_repository,
-                                                                get_languages_for_repo,
-                                                                get_github_pat_token,
-                                                                get_default_branch,
-                                                                check_file_exists)
-from azext_deploy_to_azure.dev.common.github_workflow_helper import poll_workflow_status, get_new_workflow_yaml_name
+                                                                get_github_pat_token)
+from azext_deploy_to_azure.dev.common.preflight import run_repo_preflight
+from azext_deploy_to_azure.dev.common.templates import compile_template
+from azext_deploy_to_azure.dev.common.azure_cli_resources import (set_account_context, prefetch_resource_inventories,
+                                                                  AKS_INVENTORY, ACR_INVENTORY, GROUP_INVENTORY)
+from azext_deploy_to_azure.dev.common.github_workflow_helper import poll_workflow_status, resolve_workflow_yaml_path
 from azext_deploy_to_azure.dev.common.github_azure_secrets import get_azure_credentials
-from azext_deploy_to_azure.dev.common.kubectl import get_deployment_IP_port
+from azext_deploy_to_azure.dev.common.kubectl import get_service_endpoints
 from azext_deploy_to_azure.dev.common.const import (CHECKIN_MESSAGE_AKS, APP_NAME_DEFAULT, APP_NAME_PLACEHOLDER,
                                                     ACR_PLACEHOLDER, RG_PLACEHOLDER, PORT_NUMBER_DEFAULT,
-                                                    CLUSTER_PLACEHOLDER, RELEASE_PLACEHOLDER, RELEASE_NAME)
+                                                    CLUSTER_PLACEHOLDER, RELEASE_PLACEHOLDER, RELEASE_NAME,
+                                                    GITHUB_WORKFLOW_PATH, WORKFLOW_FILE_NAME, DOCKERFILE_PATH,
+                                                    AKS_WORKFLOW_JOB_NAME)
 from azext_deploy_to_azure.dev.aks.docker_helm_template import get_docker_templates, get_helm_charts
 
 logger = get_logger(__name__)
@@ -26,8 +29,8 @@ aks_token_prefix = "AksAppUpCLIExt_"
 
 
 # pylint: disable=too-many-statements
-def aks_deploy(aks_cluster=None, acr=None, repository=None, port=None, branch_name=None,
-               do_not_wait=False):
+def aks_deploy(cmd, aks_cluster=None, acr=None, repository=None, port=None, branch_name=None,
+               do_not_wait=False, webhook_url=None, webhook_port=None, refresh=False):
     """Build and Deploy to AKS via GitHub actions
     :param aks_cluster: Name of the cluster to select for deployment.
     :type aks_cluster: str
@@ -41,12 +44,26 @@ def aks_deploy(aks_cluster=None, acr=None, repository=None, port=None, branch_na
     :type branch_name:str
     :param do_not_wait : Do not wait for workflow completion.
     :type do_not_wait bool
+    :param webhook_url: Public URL of a tunnel forwarding to webhook_port, to be notified of workflow completion.
+    :type webhook_url: str
+    :param webhook_port: Local port on which to receive the workflow webhook events. Default is 8787
+    :type webhook_port: int
+    :param refresh: List the Azure resources again instead of using the cached lists.
+    :type refresh: bool
     """
+    # --subscription selects the subscription, otherwise the default one is used
+    set_account_context(cmd.cli_ctx.data.get('subscription_id'))
+    # list the Azure resources in the background while the repository is set up
+    prefetch_resource_inventories([AKS_INVENTORY, ACR_INVENTORY, GROUP_INVENTORY], refresh=refresh,
+                                  names={AKS_INVENTORY: aks_cluster, ACR_INVENTORY: acr}, cli_ctx=cmd.cli_ctx)
     repo_name, repository = resolve_repository(repository)
 
     get_github_pat_token(token_prefix=aks_token_prefix + repo_name, display_warning=True)
     logger.warning('Setting up your workflow.')
-    languages = get_languages_for_repo(repo_name)
+    repo_context = run_repo_preflight(repo_name,
+                                      file_paths=[GITHUB_WORKFLOW_PATH + WORKFLOW_FILE_NAME, DOCKERFILE_PATH],
+                                      list_secrets=True)
+    languages = repo_context.languages
     if not languages:
         raise CLIError('Language detection failed for this repository.')
 
@@ -59,7 +76,7 @@ def aks_deploy(aks_cluster=None, acr=None, repository=None, port=None, branch_na
 
     from azext_deploy_to_azure.dev.common.azure_cli_resources import (get_aks_details,
                                                                       get_acr_details,
-                                                                      configure_aks_credentials)
+                                                                      wait_for_provisioning)
     cluster_details = get_aks_details(aks_cluster)
     logger.debug(cluster_details)
     acr_details = get_acr_details(acr)
@@ -69,7 +86,7 @@ def aks_deploy(aks_cluster=None, acr=None, repository=None, port=None, branch_na
     files = []
     if port is None:
         port = PORT_NUMBER_DEFAULT
-    if 'Dockerfile' not in languages.keys():
+    if 'Dockerfile' not in languages.keys() and not repo_context.file_exists(DOCKERFILE_PATH):
         # check in docker file and docker ignore
         docker_files = get_docker_templates(language, port)
         if docker_files:
@@ -83,54 +100,77 @@ def aks_deploy(aks_cluster=None, acr=None, repository=None, port=None, branch_na
         if helm_charts:
             files = files + helm_charts
 
-    # create azure service principal and display json on the screen for user to configure it as Github secrets
-    get_azure_credentials(repo_name)
+    create_deployment_credentials(repo_name, cluster_details, acr_details, repo_context)
 
     print('')
-    workflow_files = get_yaml_template_for_repo(cluster_details, acr_details, repo_name)
+    workflow_files = get_yaml_template_for_repo(cluster_details, acr_details, repo_context)
     if workflow_files:
         files = files + workflow_files
 
     # File checkin
     for file_name in files:
-        logger.debug("Checkin file path: %s", file_name.path)
-        logger.debug("Checkin file content: %s", file_name.content)
+        logger.debug("Checkin file %s: %s", file_name.path, file_name.get_digest())
 
-    default_branch = get_default_branch(repo_name)
+    # the pushed workflow deploys to the cluster, new resources have to be ready by then
+    wait_for_provisioning()
     workflow_commit_sha = push_files_to_repository(
-        repo_name=repo_name, default_branch=default_branch, files=files,
+        repo_name=repo_name, default_branch=repo_context.default_branch, files=files,
         branch_name=branch_name, message=CHECKIN_MESSAGE_AKS)
     if workflow_commit_sha:
-        print('Creating workflow...')
-        check_run_id = get_work_flow_check_runID(repo_name, workflow_commit_sha)
-        workflow_url = 'https://github.com/{repo_id}/runs/{checkID}'.format(repo_id=repo_name,
-                                                                            checkID=check_run_id)
-        print('GitHub Action workflow has been created - {}'.format(workflow_url))
-
-        if not do_not_wait:
-            poll_workflow_status(repo_name, check_run_id)
+        wait_for_deployment(repo_name, workflow_commit_sha, cluster_details, do_not_wait=do_not_wait,
+                            webhook_url=webhook_url, webhook_port=webhook_port)
+
+
+def create_deployment_credentials(repo_name, cluster_details, acr_details, repo_context):
+    """ Creates the azure service principal of the workflow, with access to the cluster and the registry,
+    and stores its credentials in the repository secrets.
+    """
+    from azext_deploy_to_azure.dev.common.azure_cli_resources import get_role_assignment_scope
+    get_azure_credentials(repo_name, cluster_details['name'], [get_role_assignment_scope(cluster_details),
+                                                               get_role_assignment_scope(acr_details)],
+                          repo_context)
+
+
+def wait_for_deployment(repo_name, workflow_commit_sha, cluster_details, do_not_wait=False, webhook_url=None,
+                        webhook_port=None):
+    """ Finds the workflow run of the commit, waits for it to complete and prints the addresses of the app.
+    """
+    from azext_deploy_to_azure.dev.common.azure_cli_resources import (configure_aks_credentials,
+                                                                      get_aks_kubernetes_client)
+    print('Creating workflow...')
+    check_run_id = get_work_flow_check_runID(repo_name, workflow_commit_sha, check_name=AKS_WORKFLOW_JOB_NAME)
+    workflow_url = 'https://github.com/{repo_id}/runs/{checkID}'.format(repo_id=repo_name,
+                                                                        checkID=check_run_id)
+    print('GitHub Action workflow has been created - {}'.format(workflow_url))
+
+    if not do_not_wait:
+        poll_workflow_status(repo_name, check_run_id, webhook_url=webhook_url, webhook_port=webhook_port)
+        kubernetes_client = get_aks_kubernetes_client(cluster_details['name'], cluster_details['resourceGroup'])
+        if kubernetes_client is None:
             configure_aks_credentials(cluster_details['name'], cluster_details['resourceGroup'])
-            deployment_ip, port = get_deployment_IP_port(RELEASE_NAME, language)
-            print('Your app is deployed at: http://{ip}:{port}'.format(ip=deployment_ip, port=port))
+        try:
+            endpoints = get_service_endpoints(RELEASE_NAME, client=kubernetes_client)
+        finally:
+            if kubernetes_client is not None:
+                kubernetes_client.close()
+        for deployment_ip, ports in endpoints.values():
+            for service_port in ports:
+                print('Your app is deployed at: http://{ip}:{port}'.format(ip=deployment_ip, port=service_port))
 
 
-def get_yaml_template_for_repo(cluster_details, acr_details, repo_name):
+def get_yaml_template_for_repo(cluster_details, acr_details, repo_context):
     files_to_return = []
-    github_workflow_path = '.github/workflows/'
     # Read template file
-    yaml_file_name = 'main.yml'
-    workflow_yaml = github_workflow_path + yaml_file_name
-    if check_file_exists(repo_name, workflow_yaml):
-        yaml_file_name = get_new_workflow_yaml_name()
-        workflow_yaml = github_workflow_path + yaml_file_name
+    workflow_yaml = GITHUB_WORKFLOW_PATH + WORKFLOW_FILE_NAME
     from azext_deploy_to_azure.dev.resources.resourcefiles import DEPLOY_TO_AKS_TEMPLATE
-    files_to_return.append(Files(path=workflow_yaml,
-                                 content=DEPLOY_TO_AKS_TEMPLATE
-                                 .replace(APP_NAME_PLACEHOLDER, APP_NAME_DEFAULT)
-                                 .replace(ACR_PLACEHOLDER, acr_details['name'])
-                                 .replace(CLUSTER_PLACEHOLDER, cluster_details['name'])
-                                 .replace(RELEASE_PLACEHOLDER, RELEASE_NAME)
-                                 .replace(RG_PLACEHOLDER, cluster_details['resourceGroup'])))
+    workflow_file = Files(path=workflow_yaml,
+                          template=compile_template(DEPLOY_TO_AKS_TEMPLATE), values={
+                              APP_NAME_PLACEHOLDER: APP_NAME_DEFAULT,
+                              ACR_PLACEHOLDER: acr_details['name'],
+                              CLUSTER_PLACEHOLDER: cluster_details['name'],
+                              RELEASE_PLACEHOLDER: RELEASE_NAME,
+                              RG_PLACEHOLDER: cluster_details['resourceGroup']})
+    files_to_return.append(resolve_workflow_yaml_path(repo_context, workflow_file))
     return files_to_return
 
 
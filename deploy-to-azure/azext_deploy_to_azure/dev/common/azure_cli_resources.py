@@ -3,63 +3,505 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
-import subprocess
+import os
 import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
 from knack.log import get_logger
 from knack.util import CLIError
 from azext_deploy_to_azure.dev.common.prompting import prompt_user_friendly_choice_list, prompt_not_empty
+from azext_deploy_to_azure.dev.common.utils import singleton
+from azext_deploy_to_azure.dev.common.resource_inventory_cache import ResourceInventoryCache
+from azext_deploy_to_azure.dev.common.resource_graph import (is_resource_graph_enabled, query_resources,
+                                                             AKS_RESOURCE_TYPE, ACR_RESOURCE_TYPE,
+                                                             GROUP_RESOURCE_TYPE, FUNCTIONAPP_RESOURCE_TYPE)
 
 logger = get_logger(__name__)
 
+AKS_INVENTORY = 'aks'
+ACR_INVENTORY = 'acr'
+GROUP_INVENTORY = 'group'
+FUNCTIONAPP_INVENTORY = 'functionapp'
+PROVISIONING_TIMEOUT = 1800
+_PROVISIONING_POLL_INTERVAL = 10
+_SPINNER_INTERVAL = 0.5
+_AKS_API_VERSION = '2023-08-01'
+_ACR_API_VERSION = '2023-07-01'
+# ARM list operations of the inventories, formatted with the subscription id
+_INVENTORY_LIST_URLS = {
+    AKS_INVENTORY: ('/subscriptions/{}/providers/Microsoft.ContainerService/managedClusters?api-version=' +
+                    _AKS_API_VERSION),
+    ACR_INVENTORY: '/subscriptions/{}/providers/Microsoft.ContainerRegistry/registries?api-version=' + _ACR_API_VERSION,
+    GROUP_INVENTORY: '/subscriptions/{}/resourcegroups?api-version=2021-04-01',
+    FUNCTIONAPP_INVENTORY: '/subscriptions/{}/providers/Microsoft.Web/sites?api-version=2022-03-01',
+}
+_INVENTORY_RESOURCE_TYPES = {
+    AKS_INVENTORY: AKS_RESOURCE_TYPE,
+    ACR_INVENTORY: ACR_RESOURCE_TYPE,
+    GROUP_INVENTORY: GROUP_RESOURCE_TYPE,
+    FUNCTIONAPP_INVENTORY: FUNCTIONAPP_RESOURCE_TYPE,
+}
+
+
+class AccountContext():
+    """ AccountContext
+    Azure account the command runs against. Loaded once per invocation from the cached subscriptions.
+    :param subscription: Name or id of the subscription to use, the default subscription when None.
+    :type subscription: str
+    """
+    def __init__(self, subscription=None):
+        from azure.cli.core._profile import Profile
+        account = Profile().get_subscription(subscription)
+        self.subscription_id = account['id']
+        self.subscription_name = account['name']
+        self.tenant_id = account['tenantId']
+        self.environment_name = account['environmentName']
+        self.is_default = subscription is None
+
+    def get_display_name(self):
+        if self.is_default:
+            return 'default Azure subscription {}'.format(self.subscription_name)
+        return 'Azure subscription {}'.format(self.subscription_name)
+
+    def get_subscription_args(self):
+        """ Arguments that pin an az command to this subscription.
+        """
+        return ['--subscription', self.subscription_id]
+
+
+_ACCOUNT_CONTEXT = [None]
+# invoking the Azure CLI is not thread safe, e.g. every invocation reconfigures logging, nested invocations run one
+# at a time. Work running in the background sends ARM requests instead.
+_INVOKE_LOCK = threading.Lock()
+
+
+def set_account_context(subscription=None):
+    """ Loads the account for the rest of the command, call it when the command starts.
+    :param subscription: Name or id of the subscription given with --subscription.
+    :type subscription: str
+    :rtype: AccountContext
+    """
+    _ACCOUNT_CONTEXT[0] = AccountContext(subscription)
+    return _ACCOUNT_CONTEXT[0]
+
+
+def get_account_context():
+    if _ACCOUNT_CONTEXT[0] is None:
+        _ACCOUNT_CONTEXT[0] = AccountContext()
+    return _ACCOUNT_CONTEXT[0]
+
 
 def get_default_subscription_info():
     """
-    Returns the Id, name, tenantID and environmentName of the default subscription
-    None if no default is set or no subscription is found
+    Returns the Id, name, tenantID and environmentName of the subscription the command runs against
+    """
+    account = get_account_context()
+    return account.subscription_id, account.subscription_name, account.tenant_id, account.environment_name
+
+
+def invoke_az_command(args):
+    """ Runs an az command in the current process and returns the result `-o json` would print.
+    The extension already runs inside az, so this avoids starting a new interpreter and
+    reloading the command table for every lookup. Invocations from several threads run one at a time,
+    use list_arm_resources for listings that should run concurrently.
+    :param args: Command arguments without the leading az, e.g. ['aks', 'list'].
+    :type args: list
+    """
+    from azure.cli.core import get_default_cli
+    cli = get_default_cli()
+    logger.debug('Invoking az %s', ' '.join(args))
+    with _INVOKE_LOCK, open(os.devnull, 'w', encoding='utf-8') as devnull:
+        try:
+            exit_code = cli.invoke(list(args) + ['-o', 'none'], out_file=devnull)
+        except SystemExit as ex:
+            exit_code = ex.code
+    if exit_code:
+        error = cli.result.error if cli.result else None
+        if isinstance(error, SystemExit):
+            error = None
+        raise CLIError('Command az {} failed. {}'.format(' '.join(args), error or ''))
+    return cli.result.result
+
+
+@singleton
+class ResourceInventory():
+    """ ResourceInventory
+    Lists of the Azure resources the command may prompt for. The listings are started concurrently in
+    the background when the command starts and consumed once the prompts need them. Lists fetched
+    within the cache TTL are reused across invocations. With the Resource Graph backend enabled
+    all types are listed by a single query.
+    """
+    def __init__(self):
+        self.cache = ResourceInventoryCache()
+        self._executor = None
+        self._futures = {}
+        self._cached_types = set()
+
+    def shutdown(self):
+        """ Cancels the listings that have not started and releases the worker threads once the running
+        ones finish, call it when the command finishes.
+        """
+        for future in self._futures.values():
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def reset(self):
+        """ Shuts down and forgets the listings, the next get lists the resources again or reads them from the cache.
+        """
+        self.shutdown()
+        self._futures = {}
+        self._cached_types = set()
+
+    def prefetch(self, resource_types, refresh=False, names=None):
+        """ Starts listing the given resource types concurrently.
+        :param resource_types: Inventories to list, e.g. [AKS_INVENTORY, ACR_INVENTORY].
+        :type resource_types: list
+        :param refresh: Ignore the cached lists.
+        :type refresh: bool
+        :param names: Inventory to the resource name given on the command line. The Resource Graph
+            backend then only lists that resource.
+        :type names: dict
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(_INVENTORY_LIST_URLS))
+        resource_types = [resource_type for resource_type in resource_types if resource_type not in self._futures]
+        if not resource_types:
+            return
+        logger.debug('Prefetching the %s inventories.', ', '.join(resource_types))
+        if is_resource_graph_enabled():
+            futures = {resource_type: Future() for resource_type in resource_types}
+            self._futures.update(futures)
+            self._executor.submit(self._query_resource_graph, futures, refresh, names or {})
+            return
+        for resource_type in resource_types:
+            self._futures[resource_type] = self._executor.submit(self._list_resources, resource_type, refresh)
+
+    def get(self, resource_type, name=None):
+        """ Waits for the listing of the resource type, starting it if it was not prefetched.
+        A cached list that does not contain the named resource is listed again.
+        """
+        if resource_type not in self._futures:
+            self.prefetch([resource_type])
+        resources = self._futures[resource_type].result()
+        if resource_type in self._cached_types and not _contains_resource(resources, name):
+            logger.debug('%s is not in the cached %s inventory, listing again.', name, resource_type)
+            del self._futures[resource_type]
+            self.prefetch([resource_type], refresh=True)
+            resources = self._futures[resource_type].result()
+        return resources
+
+    def invalidate(self, resource_type):
+        """ Drops the list of the resource type, e.g. after creating a resource of that type.
+        """
+        self._futures.pop(resource_type, None)
+        account = get_account_context()
+        self.cache.invalidate(account.tenant_id, account.subscription_id, resource_type)
+
+    def _list_resources(self, resource_type, refresh):
+        account = get_account_context()
+        if not refresh:
+            resources = self.cache.get(account.tenant_id, account.subscription_id, resource_type)
+            if resources is not None:
+                logger.debug('Using the cached %s inventory.', resource_type)
+                self._cached_types.add(resource_type)
+                return resources
+        self._cached_types.discard(resource_type)
+        resources = list_arm_resources(_INVENTORY_LIST_URLS[resource_type].format(account.subscription_id))
+        if resource_type == FUNCTIONAPP_INVENTORY:
+            resources = [resource for resource in resources if 'functionapp' in (resource['kind'] or '')]
+        self.cache.put(account.tenant_id, account.subscription_id, resource_type, resources)
+        return resources
+
+    def _query_resource_graph(self, futures, refresh, names):
+        try:
+            self._resolve_from_resource_graph(futures, refresh, names)
+        except Exception as ex:  # pylint: disable=broad-except
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(ex)
+
+    def _resolve_from_resource_graph(self, futures, refresh, names):
+        account = get_account_context()
+        subscription_id, tenant_id = account.subscription_id, account.tenant_id
+        pending = dict(futures)
+        for resource_type in list(pending):
+            resources = None if refresh else self.cache.get(tenant_id, subscription_id, resource_type)
+            if resources is not None and _contains_resource(resources, names.get(resource_type)):
+                logger.debug('Using the cached %s inventory.', resource_type)
+                self._cached_types.add(resource_type)
+                pending.pop(resource_type).set_result(resources)
+        if not pending:
+            return
+        graph_names = {_INVENTORY_RESOURCE_TYPES[resource_type]: names.get(resource_type) for resource_type in pending}
+        try:
+            graph_resources = query_resources(subscription_id, list(graph_names), graph_names)
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning('Resource Graph query failed, listing the resources with the Azure CLI instead.')
+            logger.debug(ex)
+            for resource_type, future in pending.items():
+                _copy_result(self._executor.submit(self._list_resources, resource_type, refresh), future)
+            return
+        for resource_type, future in pending.items():
+            resources = graph_resources[_INVENTORY_RESOURCE_TYPES[resource_type]]
+            self._cached_types.discard(resource_type)
+            if not names.get(resource_type):
+                # a name filtered list is not the full inventory
+                self.cache.put(tenant_id, subscription_id, resource_type, resources)
+            future.set_result(resources)
+
+
+def list_arm_resources(url):
+    """ Lists the resources of an ARM list operation, following its next links. Unlike invoke_az_command
+    it can run in several threads at once.
+    :param url: Path of the list operation, e.g. /subscriptions/{id}/resourcegroups?api-version=2021-04-01.
+    :type url: str
+    :return: The resources with the properties the Resource Graph backend projects.
+    :rtype: list
+    """
+    resources = []
+    while url:
+        logger.debug('Listing %s', url)
+        result = _send_arm_request('GET', url).json()
+        resources.extend(_get_inventory_item(resource) for resource in result.get('value', []))
+        url = result.get('nextLink')
+    return resources
+
+
+def _get_inventory_item(resource):
+    properties = resource.get('properties') or {}
+    return {
+        'id': resource['id'],
+        'name': resource['name'],
+        'type': resource.get('type'),
+        'location': resource.get('location'),
+        'kind': resource.get('kind'),
+        # the resource group of a resource, or the name of a resource group
+        'resourceGroup': resource['id'].split('/')[4],
+        'defaultHostName': properties.get('defaultHostName')
+    }
+
+
+def get_resource_inventory():
+    return ResourceInventory()
+
+
+def prefetch_resource_inventories(resource_types, refresh=False, names=None, cli_ctx=None):
+    """ Starts listing the resource types in the background, see ResourceInventory.prefetch.
+    :param cli_ctx: Context of the running command, the listings and the provisioning are stopped when it
+        finishes.
     """
-    from azure.cli.core._profile import Profile
-    profile = Profile()
-    _dummy = profile.get_current_account_user()
-    subscriptions = profile.load_cached_subscriptions(False)
-    for subscription in subscriptions:
-        if subscription['isDefault']:
-            return subscription['id'], subscription['name'], subscription['tenantId'], subscription['environmentName']
-    logger.debug('Your account does not have a default Azure subscription. Please run \'az login\' to setup account.')
-    return None, None, None, None
+    if cli_ctx is not None:
+        from knack.events import EVENT_CLI_POST_EXECUTE
+        cli_ctx.register_event(EVENT_CLI_POST_EXECUTE, _stop_background_work)
+    get_resource_inventory().prefetch(resource_types, refresh=refresh, names=names)
+
+
+def _stop_background_work(_cli_ctx, **kwargs):  # pylint: disable=unused-argument
+    get_resource_inventory().shutdown()
+    stop_provisioning()
+
+
+def _contains_resource(resources, name):
+    return not name or any(name.lower() == resource['name'].lower() for resource in resources)
+
+
+def _copy_result(source, target):
+    def _on_done(done):
+        if done.exception() is not None:
+            target.set_exception(done.exception())
+        else:
+            target.set_result(done.result())
+    source.add_done_callback(_on_done)
+
+
+class ProvisioningOperation(threading.Thread):
+    """ ProvisioningOperation
+    Creation of an Azure resource running in the background. The creation returns as soon as Azure
+    accepted it and the provisioning state is polled until it succeeds or fails. The thread is not a
+    daemon, operations still running when the command ends are reported and stopped by stop_provisioning.
+    :param description: Resource being created, e.g. AKS cluster mycluster.
+    :type description: str
+    :param create: Starts the creation, without waiting for it to complete.
+    :type create: callable
+    :param show_args: az command showing the resource and its provisioningState.
+    :type show_args: list
+    :param timeout: Seconds after which a resource that can not be found yet is considered not created.
+    :type timeout: int
+    """
+    def __init__(self, description, create, show_args, timeout=PROVISIONING_TIMEOUT):
+        super().__init__()
+        self.description = description
+        self.create = create
+        self.show_args = show_args
+        self.timeout = timeout
+        self.state = 'Starting'
+        self._future = Future()
+        self._cancelled = threading.Event()
+
+    def start(self):
+        super().start()
+        return self
+
+    def cancel(self):
+        """ Stops polling the provisioning state, the creation goes on in Azure.
+        """
+        self._cancelled.set()
+
+    def done(self):
+        return self._future.done()
+
+    def result(self):
+        return self._future.result()
+
+    def run(self):
+        try:
+            deadline = time.time() + self.timeout
+            self.create()
+            while not self._future.done():
+                if self._cancelled.wait(_PROVISIONING_POLL_INTERVAL):
+                    raise CLIError('Stopped waiting for the creation of {}.'.format(self.description))
+                try:
+                    details = invoke_az_command(self.show_args)
+                except CLIError as ex:
+                    # the resource shows up some time after the creation has been accepted
+                    if not _is_not_found_error(ex) or time.time() >= deadline:
+                        raise
+                    logger.debug('%s is not found yet.', self.description)
+                    continue
+                self._set_state(details)
+        except Exception as ex:  # pylint: disable=broad-except
+            self._future.set_exception(ex)
+
+    def _set_state(self, details):
+        self.state = (details or {}).get('provisioningState') or self.state
+        if self.state == 'Succeeded':
+            self._future.set_result(details)
+        elif self.state in ('Failed', 'Canceled'):
+            raise CLIError('Creating {} failed with provisioning state {}.'.format(self.description, self.state))
+
+
+_PENDING_OPERATIONS = []
+
+
+def _is_not_found_error(error):
+    message = str(error)
+    return 'ResourceNotFound' in message or 'was not found' in message or 'could not be found' in message
+
+
+def wait_for_provisioning(timeout=PROVISIONING_TIMEOUT):
+    """ Waits for the resources being created in the background, showing the state of each.
+    Raises a CLIError if a creation failed or did not finish within timeout seconds.
+    """
+    import colorama
+    import humanfriendly
+    deadline = time.time() + timeout
+    while _PENDING_OPERATIONS:
+        operation = _PENDING_OPERATIONS[0]
+        if not operation.done():
+            colorama.init()
+            try:
+                with humanfriendly.Spinner(label='Waiting for the creation of {}'.format(  # pylint: disable=no-member
+                        operation.description)) as spinner:
+                    while not operation.done():
+                        if time.time() >= deadline:
+                            raise CLIError('Creation of {} did not complete within {} seconds.'.format(
+                                operation.description, timeout))
+                        spinner.label = 'Waiting for the creation of {} ({})'.format(
+                            operation.description, operation.state)
+                        spinner.step()
+                        time.sleep(_SPINNER_INTERVAL)
+            finally:
+                colorama.deinit()
+        # an operation that failed stays pending, stop_provisioning joins its thread
+        operation.result()
+        _PENDING_OPERATIONS.pop(0).join()
+        print('Created {}.'.format(operation.description))
+
+
+def stop_provisioning():
+    """ Stops waiting for the resources still being created, e.g. when the command failed before
+    wait_for_provisioning, and reports them as they may be left half created.
+    """
+    while _PENDING_OPERATIONS:
+        operation = _PENDING_OPERATIONS.pop(0)
+        if not operation.done():
+            logger.warning('The creation of %s was still in progress when the command ended. It may go on in '
+                           'Azure, check its provisioning state before running the command again.',
+                           operation.description)
+        operation.cancel()
+        operation.join()
 
 
 def create_aks_cluster(cluster_name, resource_group):
-    _subscription_id, subscription_name, _tenant_id, _environment_name = get_default_subscription_info()
-    logger.warning('Using your default Azure subscription %s for creating new AKS cluster. '
-                   'This may take several minutes', subscription_name)
-    try:
-        aks_create = subprocess.check_output(('az aks create --name {cluster_name} -g {group_name} -o json').format(
-            cluster_name=cluster_name, group_name=resource_group), shell=True)
-        aks_create_json = json.loads(aks_create)
-        return aks_create_json
-    except Exception as ex:
-        raise CLIError(ex)
+    """ Starts creating the cluster in the background and returns its name and resource group.
+    Call wait_for_provisioning before using the cluster.
+    """
+    account = get_account_context()
+    logger.warning('Using your %s for creating new AKS cluster. '
+                   'It is created in the background while the workflow is set up', account.get_display_name())
+    subscription_args = account.get_subscription_args()
+    create_args = ['aks', 'create', '--name', cluster_name, '-g', resource_group, '--no-wait'] + subscription_args
+    _start_provisioning('AKS cluster {}'.format(cluster_name), lambda: invoke_az_command(create_args),
+                        ['aks', 'show', '--name', cluster_name, '-g', resource_group] + subscription_args)
+    get_resource_inventory().invalidate(AKS_INVENTORY)
+    return {'name': cluster_name, 'resourceGroup': resource_group}
 
 
 def create_acr(registry_name, resource_group, sku):
-    _subscription_id, subscription_name, _tenant_id, _environment_name = get_default_subscription_info()
-    logger.warning('Using your default Azure subscription %s for creating new Azure Container Registry.',
-                   subscription_name)
-    try:
-        acr_create = subprocess.check_output(
-            ('az acr create --name {acr_name} --sku {sku} -g {group_name} -o json')
-            .format(acr_name=registry_name, sku=sku, group_name=resource_group), shell=True)
-        acr_create = json.loads(acr_create)
-        return acr_create
-    except Exception as ex:
-        raise CLIError(ex)
+    """ Starts creating the registry in the background and returns its name, resource group and location.
+    Call wait_for_provisioning before using the registry.
+    """
+    account = get_account_context()
+    logger.warning('Using your %s for creating new Azure Container Registry.', account.get_display_name())
+    # the registry is created in the location of its resource group
+    location = _get_group_location(resource_group)
+    # az acr create has no --no-wait, invoking it would hold the az invocation lock until the registry is created
+    url = '{}/providers/Microsoft.ContainerRegistry/registries/{}?api-version={}'.format(
+        get_resource_group_scope(resource_group), registry_name, _ACR_API_VERSION)
+    body = json.dumps({'location': location, 'sku': {'name': sku}})
+    _start_provisioning('Azure Container Registry {}'.format(registry_name),
+                        lambda: _send_arm_request('PUT', url, body),
+                        ['acr', 'show', '--name', registry_name, '-g', resource_group] +
+                        account.get_subscription_args())
+    get_resource_inventory().invalidate(ACR_INVENTORY)
+    return {'name': registry_name, 'resourceGroup': resource_group, 'location': location}
+
+
+def _start_provisioning(description, create, show_args):
+    print('Creating {} in the background...'.format(description))
+    _PENDING_OPERATIONS.append(ProvisioningOperation(description, create, show_args).start())
+
+
+def _send_arm_request(method, url, body=None):
+    from azure.cli.core import get_default_cli
+    from azure.cli.core.util import send_raw_request
+    return send_raw_request(get_default_cli(), method, url, body=body)
+
+
+def _get_group_location(resource_group):
+    for group in get_resource_inventory().get(GROUP_INVENTORY):
+        if group['name'].lower() == resource_group.lower():
+            return group['location']
+    return None
+
+
+def get_resource_group_scope(resource_group):
+    return '/subscriptions/{}/resourceGroups/{}'.format(get_account_context().subscription_id, resource_group)
+
+
+def get_role_assignment_scope(resource_details):
+    """ Scope to grant the deployment service principal access to the resource. Resources still
+    being created in the background have no id yet and are reached through their resource group.
+    """
+    return resource_details.get('id') or get_resource_group_scope(resource_details['resourceGroup'])
 
 
 def get_resource_group():
-    _subscription_id, subscription_name, _tenant_id, _environment_name = get_default_subscription_info()
-    logger.warning("Using your default Azure subscription %s for fetching Resource Groups.", subscription_name)
-    group_list = subprocess.check_output('az group list -o json', shell=True)
-    group_list = json.loads(group_list)
+    logger.warning("Using your %s for fetching Resource Groups.", get_account_context().get_display_name())
+    group_list = get_resource_inventory().get(GROUP_INVENTORY)
     if not group_list:
         return None
     group_choice = 0
@@ -72,10 +514,8 @@ def get_resource_group():
 
 
 def get_aks_details(name=None):
-    _subscription_id, subscription_name, _tenant_id, _environment_name = get_default_subscription_info()
-    logger.warning("Using your default Azure subscription %s for fetching AKS clusters.", subscription_name)
-    aks_list = subprocess.check_output('az aks list -o json', shell=True)
-    aks_list = json.loads(aks_list)
+    logger.warning("Using your %s for fetching AKS clusters.", get_account_context().get_display_name())
+    aks_list = get_resource_inventory().get(AKS_INVENTORY, name)
     if not aks_list:
         # Do we want to fail here??
         return None
@@ -109,11 +549,8 @@ def get_aks_details(name=None):
 
 
 def get_acr_details(name=None):
-    _subscription_id, subscription_name, _tenant_id, _environment_name = get_default_subscription_info()
-    logger.warning("Using your default Azure subscription %s for fetching Azure Container Registries.",
-                   subscription_name)
-    acr_list = subprocess.check_output('az acr list -o json', shell=True)
-    acr_list = json.loads(acr_list)
+    logger.warning("Using your %s for fetching Azure Container Registries.", get_account_context().get_display_name())
+    acr_list = get_resource_inventory().get(ACR_INVENTORY, name)
     if not acr_list:
         return None
 
@@ -148,10 +585,8 @@ def get_acr_details(name=None):
 
 
 def get_functionapp_details(name=None):
-    _subscription_id, subscription_name, _tenant_id, _environment_name = get_default_subscription_info()
-    logger.warning("Using your default Azure subscription %s for fetching Functionapps.", subscription_name)
-    functionapp_list = subprocess.check_output('az functionapp list -o json', shell=True)
-    functionapp_list = json.loads(functionapp_list)
+    logger.warning("Using your %s for fetching Functionapps.", get_account_context().get_display_name())
+    functionapp_list = get_resource_inventory().get(FUNCTIONAPP_INVENTORY, name)
     if not functionapp_list:
         logger.debug("No Functionapp deployments found in your Azure subscription.")
     functionapp_choice = 0
@@ -178,12 +613,37 @@ def get_sku():
 
 
 def configure_aks_credentials(cluster_name, resource_group):
+    account = get_account_context()
+    logger.warning("Using your %s for getting AKS cluster credentials.", account.get_display_name())
+    invoke_az_command(['aks', 'get-credentials', '-n', cluster_name, '-g', resource_group] +
+                      account.get_subscription_args())
+
+
+def get_aks_kubernetes_client(cluster_name, resource_group):
+    """ Returns a client of the cluster API server using the user credentials of the cluster, held in memory
+    instead of being merged into ~/.kube/config.
+    :return: The client, or None if the credentials can only be used through kubectl.
+    """
     try:
-        subscription_id, subscription_name, tenant_id, environment_name = get_default_subscription_info()
-        logger.warning("Using your default Azure subscription %s for getting AKS cluster credentials.",
-                       subscription_name)
-        _aks_creds = subprocess.check_output(
-            'az aks get-credentials -n {cluster_name} -g {group_name} -o json'.format(
-                cluster_name=cluster_name, group_name=resource_group), shell=True)
-    except Exception as ex:
-        raise CLIError(ex)
+        import yaml
+    except ImportError:
+        logger.debug('PyYAML is not installed, using kubectl to reach the cluster.')
+        return None
+    from azext_deploy_to_azure.dev.common.kubernetes_client import KubernetesClient
+    account = get_account_context()
+    logger.warning("Using your %s for getting AKS cluster credentials.", account.get_display_name())
+    kubeconfig = yaml.safe_load(get_aks_user_kubeconfig(cluster_name, resource_group))
+    return KubernetesClient.from_kubeconfig(kubeconfig)
+
+
+def get_aks_user_kubeconfig(cluster_name, resource_group):
+    import base64
+    from azure.cli.core import get_default_cli
+    from azure.cli.core.util import send_raw_request
+    url = ('/subscriptions/{}/resourceGroups/{}/providers/Microsoft.ContainerService/managedClusters/{}'
+           '/listClusterUserCredential?api-version={}')
+    url = url.format(get_account_context().subscription_id, resource_group, cluster_name, _AKS_API_VERSION)
+    kubeconfigs = send_raw_request(get_default_cli(), 'POST', url).json().get('kubeconfigs') or []
+    if not kubeconfigs:
+        raise CLIError('Could not get the credentials of the AKS cluster {}.'.format(cluster_name))
+    return base64.b64decode(kubeconfigs[0]['value']).decode('utf-8')
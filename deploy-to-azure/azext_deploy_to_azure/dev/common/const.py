@@ -17,6 +17,13 @@ PORT_NUMBER_DEFAULT = '8080'
 APP_NAME_DEFAULT = 'k8sdemo'
 RELEASE_NAME = 'aksappupdemo'
 
+# Repository files checked before setting up the workflow
+
+GITHUB_WORKFLOW_PATH = '.github/workflows/'
+WORKFLOW_FILE_NAME = 'main.yml'
+HOST_JSON_PATH = 'host.json'
+DOCKERFILE_PATH = 'Dockerfile'
+
 # Checkin message strings
 
 CHECKIN_MESSAGE_AKS = 'Setting up AKS deployment workflow'
@@ -24,3 +31,8 @@ CHECKIN_MESSAGE_ACI = 'Setting up ACI deployment workflow'
 CHECKIN_MESSAGE_FUNCTIONAPP = 'Setting up Functionapp deployment workflow'
 
 RELEASE_PLACEHOLDER = 'release_name_place_holder'
+
+# Names of the jobs in the workflow templates, GitHub names their check runs after them
+
+AKS_WORKFLOW_JOB_NAME = 'build'
+WORKFLOW_JOB_NAME = 'build-and-deploy'
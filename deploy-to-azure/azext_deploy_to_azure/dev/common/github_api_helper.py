@@ -2,30 +2,110 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
+import io
+import os
 import time
-import requests
+import base64
+import hashlib
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
 from knack.log import get_logger
 from knack.util import CLIError
 from azext_deploy_to_azure.dev.common.prompting import prompt_user_friendly_choice_list, prompt_not_empty
 from azext_deploy_to_azure.dev.common.git import resolve_git_ref_heads, get_branch_name_from_ref
+from azext_deploy_to_azure.dev.common.github_client import get_github_client
 
 logger = get_logger(__name__)
 
 _HTTP_NOT_FOUND_STATUS = 404
 _HTTP_SUCCESS_STATUS = 200
 _HTTP_CREATED_STATUS = 201
+_HTTP_NO_CONTENT_STATUS = 204
+_GIT_FILE_MODE = '100644'
+_GITHUB_ACTIONS_APP_ID = 15368
+_CHECK_RUNS_PAGE_SIZE = 5
+_SECRETS_PAGE_SIZE = 100
+_SECRETS_MAX_WORKERS = 8
+_CHECK_RUN_DISCOVERY_MIN_INTERVAL = 1
+_CHECK_RUN_DISCOVERY_MAX_INTERVAL = 16
+CHECK_RUN_DISCOVERY_TIMEOUT = 300
+# multiple of 3, so that the base64 encoding of each chunk but the last needs no padding
+_BLOB_CHUNK_SIZE = 3 * 64 * 1024
+_BLOB_BODY_PREFIX = b'{"encoding": "base64", "content": "'
+_BLOB_BODY_SUFFIX = b'"}'
+
+
+class Files:
+    """ File to check in, with its content given or rendered from a template each time it is read.
+    Only the git blob sha and the size are kept, not the rendered content.
+    :param path: Path of the file in the repository.
+    :type path: str
+    :param content: Content of the file.
+    :type content: str
+    :param template: Template rendered with values for the content, instead of content.
+    :type template: azext_deploy_to_azure.dev.common.templates.Template
+    :param values: Placeholder to value, for the template.
+    :type values: dict
+    :param source: Local file read as binary for the content, e.g. a packaged chart, instead of content.
+        It is hashed and uploaded a chunk at a time, never held in memory.
+    :type source: str
+    """
+    __slots__ = ['path', 'source', '_content', '_template', '_values', '_blob_sha', '_size']
 
-
-class Files:  # pylint: disable=too-few-public-methods
-    def __init__(self, path, content):
+    def __init__(self, path, content=None, template=None, values=None, source=None):
         self.path = path
-        self.content = content
+        self.source = source
+        self._content = content
+        self._template = template
+        self._values = values or {}
+        self._blob_sha = None
+        self._size = None
+
+    @property
+    def content(self):
+        """ Text content, None for a file read from source. """
+        if self._template is not None:
+            return self._template.render(self._values)
+        return self._content
+
+    def open(self):
+        """ Binary stream of the content, to be closed by the caller. """
+        if self.source is not None:
+            return io.open(self.source, 'rb')
+        return io.BytesIO((self.content or '').encode('utf-8'))
+
+    @property
+    def blob_sha(self):
+        """ Sha of the file as a git blob, the same as GitHub reports for the file in a tree. """
+        if self._blob_sha is None:
+            self._hash_content()
+        return self._blob_sha
+
+    @property
+    def size(self):
+        """ Length of the content in bytes, UTF-8 encoded for text. """
+        if self._size is None:
+            self._hash_content()
+        return self._size
+
+    def get_digest(self):
+        return '{} bytes, blob {}'.format(self.size, self.blob_sha)
+
+    def _hash_content(self):
+        with self.open() as stream:
+            size = stream.seek(0, os.SEEK_END)
+            stream.seek(0)
+            blob_sha = hashlib.sha1(b'blob ' + str(size).encode('ascii') + b'\0')
+            for chunk in iter(lambda: stream.read(_BLOB_CHUNK_SIZE), b''):
+                blob_sha.update(chunk)
+        self._size = size
+        self._blob_sha = blob_sha.hexdigest()
 
 
 def get_github_pat_token(token_prefix, display_warning=False):
-    from azext_deploy_to_azure.dev.common.github_credential_manager import GithubCredentialManager
-    github_manager = GithubCredentialManager()
-    return github_manager.get_token(token_prefix=token_prefix, display_warning=display_warning)
+    return get_github_client().authenticate(token_prefix=token_prefix, display_warning=display_warning)
 
 
 def get_github_repos_api_url(repo_id):
@@ -36,7 +116,8 @@ def push_files_github(files, repo_name, branch, commit_to_branch,
                       message="Setting up deployment workflow", branch_name=None):
     """ Push files to a Github branch or raise a PR to the branch depending on
     commit_to_branch parameter.
-    return: If commit_to_branch is true, returns the commit sha else returns None
+    return: If commit_to_branch is true, returns the commit sha else returns None.
+    None as well when the files in the branch are already up to date, nothing is pushed then.
     """
     if commit_to_branch:
         return commit_files_to_github_branch(files, repo_name, branch, message)
@@ -44,8 +125,11 @@ def push_files_github(files, repo_name, branch, commit_to_branch,
     # 1. Create Branch
     # 2. Commit files to branch
     # 3. Create PR from new branch
+    files = get_changed_files(files, repo_name, branch)
+    if not files:
+        return None
     branch_name = create_github_branch(repo=repo_name, source=branch, new_branch=branch_name)
-    commit_files_to_github_branch(files, repo_name, branch_name, message)
+    commit_files_to_github_branch(files, repo_name, branch_name, message, skip_unchanged=False)
     pr = create_pr_github(branch, branch_name, repo_name, message)
     print('Created a Pull Request - {url}'.format(url=pr['html_url']))
     return None
@@ -55,15 +139,14 @@ def create_pr_github(branch, new_branch, repo_name, message):
     """
     API Documentation - https://developer.github.com/v3/pulls/#create-a-pull-request
     """
-    token = get_github_pat_token(repo_name)
     create_pr_url = 'https://api.github.com/repos/{repo_id}/pulls'.format(repo_id=repo_name)
     create_pr_request_body = {
         "title": message,
         "head": new_branch,
         "base": branch
     }
-    create_response = requests.post(url=create_pr_url, auth=('', token),
-                                    json=create_pr_request_body, headers=get_application_json_header())
+    create_response = get_github_client().post(create_pr_url, token_prefix=repo_name,
+                                               json=create_pr_request_body, headers=get_application_json_header())
     if not create_response.status_code == _HTTP_CREATED_STATUS:
         raise CLIError('Pull request creation failed. Error: ({err})'.format(err=create_response.reason))
     import json
@@ -74,7 +157,6 @@ def create_github_branch(repo, source, new_branch=None):
     """
     API Documentation - https://developer.github.com/v3/git/refs/#create-a-reference
     """
-    token = get_github_pat_token(repo)
     # Validate new branch name is valid
     branch_is_valid = False
     if new_branch:
@@ -100,8 +182,9 @@ def create_github_branch(repo, source, new_branch=None):
         "ref": resolve_git_ref_heads(new_branch),
         "sha": source_ref
     }
-    create_response = requests.post(url=create_github_ref_url, auth=('', token),
-                                    json=create_github_ref_request_body, headers=get_application_json_header())
+    create_response = get_github_client().post(create_github_ref_url, token_prefix=repo,
+                                               json=create_github_ref_request_body,
+                                               headers=get_application_json_header())
     if not create_response.status_code == _HTTP_CREATED_STATUS:
         raise CLIError('Branch creation failed. Error: ({err})'.format(err=create_response.reason))
     return get_branch_name_from_ref(new_branch)
@@ -114,11 +197,10 @@ def get_github_branch(repo, branch):
     branch : None if the branch with this name does not exist else branch ref
     is_folder : True or False
     """
-    token = get_github_pat_token(repo)
     head_ref_name = resolve_git_ref_heads(branch).lower()
     get_branch_url = 'https://api.github.com/repos/{repo_id}/git/{refs_heads_branch}'.format(
         repo_id=repo, refs_heads_branch=head_ref_name)
-    get_response = requests.get(get_branch_url, auth=('', token))
+    get_response = get_github_client().cached_get(get_branch_url, token_prefix=repo)
     if get_response.status_code == _HTTP_NOT_FOUND_STATUS:
         return None, False
     if get_response.status_code == _HTTP_SUCCESS_STATUS:
@@ -143,38 +225,253 @@ def get_default_branch(repo):
     API Documentation - https://developer.github.com/v3/repos/#get
     Returns default branch name
     """
-    token = get_github_pat_token(repo)
     try:
         get_branch_url = 'https://api.github.com/repos/{repo}'.format(repo=repo)
-        get_response = requests.get(get_branch_url, auth=('', token))
+        get_response = get_github_client().cached_get(get_branch_url, token_prefix=repo)
         repo_details = get_response.json()
         return repo_details['default_branch']
     except BaseException as ex:  # pylint: disable=broad-except
         CLIError(ex)
 
 
-def commit_files_to_github_branch(files, repo_name, branch, message):
+def commit_files_to_github_branch(files, repo_name, branch, message, skip_unchanged=True):
+    """ Commit all the files to the branch as a single commit using the Git Data API.
+    1. Create a blob for each file that differs from the branch head tree
+    2. Create a tree with the blobs on top of the branch head tree
+    3. Create a commit for the tree with the branch head as parent
+    4. Move the branch ref to the new commit
+    return: sha of the created commit, None if all the files are up to date in the branch
+    """
     if not files:
         raise CLIError("No files to checkin.")
+    base_commit_sha, base_tree_sha = _get_branch_head(repo_name, branch)
+    if skip_unchanged:
+        files = _get_changed_files(files, repo_name, branch, base_tree_sha)
+        if not files:
+            return None
+    tree_items = []
     for file in files:
-        commit_sha = commit_file_to_github_branch(file.path, file.content, repo_name, branch, message)
-    # returning last commit sha
+        path_to_commit = _get_tree_path(file.path)
+        logger.warning('Checking in file %s in the Github repository %s', path_to_commit, repo_name)
+        tree_items.append({
+            "path": path_to_commit,
+            "mode": _GIT_FILE_MODE,
+            "type": "blob",
+            "sha": _create_file_blob(repo_name, file)
+        })
+    tree_sha = create_tree(repo_name, tree_items, base_tree_sha)
+    commit_sha = create_commit(repo_name, message, tree_sha, [base_commit_sha])
+    update_github_ref(repo_name, branch, commit_sha)
     return commit_sha
 
 
+def get_changed_files(files, repo_name, branch):
+    """ Returns the files whose content differs from the head of the branch, comparing git blob shas.
+    """
+    _, base_tree_sha = _get_branch_head(repo_name, branch)
+    return _get_changed_files(files, repo_name, branch, base_tree_sha)
+
+
+def _get_changed_files(files, repo_name, branch, base_tree_sha):
+    for file in files:
+        if not (file.path and file.size):
+            raise CLIError('GitHub file checkin failed. File path or content is empty.')
+    blob_shas = get_tree_blob_shas(repo_name, base_tree_sha)
+    changed_files = []
+    for file in files:
+        if blob_shas.get(_get_tree_path(file.path)) == file.blob_sha:
+            logger.debug('File %s is up to date in the branch %s.', file.path, branch)
+        else:
+            changed_files.append(file)
+    if not changed_files:
+        logger.warning('The files are already up to date in the branch %s of the Github repository %s, '
+                       'nothing to check in.', branch, repo_name)
+    return changed_files
+
+
+def _get_branch_head(repo_name, branch):
+    ref_item, is_folder = get_github_branch(repo_name, branch)
+    if not ref_item or is_folder:
+        raise CLIError('Branch ({branch}) does not exist.'.format(branch=branch))
+    base_commit_sha = ref_item['object']['sha']
+    return base_commit_sha, get_commit(repo_name, base_commit_sha)['tree']['sha']
+
+
+def _get_tree_path(path):
+    # Tree paths are relative to the repository root without empty or '.' segments
+    return '/'.join(segment for segment in path.replace('\\', '/').split('/') if segment not in ('', '.'))
+
+
+def get_commit(repo_name, commit_sha):
+    """
+    API Documentation - https://developer.github.com/v3/git/commits/#get-a-commit
+    """
+    get_commit_url = 'https://api.github.com/repos/{repo_id}/git/commits/{sha}'.format(
+        repo_id=repo_name, sha=commit_sha)
+    get_response = get_github_client().get(get_commit_url, token_prefix=repo_name)
+    if not get_response.status_code == _HTTP_SUCCESS_STATUS:
+        raise CLIError('Get commit ({sha}) failed. Error: ({err})'.format(sha=commit_sha, err=get_response.reason))
+    return get_response.json()
+
+
+def get_tree_blob_shas(repo_name, tree_sha):
+    """
+    API Documentation - https://docs.github.com/en/rest/git/trees#get-a-tree
+    Returns the sha of every blob in the tree and its subtrees, by path.
+    """
+    get_tree_url = 'https://api.github.com/repos/{repo_id}/git/trees/{sha}?recursive=1'.format(
+        repo_id=repo_name, sha=tree_sha)
+    get_response = get_github_client().get(get_tree_url, token_prefix=repo_name)
+    if not get_response.status_code == _HTTP_SUCCESS_STATUS:
+        raise CLIError('Get tree ({sha}) failed. Error: ({err})'.format(sha=tree_sha, err=get_response.reason))
+    tree = get_response.json()
+    if tree.get('truncated'):
+        # files missing from a truncated listing are treated as changed and checked in again
+        logger.debug('The tree %s is too large to be listed entirely.', tree_sha)
+    return {item['path']: item['sha'] for item in tree['tree'] if item['type'] == 'blob'}
+
+
+def create_blob(repo_name, content):
+    """
+    API Documentation - https://developer.github.com/v3/git/blobs/#create-a-blob
+    The content is base64 encoded while the request body is sent, so content of any size is uploaded without
+    holding it in memory. The length of the body is known up front and sent as Content-Length, as a chunked
+    body is not accepted by every proxy.
+    :param content: Text, bytes or a seekable binary file object positioned at the start of the content.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    stream = io.BytesIO(content) if isinstance(content, bytes) else content
+    start = stream.tell()
+    size = stream.seek(0, os.SEEK_END) - start
+    stream.seek(start)
+    create_blob_url = 'https://api.github.com/repos/{repo_id}/git/blobs'.format(repo_id=repo_name)
+    create_response = get_github_client().post(create_blob_url, token_prefix=repo_name,
+                                               data=_BlobRequestBody(stream, size),
+                                               headers=get_application_json_header())
+    if not create_response.status_code == _HTTP_CREATED_STATUS:
+        raise CLIError('Blob creation failed. Error: ({err})'.format(err=create_response.reason))
+    return create_response.json()['sha']
+
+
+class _BlobRequestBody:
+    """ Body of a create blob request, requests sends it with the Content-Length of its len.
+    """
+
+    def __init__(self, stream, size):
+        self._stream = stream
+        self._size = size
+
+    def __len__(self):
+        return get_blob_request_length(self._size)
+
+    def __iter__(self):
+        return get_blob_request_body(self._stream)
+
+
+def get_blob_request_length(size):
+    """ Length of the JSON body of a create blob request for content of size bytes.
+    """
+    # base64 encodes each started group of 3 bytes as 4 characters
+    return len(_BLOB_BODY_PREFIX) + 4 * ((size + 2) // 3) + len(_BLOB_BODY_SUFFIX)
+
+
+def get_blob_request_body(stream, chunk_size=None):
+    """ Yields the JSON body of a create blob request, base64 encoding the stream a chunk at a time.
+    """
+    chunk_size = chunk_size or _BLOB_CHUNK_SIZE
+    yield _BLOB_BODY_PREFIX
+    pending = b''
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        chunk = pending + chunk
+        # a short read may end inside a 3 byte group, it is encoded with the next chunk
+        end = len(chunk) - len(chunk) % 3
+        pending = chunk[end:]
+        yield base64.b64encode(chunk[:end])
+    yield base64.b64encode(pending) + _BLOB_BODY_SUFFIX
+
+
+def _create_file_blob(repo_name, file):
+    with file.open() as stream:
+        return create_blob(repo_name, stream)
+
+
+def create_tree(repo_name, tree_items, base_tree_sha):
+    """
+    API Documentation - https://developer.github.com/v3/git/trees/#create-a-tree
+    """
+    create_tree_url = 'https://api.github.com/repos/{repo_id}/git/trees'.format(repo_id=repo_name)
+    create_tree_request_body = {
+        "base_tree": base_tree_sha,
+        "tree": tree_items
+    }
+    create_response = get_github_client().post(create_tree_url, token_prefix=repo_name,
+                                               json=create_tree_request_body, headers=get_application_json_header())
+    if not create_response.status_code == _HTTP_CREATED_STATUS:
+        raise CLIError('Tree creation failed. Error: ({err})'.format(err=create_response.reason))
+    return create_response.json()['sha']
+
+
+def create_commit(repo_name, message, tree_sha, parents):
+    """
+    API Documentation - https://developer.github.com/v3/git/commits/#create-a-commit
+    """
+    create_commit_url = 'https://api.github.com/repos/{repo_id}/git/commits'.format(repo_id=repo_name)
+    create_commit_request_body = {
+        "message": message,
+        "tree": tree_sha,
+        "parents": parents
+    }
+    create_response = get_github_client().post(create_commit_url, token_prefix=repo_name,
+                                               json=create_commit_request_body,
+                                               headers=get_application_json_header())
+    if not create_response.status_code == _HTTP_CREATED_STATUS:
+        raise CLIError('Commit creation failed. Error: ({err})'.format(err=create_response.reason))
+    return create_response.json()['sha']
+
+
+def update_github_ref(repo_name, branch, commit_sha):
+    """
+    API Documentation - https://developer.github.com/v3/git/refs/#update-a-reference
+    """
+    update_ref_url = 'https://api.github.com/repos/{repo_id}/git/{refs_heads_branch}'.format(
+        repo_id=repo_name, refs_heads_branch=resolve_git_ref_heads(branch))
+    update_ref_request_body = {
+        "sha": commit_sha,
+        "force": False
+    }
+    update_response = get_github_client().patch(update_ref_url, token_prefix=repo_name,
+                                                json=update_ref_request_body, headers=get_application_json_header())
+    if not update_response.status_code == _HTTP_SUCCESS_STATUS:
+        raise CLIError('Updating branch ({branch}) failed. Error: ({err})'.format(
+            branch=branch, err=update_response.reason))
+
+
 def check_file_exists(repo_name, file_path):
     """
     API Documentation - https://developer.github.com/v3/repos/contents/#get-contents
     """
-    token = get_github_pat_token(repo_name)
     url_for_github_file_api = 'https://api.github.com/repos/{repo_name}/contents/{file_path}'.format(
         repo_name=repo_name, file_path=file_path)
-    get_response = requests.get(url_for_github_file_api, auth=('', token))
+    get_response = get_github_client().cached_get(url_for_github_file_api, token_prefix=repo_name)
     if get_response.status_code == _HTTP_SUCCESS_STATUS:
         return True
     return False
 
 
+def get_file_blob_sha(repo_name, file_path):
+    """
+    API Documentation - https://developer.github.com/v3/repos/contents/#get-contents
+    Returns the git blob sha of the file, None if it does not exist.
+    """
+    url_for_github_file_api = 'https://api.github.com/repos/{repo_name}/contents/{file_path}'.format(
+        repo_name=repo_name, file_path=file_path)
+    get_response = get_github_client().cached_get(url_for_github_file_api, token_prefix=repo_name)
+    if get_response.status_code == _HTTP_SUCCESS_STATUS:
+        return get_response.json().get('sha')
+    return None
+
+
 def get_application_json_header():
     return {'Content-Type': 'application/json' + '; charset=utf-8',
             'Accept': 'application/json'}
@@ -184,97 +481,118 @@ def get_application_json_header_for_preview():
     return {'Accept': 'application/vnd.github.antiope-preview+json'}
 
 
-def commit_file_to_github_branch(path_to_commit, content, repo_name, branch, message):
-    """
-    API Documentation - https://developer.github.com/v3/repos/contents/#create-a-file
-    """
-    import base64
-    headers = get_application_json_header()
-    url_for_github_file_api = 'https://api.github.com/repos/{repo_name}/contents/{path_to_commit}'.format(
-        repo_name=repo_name, path_to_commit=path_to_commit)
-    if not (path_to_commit and content):
-        raise CLIError('GitHub file checkin failed. File path or content is empty.')
-    path_to_commit = path_to_commit.strip('.')
-    path_to_commit = path_to_commit.strip('/')
-    encoded_content = base64.b64encode(content.encode('utf-8')).decode("utf-8")
-    request_body = {
-        "message": message,
-        "branch": branch,
-        "content": encoded_content
-    }
-    token = get_github_pat_token(repo_name)
-    logger.warning('Checking in file %s in the Github repository %s', path_to_commit, repo_name)
-    response = requests.put(url_for_github_file_api, auth=('', token),
-                            json=request_body, headers=headers)
-    logger.debug(response.text)
-    if not response.status_code == _HTTP_CREATED_STATUS:
-        raise CLIError('GitHub file checkin failed for file ({file}). Status Code ({code}).'.format(
-            file=path_to_commit, code=response.status_code))
-    commit_obj = response.json()['commit']
-    commit_sha = commit_obj['sha']
-    return commit_sha
-
-
 def get_languages_for_repo(repo_name):
     """
     API Documentation - https://developer.github.com/v3/repos/#list-languages
     """
-    token = get_github_pat_token(repo_name)
     get_languagues_url = 'https://api.github.com/repos/{repo_id}/languages'.format(repo_id=repo_name)
-    get_response = requests.get(url=get_languagues_url, auth=('', token))
-    if not get_response.status_code == _HTTP_SUCCESS_STATUS:
+    get_response = get_github_client().cached_get(get_languagues_url, token_prefix=repo_name)
+    if get_response.status_code != _HTTP_SUCCESS_STATUS:
         raise CLIError('Get Languages failed. Error: ({err})'.format(err=get_response.reason))
     import json
     return json.loads(get_response.text)
 
 
-def get_check_runs_for_commit(repo_name, commmit_sha):
+def get_check_runs_for_commit(repo_name, commmit_sha, check_name=None, app_id=None, per_page=None):
     """
     API Documentation - https://developer.github.com/v3/checks/runs/#list-check-runs-for-a-specific-ref
+    check_name, app_id and per_page filter the check runs on the server.
     """
-    token = get_github_pat_token(repo_name)
     headers = get_application_json_header_for_preview()
-    time.sleep(1)
     get_check_runs_url = 'https://api.github.com/repos/{repo_id}/commits/{ref}/check-runs'.format(
         repo_id=repo_name, ref=commmit_sha)
-    get_response = requests.get(url=get_check_runs_url, auth=('', token), headers=headers)
+    query = [(name, value) for name, value in (('check_name', check_name), ('app_id', app_id),
+                                               ('per_page', per_page)) if value is not None]
+    if query:
+        get_check_runs_url = get_check_runs_url + '?' + urlencode(query)
+    # polled until the workflow creates its check run, its responses are not worth caching
+    get_response = get_github_client().get(get_check_runs_url, token_prefix=repo_name, headers=headers)
     if not get_response.status_code == _HTTP_SUCCESS_STATUS:
         raise CLIError('Get Check Runs failed. Error: ({err})'.format(err=get_response.reason))
     import json
     return json.loads(get_response.text)
 
 
-def get_work_flow_check_runID(repo_name, commmit_sha):
-    check_run_found = False
-    count = 0
-    while(not check_run_found or count > 3):
-        check_runs_list_response = get_check_runs_for_commit(repo_name, commmit_sha)
+def get_work_flow_check_runID(repo_name, commmit_sha, check_name=None, timeout=CHECK_RUN_DISCOVERY_TIMEOUT):
+    """ Waits for GitHub Actions to create the check run for the commit.
+    Retries with exponential backoff until timeout seconds have passed.
+    :param check_name: Name of the workflow job, narrows the check runs returned by GitHub.
+    :type check_name: str
+    :param timeout: Seconds to wait for the check run to be created.
+    :type timeout: int
+    """
+    deadline = time.time() + timeout
+    retry_interval = _CHECK_RUN_DISCOVERY_MIN_INTERVAL
+    while True:
+        check_runs_list_response = get_check_runs_for_commit(repo_name, commmit_sha, check_name=check_name,
+                                                             app_id=_GITHUB_ACTIONS_APP_ID,
+                                                             per_page=_CHECK_RUNS_PAGE_SIZE)
         if check_runs_list_response and check_runs_list_response['total_count'] > 0:
             # fetch the Github actions check run and its check run ID
             check_runs_list = check_runs_list_response['check_runs']
             for check_run in check_runs_list:
                 if check_run['app']['slug'] == 'github-actions':
-                    check_run_id = check_run['id']
-                    check_run_found = True
-                    return check_run_id
-        time.sleep(5)
-        count = count + 1
-    raise CLIError("Couldn't find Github Actions check run. Please check 'Actions' tab in your Github repo.")
+                    return check_run['id']
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        time.sleep(min(retry_interval, remaining))
+        retry_interval = min(retry_interval * 2, _CHECK_RUN_DISCOVERY_MAX_INTERVAL)
+    raise CLIError("Couldn't find Github Actions check run within {} seconds. "
+                   "Please check 'Actions' tab in your Github repo.".format(timeout))
 
 
-def get_check_run_status_and_conclusion(repo_name, check_run_id):
+def get_check_run(repo_name, check_run_id):
     """
     API Documentation - https://developer.github.com/v3/checks/runs/#get-a-single-check-run
     """
-    token = get_github_pat_token(repo_name)
     headers = get_application_json_header_for_preview()
     get_check_run_url = 'https://api.github.com/repos/{repo_id}/check-runs/{checkID}'.format(
         repo_id=repo_name, checkID=check_run_id)
-    get_response = requests.get(url=get_check_run_url, auth=('', token), headers=headers)
-    if not get_response.status_code == _HTTP_SUCCESS_STATUS:
+    # polled until it completes, a check run that did not change is answered with 304 and costs no rate limit
+    get_response = get_github_client().cached_get(get_check_run_url, token_prefix=repo_name, headers=headers)
+    if get_response.status_code != _HTTP_SUCCESS_STATUS:
         raise CLIError('Get Check Run failed. Error: ({err})'.format(err=get_response.reason))
-    import json
-    return json.loads(get_response.text)['status'], json.loads(get_response.text)['conclusion']
+    return get_response.json()
+
+
+def get_check_run_status_and_conclusion(repo_name, check_run_id):
+    check_run = get_check_run(repo_name, check_run_id)
+    return check_run['status'], check_run['conclusion']
+
+
+def create_repo_webhook(repo_name, webhook_url, secret, events):
+    """
+    API Documentation - https://developer.github.com/v3/repos/hooks/#create-a-hook
+    Returns id of the created webhook
+    """
+    create_hook_url = 'https://api.github.com/repos/{repo_id}/hooks'.format(repo_id=repo_name)
+    create_hook_request_body = {
+        "name": "web",
+        "active": True,
+        "events": events,
+        "config": {
+            "url": webhook_url,
+            "content_type": "json",
+            "secret": secret
+        }
+    }
+    create_response = get_github_client().post(create_hook_url, token_prefix=repo_name,
+                                               json=create_hook_request_body, headers=get_application_json_header())
+    if not create_response.status_code == _HTTP_CREATED_STATUS:
+        raise CLIError('Webhook creation failed. Error: ({err})'.format(err=create_response.reason))
+    return create_response.json()['id']
+
+
+def delete_repo_webhook(repo_name, hook_id):
+    """
+    API Documentation - https://developer.github.com/v3/repos/hooks/#delete-a-hook
+    """
+    delete_hook_url = 'https://api.github.com/repos/{repo_id}/hooks/{hook_id}'.format(
+        repo_id=repo_name, hook_id=hook_id)
+    delete_response = get_github_client().delete(delete_hook_url, token_prefix=repo_name)
+    if not delete_response.status_code == _HTTP_NO_CONTENT_STATUS:
+        logger.warning('Could not delete the webhook (%s) from the repository %s.', hook_id, repo_name)
 
 
 def push_files_to_repository(repo_name, default_branch, files, branch_name, message=None):
@@ -290,55 +608,75 @@ def push_files_to_repository(repo_name, default_branch, files, branch_name, mess
         message=message, branch_name=branch_name)
 
 
-def check_secret_exists(repo, secret_name):
-    """
-    API Documentation - https://developer.github.com/v3/actions/secrets/#get-a-secret
+def list_repo_secret_names(repo):
     """
-    token = get_github_pat_token(repo)
-    get_secret_url = 'https://api.github.com/repos/{repo}/actions/secrets/{name}'.format(repo=repo, name=secret_name)
-    get_response = requests.get(get_secret_url, auth=('', token))
-    # secret doesn't exists
-    if get_response.status_code == _HTTP_SUCCESS_STATUS:
-        return True
-    return False
-
-
-def create_repo_secret(repo, secret_name, secret_value):
+    API Documentation - https://developer.github.com/v3/actions/secrets/#list-secrets-for-a-repository
+    Returns the names of all secrets in the repository, following the pagination links.
     """
-    API Documentation - https://developer.github.com/v3/actions/secrets/#create-or-update-a-secret-for-a-repository
+    list_secrets_url = 'https://api.github.com/repos/{repo}/actions/secrets?{query}'.format(
+        repo=repo, query=urlencode({'per_page': _SECRETS_PAGE_SIZE}))
+    secret_names = set()
+    while list_secrets_url:
+        list_response = get_github_client().get(list_secrets_url, token_prefix=repo)
+        if not list_response.status_code == _HTTP_SUCCESS_STATUS:
+            raise CLIError('List secrets failed. Error: ({err})'.format(err=list_response.reason))
+        secret_names.update(secret['name'] for secret in list_response.json()['secrets'])
+        list_secrets_url = list_response.links.get('next', {}).get('url')
+    return secret_names
+
+
+def create_repo_secrets(repo, secrets):
+    """ Creates or updates several repository secrets.
+    The public key is fetched once and all values are encrypted with the same sealed box
+    before the writes are sent concurrently.
+    :param secrets: Secret name to plain text value.
+    :type secrets: dict
+    :return: Secret name to whether it was written.
+    :rtype: dict
     """
-    token = get_github_pat_token(repo)
-    headers = get_application_json_header()
+    if not secrets:
+        return {}
+    from concurrent.futures import ThreadPoolExecutor
     key_details = get_public_key(repo)
-    encrypted_text = encrypt_secret(key_details['key'], secret_value)
-    # Remove the additional new lines added by encoder
-    encrypted_text = encrypted_text.replace('\n', '')
-    create_secre_request_body = {
-        "encrypted_value": encrypted_text,
-        "key_id": key_details['key_id']
-    }
-    create_secrets_url = 'https://api.github.com/repos/{repo}/actions/secrets/{secret_name}'.format(
-        repo=repo, secret_name=secret_name)
-    response = requests.put(create_secrets_url, auth=('', token), json=create_secre_request_body, headers=headers)
-    logger.debug(response.text)
+    sealed_box = _get_sealed_box(key_details['key'])
+    headers = get_application_json_header()
+    client = get_github_client()
+
+    def _put_secret(secret_name, secret_value):
+        create_secret_request_body = {
+            "encrypted_value": _seal_secret(sealed_box, secret_value),
+            "key_id": key_details['key_id']
+        }
+        create_secrets_url = 'https://api.github.com/repos/{repo}/actions/secrets/{secret_name}'.format(
+            repo=repo, secret_name=secret_name)
+        response = client.put(create_secrets_url, token_prefix=repo,
+                              json=create_secret_request_body, headers=headers)
+        if response.status_code not in (_HTTP_CREATED_STATUS, _HTTP_NO_CONTENT_STATUS):
+            logger.warning('Creating secret %s failed. Error: (%s)', secret_name, response.reason)
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=min(len(secrets), _SECRETS_MAX_WORKERS)) as executor:
+        futures = {name: executor.submit(_put_secret, name, value) for name, value in secrets.items()}
+        return {name: future.result() for name, future in futures.items()}
 
 
 def get_public_key(repo):
     """
     API Documentation - https://developer.github.com/v3/actions/secrets/#get-your-public-key
     """
-    token = get_github_pat_token(repo)
     get_public_key_url = 'https://api.github.com/repos/{repo}/actions/secrets/public-key'.format(repo=repo)
-    get_response = requests.get(get_public_key_url, auth=('', token))
+    get_response = get_github_client().cached_get(get_public_key_url, token_prefix=repo)
     key_details = get_response.json()
     return key_details
 
 
-def encrypt_secret(public_key, secret_value):
-    """Encrypt a Unicode string using the public key."""
-    from base64 import encodebytes
+def _get_sealed_box(public_key):
     from nacl import encoding, public
     public_key = public.PublicKey(public_key.encode("utf-8"), encoding.Base64Encoder())
-    sealed_box = public.SealedBox(public_key)
-    encrypted = sealed_box.encrypt(secret_value.encode("utf-8"))
-    return encodebytes(encrypted).decode("utf-8")
+    return public.SealedBox(public_key)
+
+
+def _seal_secret(sealed_box, secret_value):
+    from base64 import b64encode
+    return b64encode(sealed_box.encrypt(secret_value.encode("utf-8"))).decode("utf-8")
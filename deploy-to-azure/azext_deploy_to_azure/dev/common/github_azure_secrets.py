@@ -3,56 +3,228 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+import time
+import hashlib
 from knack.log import get_logger
 from knack.prompting import prompt_y_n
-from azext_deploy_to_azure.dev.common.azure_cli_resources import get_default_subscription_info
-from azext_deploy_to_azure.dev.common.github_api_helper import check_secret_exists, create_repo_secret
+from knack.util import CLIError
+from azext_deploy_to_azure.dev.common.azure_cli_resources import invoke_az_command, get_account_context
+from azext_deploy_to_azure.dev.common.github_api_helper import list_repo_secret_names, create_repo_secrets
 
 logger = get_logger(__name__)
 
+ROLE_PROPAGATION_TIMEOUT = 180
+SERVICE_PRINCIPAL_UPDATE_TIMEOUT = 120
+_ROLE_PROPAGATION_MIN_INTERVAL = 2
+_ROLE_PROPAGATION_MAX_INTERVAL = 16
+_PERMISSIONS_API_VERSION = '2022-04-01'
+_PERMISSIONS_REQUEST_TIMEOUT = 30
+_SERVICE_PRINCIPAL_NAME_PREFIX = 'deploy-to-azure'
+_SERVICE_PRINCIPAL_NOTES = 'Deploys a GitHub repository to Azure, created by the deploy-to-azure CLI extension.'
+_SCOPE_HASH_LENGTH = 8
 
-def get_azure_credentials(repo_name):
-    import subprocess
+
+def get_azure_credentials(repo_name, target, scopes, repo_context=None):
+    """ Stores the credentials of the deployment service principal of the repository and target in the
+    AZURE_CREDENTIALS, REGISTRY_USERNAME and REGISTRY_PASSWORD secrets.
+    :param target: Name of the cluster or registry the workflow deploys to.
+    :type target: str
+    :param scopes: Resource ids of the cluster, registry or resource group the workflow deploys to.
+    :type scopes: list
+    """
     import json
-    _subscription_id, _subscription_name, _tenant_id, _environment_name = get_default_subscription_info()
-    print('Creating AZURE_CREDENTIALS secret...')
-    msg = 'Secret named AZURE_CREDENTIALS already exists in your repo. Do you want to overwrite it?'
-    if check_secret_exists(repo_name, 'AZURE_CREDENTIALS') and not prompt_y_n(msg, default="n"):
-        logger.warning('Skipped creating AZURE_CREDENTIALS as it already exists')
-    else:
-        auth_details = subprocess.check_output('az ad sp create-for-rbac --sdk-auth -o json', shell=True)
-        auth_details_json = json.loads(auth_details)
-        auth_details_string = json.dumps(auth_details_json)
-        create_repo_secret(repo_name, 'AZURE_CREDENTIALS', auth_details_string)
-    print('')
-    print('Creating REGISTRY_USERNAME and REGISTRY_PASSWORD...')
-    msg = 'Secret(s) named REGISTRY_USERNAME and/or REGISTRY_PASSWORD already exists in your repo. '\
-        'Do you want to overwrite it?'
-    if ((check_secret_exists(repo_name, 'REGISTRY_USERNAME') or
-         check_secret_exists(repo_name, 'REGISTRY_PASSWORD')) and
-            not prompt_y_n(msg, default="n")):
-        logger.warning('Skipped creating REGISTRY_USERNAME and REGISTRY_PASSWORD as it already exists')
-    else:
-        sp_details = subprocess.check_output('az ad sp create-for-rbac -o json', shell=True)
-        sp_details_json = json.loads(sp_details)
-        create_repo_secret(repo_name, 'REGISTRY_USERNAME', sp_details_json['appId'])
-        create_repo_secret(repo_name, 'REGISTRY_PASSWORD', sp_details_json['password'])
+    secret_names = ['AZURE_CREDENTIALS', 'REGISTRY_USERNAME', 'REGISTRY_PASSWORD']
+    print('Creating AZURE_CREDENTIALS, REGISTRY_USERNAME and REGISTRY_PASSWORD secrets...')
+    repo_secret_names = _get_secret_names(repo_name, repo_context)
+    existing_secrets = [name for name in secret_names if name in repo_secret_names]
+    msg = 'Secret(s) named {} already exist in your repo. Do you want to overwrite them?'.format(
+        ', '.join(existing_secrets))
+    if existing_secrets and not prompt_y_n(msg, default="n"):
+        logger.warning('Skipped creating %s as they already exist', ', '.join(secret_names))
+        return
+    auth_details = get_deployment_service_principal(repo_name, target, scopes)
+    _create_secrets(repo_name, {
+        'AZURE_CREDENTIALS': json.dumps(auth_details),
+        'REGISTRY_USERNAME': auth_details['clientId'],
+        'REGISTRY_PASSWORD': auth_details['clientSecret']
+    })
+    wait_for_role_propagation(auth_details, scopes)
 
 
-def get_azure_credentials_functionapp(repo_name, app_name):
-    import subprocess
+def get_azure_credentials_functionapp(repo_name, app_name, scopes, repo_context=None):
     import json
-    _subscription_id, _subscription_name, _tenant_id, _environment_name = get_default_subscription_info()
     print('')
     print('Creating AZURE_CREDENTIALS secret...')
-    if check_secret_exists(repo_name, 'AZURE_CREDENTIALS'):
+    if 'AZURE_CREDENTIALS' in _get_secret_names(repo_name, repo_context):
         logger.warning('Skipped creating AZURE_CREDENTIALS as it already exists')
     else:
-        if not app_name.startswith('http'):
-            app_name = 'http://{}'.format(app_name)
-        auth_details = subprocess.check_output(
-            'az ad sp create-for-rbac --name {} --role contributor --sdk-auth -o json'.format(app_name),
-            shell=True)
-        auth_details_json = json.loads(auth_details)
-        auth_details_string = json.dumps(auth_details_json)
-        create_repo_secret(repo_name, 'AZURE_CREDENTIALS', auth_details_string)
+        auth_details = get_deployment_service_principal(repo_name, app_name, scopes)
+        _create_secrets(repo_name, {'AZURE_CREDENTIALS': json.dumps(auth_details)})
+        wait_for_role_propagation(auth_details, scopes)
+
+
+def wait_for_role_propagation(auth_details, scopes, timeout=ROLE_PROPAGATION_TIMEOUT):
+    """ Waits until the service principal can sign in and holds permissions on every scope, so the
+    first workflow run does not fail on role assignments that have not propagated yet.
+    Returns False if the role assignments were not visible within timeout seconds.
+    :param auth_details: Output of az ad sp create-for-rbac --sdk-auth.
+    :type auth_details: dict
+    """
+    import msal
+    app = msal.ConfidentialClientApplication(
+        auth_details['clientId'], client_credential=auth_details['clientSecret'],
+        authority='{}/{}'.format(auth_details['activeDirectoryEndpointUrl'].rstrip('/'), auth_details['tenantId']))
+    resource_manager = auth_details['resourceManagerEndpointUrl'].rstrip('/')
+    pending_scopes = list(scopes)
+    deadline = time.time() + timeout
+    interval = _ROLE_PROPAGATION_MIN_INTERVAL
+    print('Waiting for the service principal role assignments to propagate...')
+    while True:
+        token = app.acquire_token_for_client(scopes=[resource_manager + '/.default'])
+        if 'access_token' in token:
+            pending_scopes = [scope for scope in pending_scopes
+                              if not _has_permissions(resource_manager, scope, token['access_token'])]
+            if not pending_scopes:
+                return True
+        else:
+            logger.debug('Service principal sign in not available yet: %s', token.get('error_description'))
+        if time.time() + interval > deadline:
+            logger.warning('The service principal role assignments did not propagate within %s seconds, '
+                           'the first workflow run may fail and need to be re-run.', timeout)
+            return False
+        time.sleep(interval)
+        interval = min(interval * 2, _ROLE_PROPAGATION_MAX_INTERVAL)
+
+
+def _has_permissions(resource_manager, scope, access_token):
+    import requests
+    permissions_url = '{}{}/providers/Microsoft.Authorization/permissions?api-version={}'.format(
+        resource_manager, scope, _PERMISSIONS_API_VERSION)
+    try:
+        response = requests.get(permissions_url, headers={'Authorization': 'Bearer ' + access_token},
+                                timeout=_PERMISSIONS_REQUEST_TIMEOUT)
+    except requests.exceptions.RequestException as ex:
+        logger.debug('Permissions on %s not visible yet: %s', scope, ex)
+        return False
+    if response.status_code != 200:
+        logger.debug('Permissions on %s not visible yet: %s', scope, response.status_code)
+        return False
+    return any(permission.get('actions') for permission in response.json().get('value', []))
+
+
+def get_deployment_service_principal(repo_name, target, scopes):
+    """ Returns sdk-auth credentials of the service principal deploying the repository to the target.
+    The principal has a name derived from both, an existing one gets its credentials reset and its role
+    assignments ensured instead of a new principal being created on every run. Only principals created
+    by this extension are reused, they are marked with their notes.
+    :rtype: dict
+    """
+    name = get_service_principal_name(repo_name, target, scopes)
+    existing = [sp for sp in invoke_az_command(['ad', 'sp', 'list', '--display-name', name])
+                if sp.get('displayName') == name]
+    if existing:
+        if existing[0].get('notes') != _SERVICE_PRINCIPAL_NOTES:
+            raise CLIError('A service principal named {} exists but was not created by this extension. '
+                           'Rename or delete it and try again.'.format(name))
+        print('Resetting the credentials of the service principal {}...'.format(name))
+        credentials = invoke_az_command(['ad', 'sp', 'credential', 'reset', '--id', existing[0]['appId']])
+        object_id = existing[0].get('id') or existing[0].get('objectId')
+        for scope in scopes:
+            _ensure_contributor_role(object_id, scope)
+    else:
+        print('Creating the service principal {}...'.format(name))
+        credentials = invoke_az_command(['ad', 'sp', 'create-for-rbac', '--name', name, '--role', 'contributor',
+                                         '--scopes'] + list(scopes))
+        try:
+            _mark_service_principal(credentials['appId'])
+        except BaseException:
+            # an unmarked principal would be refused by every later run
+            _delete_service_principal(name, credentials['appId'])
+            raise
+    return _get_sdk_auth(credentials)
+
+
+def _mark_service_principal(app_id, timeout=SERVICE_PRINCIPAL_UPDATE_TIMEOUT):
+    """ Writes the notes marking the service principal as created by this extension. A principal that was
+    just created may not be visible to the update yet, it is retried until it is or timeout seconds passed.
+    """
+    deadline = time.time() + timeout
+    interval = _ROLE_PROPAGATION_MIN_INTERVAL
+    while True:
+        try:
+            invoke_az_command(['ad', 'sp', 'update', '--id', app_id,
+                               '--set', 'notes={}'.format(_SERVICE_PRINCIPAL_NOTES)])
+            return
+        except CLIError as ex:
+            if time.time() + interval > deadline:
+                raise CLIError('Could not mark the service principal {} as created by this extension. {}'.format(
+                    app_id, ex)) from ex
+            logger.debug('The service principal %s can not be updated yet: %s', app_id, ex)
+        time.sleep(interval)
+        interval = min(interval * 2, _ROLE_PROPAGATION_MAX_INTERVAL)
+
+
+def _delete_service_principal(name, app_id):
+    logger.warning('Deleting the service principal %s created by this run.', name)
+    try:
+        # deleting the application deletes its service principal
+        invoke_az_command(['ad', 'app', 'delete', '--id', app_id])
+    except CLIError as ex:
+        logger.warning('Could not delete the service principal %s, delete it with az ad app delete --id %s. %s',
+                       name, app_id, ex)
+
+
+def get_service_principal_name(repo_name, target, scopes):
+    """ Name of the deployment service principal. Targets with the same name in other subscriptions or
+    resource groups get their own principal, told apart by a hash of the resource group of the first scope.
+    """
+    resource_group_scope = '/'.join(scopes[0].split('/')[:5]).lower()
+    scope_hash = hashlib.sha256(resource_group_scope.encode('utf-8')).hexdigest()[:_SCOPE_HASH_LENGTH]
+    return '{}-{}-{}-{}'.format(_SERVICE_PRINCIPAL_NAME_PREFIX, repo_name.replace('/', '-'), target,
+                                scope_hash).lower()
+
+
+def _ensure_contributor_role(object_id, scope):
+    assignments = invoke_az_command(['role', 'assignment', 'list', '--assignee', object_id, '--role', 'contributor',
+                                     '--scope', scope])
+    if assignments:
+        logger.debug('The service principal already is a contributor on %s.', scope)
+        return
+    invoke_az_command(['role', 'assignment', 'create', '--assignee-object-id', object_id,
+                       '--assignee-principal-type', 'ServicePrincipal', '--role', 'contributor', '--scope', scope])
+
+
+def _get_sdk_auth(credentials):
+    """ Credentials in the format azure/login expects, as printed by create-for-rbac --sdk-auth.
+    """
+    from azure.cli.core import get_default_cli
+    endpoints = get_default_cli().cloud.endpoints
+
+    def _endpoint(name):
+        return getattr(endpoints, name) if endpoints.has_endpoint_set(name) else None
+    return {
+        'clientId': credentials['appId'],
+        'clientSecret': credentials['password'],
+        'subscriptionId': get_account_context().subscription_id,
+        'tenantId': credentials['tenant'],
+        'activeDirectoryEndpointUrl': _endpoint('active_directory'),
+        'resourceManagerEndpointUrl': _endpoint('resource_manager'),
+        'activeDirectoryGraphResourceId': _endpoint('active_directory_graph_resource_id'),
+        'sqlManagementEndpointUrl': _endpoint('sql_management'),
+        'galleryEndpointUrl': _endpoint('gallery'),
+        'managementEndpointUrl': _endpoint('management')
+    }
+
+
+def _get_secret_names(repo_name, repo_context=None):
+    if repo_context:
+        return repo_context.get_secret_names()
+    return list_repo_secret_names(repo_name)
+
+
+def _create_secrets(repo_name, secrets):
+    results = create_repo_secrets(repo_name, secrets)
+    failed_secrets = [name for name, created in results.items() if not created]
+    if failed_secrets:
+        raise CLIError('Could not create the secret(s) {} in the repository {}.'.format(
+            ', '.join(failed_secrets), repo_name))
@@ -0,0 +1,169 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from knack.log import get_logger
+from azext_deploy_to_azure.dev.common.utils import singleton
+from azext_deploy_to_azure.dev.common.github_http_cache import GithubHttpCache, get_http_cache_key
+from azext_deploy_to_azure.dev.common.github_rate_limit import (GithubRateLimiter, IDEMPOTENT_METHODS,
+                                                                RATE_LIMIT_MAX_RETRIES)
+from azext_deploy_to_azure.version import VERSION
+
+logger = get_logger(__name__)
+
+GITHUB_API_URL = 'https://api.github.com'
+_POOL_MAXSIZE = 10
+_HTTP_SUCCESS_STATUS = 200
+_HTTP_NOT_MODIFIED_STATUS = 304
+
+
+@singleton
+class GithubClient():
+    """ GithubClient
+    Shared client for all GitHub API calls made during a command. Keeps TLS connections to
+    api.github.com alive in a requests.Session pool and holds the PAT and default headers.
+    """
+    def __init__(self):
+        self._token_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Drops the PAT, cached responses, rate limit budget and pooled connections.
+        """
+        self.token = None
+        self.http_cache = None
+        self.rate_limiter = GithubRateLimiter()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=_POOL_MAXSIZE, pool_maxsize=_POOL_MAXSIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'User-Agent': 'deploy-to-azure-cli-extension/{}'.format(VERSION)})
+
+    def authenticate(self, token_prefix, display_warning=False):
+        """ Resolve the PAT once and attach it to the session.
+        The PAT is process-wide: it is resolved for the token_prefix of the first call and used for
+        every later request, whatever their token_prefix. A command only talks to one repository.
+        """
+        if not self.token:
+            # preflight checks run concurrently, only one of them may prompt for the PAT
+            with self._token_lock:
+                if not self.token:
+                    from azext_deploy_to_azure.dev.common.github_credential_manager import GithubCredentialManager
+                    token = GithubCredentialManager().get_token(token_prefix=token_prefix,
+                                                                display_warning=display_warning)
+                    self.session.auth = ('', token)
+                    self.token = token
+        return self.token
+
+    def request(self, method, url, token_prefix=None, **kwargs):
+        """ Sends the request once the rate limiter allows it. Idempotent requests rejected by
+        the primary or secondary rate limit are retried after the wait advised by GitHub.
+        """
+        self.authenticate(token_prefix)
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            logger.debug('GitHub API request: %s %s', method, url)
+            response = self.session.request(method, url, **kwargs)
+            self.rate_limiter.update(response)
+            retry_delay = self.rate_limiter.get_retry_delay(response, attempt)
+            if retry_delay is None or method not in IDEMPOTENT_METHODS or attempt >= RATE_LIMIT_MAX_RETRIES:
+                return response
+            attempt = attempt + 1
+            logger.warning('GitHub API rate limit exceeded, retrying in %s seconds.', int(retry_delay))
+            time.sleep(retry_delay)
+
+    def get_rate_limit_budget(self):
+        """ Current primary rate limit budget, for callers that batch many requests.
+        """
+        return self.rate_limiter.get_budget()
+
+    def get(self, url, token_prefix=None, **kwargs):
+        return self.request('GET', url, token_prefix=token_prefix, **kwargs)
+
+    def cached_get(self, url, token_prefix=None, headers=None, **kwargs):
+        """ GET for read-only endpoints. Sends a conditional request when the response is cached
+        and serves the cached payload on 304.
+        """
+        token = self.authenticate(token_prefix)
+        if self.http_cache is None:
+            self.http_cache = GithubHttpCache()
+        headers = dict(headers or {})
+        key = get_http_cache_key(url, token, headers.get('Accept'))
+        entry = self.http_cache.get(key)
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        response = self.get(url, token_prefix=token_prefix, headers=headers, **kwargs)
+        if entry and response.status_code == _HTTP_NOT_MODIFIED_STATUS:
+            logger.debug('GitHub HTTP cache hit: %s', url)
+            self.http_cache.record(hit=True)
+            return _build_cached_response(url, entry, response)
+        self.http_cache.record(hit=False)
+        if response.status_code == _HTTP_SUCCESS_STATUS:
+            self.http_cache.put(key, response)
+        return response
+
+    def post(self, url, token_prefix=None, **kwargs):
+        return self.request('POST', url, token_prefix=token_prefix, **kwargs)
+
+    def put(self, url, token_prefix=None, **kwargs):
+        return self.request('PUT', url, token_prefix=token_prefix, **kwargs)
+
+    def patch(self, url, token_prefix=None, **kwargs):
+        return self.request('PATCH', url, token_prefix=token_prefix, **kwargs)
+
+    def delete(self, url, token_prefix=None, **kwargs):
+        return self.request('DELETE', url, token_prefix=token_prefix, **kwargs)
+
+    def get_connection_stats(self):
+        """ Returns the number of requests sent and TLS connections opened by the session.
+        reused is the number of requests that did not need a new connection.
+        """
+        connections = 0
+        sent_requests = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                connections = connections + pool.num_connections
+                sent_requests = sent_requests + pool.num_requests
+        return {
+            'requests': sent_requests,
+            'connections': connections,
+            'reused': max(sent_requests - connections, 0)
+        }
+
+    def log_connection_stats(self):
+        stats = self.get_connection_stats()
+        logger.debug('GitHub API connection stats: %s requests over %s connections (%s reused).',
+                     stats['requests'], stats['connections'], stats['reused'])
+        if self.http_cache is not None:
+            cache_stats = self.http_cache.get_stats()
+            logger.debug('GitHub HTTP cache stats: %s hits, %s misses.', cache_stats['hits'], cache_stats['misses'])
+        return stats
+
+
+def _build_cached_response(url, entry, not_modified_response):
+    response = requests.Response()
+    response.status_code = _HTTP_SUCCESS_STATUS
+    response.reason = 'OK'
+    response.url = url
+    response.encoding = 'utf-8'
+    response.headers = CaseInsensitiveDict(not_modified_response.headers)
+    if entry['content_type']:
+        response.headers['Content-Type'] = entry['content_type']
+    response._content = entry['body'].encode('utf-8')  # pylint: disable=protected-access
+    return response
+
+
+def get_github_client():
+    return GithubClient()
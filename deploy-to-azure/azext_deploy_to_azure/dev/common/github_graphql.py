@@ -0,0 +1,81 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+from collections import OrderedDict
+from knack.log import get_logger
+from azext_deploy_to_azure.dev.common.github_client import get_github_client
+from azext_deploy_to_azure.dev.common.github_api_helper import get_application_json_header
+
+logger = get_logger(__name__)
+
+GITHUB_GRAPHQL_URL = 'https://api.github.com/graphql'
+_HTTP_SUCCESS_STATUS = 200
+_MAX_LANGUAGES = 20
+
+_REPOSITORY_PROBE_QUERY = """query ({variables}) {{
+  repository(owner: $owner, name: $name) {{
+    defaultBranchRef {{
+      name
+    }}
+    languages(first: {max_languages}, orderBy: {{field: SIZE, direction: DESC}}) {{
+      edges {{
+        size
+        node {{
+          name
+        }}
+      }}
+    }}
+{file_probes}
+  }}
+}}"""
+
+_FILE_PROBE = """    file{index}: object(expression: $file{index}) {{
+      oid
+    }}"""
+
+
+def probe_repository(repo_name, file_paths=None, graphql_url=None):
+    """ Discovers the repository metadata needed by the up commands with a single GraphQL query.
+    API Documentation - https://developer.github.com/v4/object/repository/
+    Returns dict with languages, default_branch, existing_files and file_shas
+    None if the GraphQL API could not answer, the caller should fall back to the REST API
+    """
+    file_paths = file_paths or []
+    owner, name = repo_name.split('/', 1)
+    variables = {'owner': owner, 'name': name}
+    variable_definitions = ['$owner: String!', '$name: String!']
+    for index, path in enumerate(file_paths):
+        variables['file{}'.format(index)] = 'HEAD:' + path.strip('/')
+        variable_definitions.append('$file{}: String!'.format(index))
+    query = _REPOSITORY_PROBE_QUERY.format(
+        variables=', '.join(variable_definitions),
+        max_languages=_MAX_LANGUAGES,
+        file_probes='\n'.join(_FILE_PROBE.format(index=index) for index in range(len(file_paths))))
+    try:
+        response = get_github_client().post(graphql_url or GITHUB_GRAPHQL_URL, token_prefix=repo_name,
+                                            json={'query': query, 'variables': variables},
+                                            headers=get_application_json_header())
+        if not response.status_code == _HTTP_SUCCESS_STATUS:
+            logger.debug('GraphQL repository probe failed. Status Code (%s).', response.status_code)
+            return None
+        result = response.json()
+    except Exception as ex:  # pylint: disable=broad-except
+        logger.debug('GraphQL repository probe failed. Error: %s', ex)
+        return None
+    repository = (result.get('data') or {}).get('repository')
+    if result.get('errors') or not repository or not repository.get('defaultBranchRef'):
+        logger.debug('GraphQL repository probe returned errors: %s', result.get('errors'))
+        return None
+    languages = OrderedDict()
+    for edge in repository['languages']['edges']:
+        languages[edge['node']['name']] = edge['size']
+    return {
+        'languages': languages,
+        'default_branch': repository['defaultBranchRef']['name'],
+        'existing_files': {path: repository.get('file{}'.format(index)) is not None
+                           for index, path in enumerate(file_paths)},
+        'file_shas': {path: (repository.get('file{}'.format(index)) or {}).get('oid')
+                      for index, path in enumerate(file_paths)}
+    }
@@ -0,0 +1,127 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+import atexit
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+HTTP_CACHE_FILE_NAME = 'github_http_cache.json'
+HTTP_CACHE_MAX_SIZE = 5 * 1024 * 1024
+
+
+def get_default_http_cache_path():
+    from azure.cli.core._environment import get_config_dir
+    return os.path.join(get_config_dir(), 'deploy-to-azure', HTTP_CACHE_FILE_NAME)
+
+
+def get_http_cache_key(url, token, accept=None):
+    """ Cache key for a GET request. The token is only stored as a hash so that
+    responses cached for one identity are never served to another.
+    """
+    token_hash = hashlib.sha256((token or '').encode('utf-8')).hexdigest()[:16]
+    return '{token} {accept} {url}'.format(token=token_hash, accept=accept or '', url=url)
+
+
+class GithubHttpCache():
+    """ GithubHttpCache
+    Persistent, size bounded LRU cache of GitHub GET responses with their ETag and Last-Modified
+    validators. Entries are revalidated with conditional requests, a 304 reply does not count
+    against the primary rate limit.
+    New entries are written to disk once, when the command exits, or when flush is called.
+    """
+    def __init__(self, path=None, max_size=HTTP_CACHE_MAX_SIZE):
+        self.path = path or get_default_http_cache_path()
+        self.max_size = max_size
+        self._requests = {'hits': 0, 'misses': 0}
+        self._entries = None
+        self._size = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+            return entry
+
+    def put(self, key, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        entry = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_type': response.headers.get('Content-Type'),
+            'body': response.text
+        }
+        with self._lock:
+            entries = self._load()
+            if key in entries:
+                self._size = self._size - len(entries.pop(key)['body'])
+            entries[key] = entry
+            self._size = self._size + len(entry['body'])
+            while self._size > self.max_size and entries:
+                _evicted_key, evicted = entries.popitem(last=False)
+                self._size = self._size - len(evicted['body'])
+            if not self._dirty:
+                self._dirty = True
+                atexit.register(self.flush)
+
+    def record(self, hit):
+        with self._lock:
+            outcome = 'hits' if hit else 'misses'
+            self._requests[outcome] = self._requests[outcome] + 1
+
+    def flush(self):
+        """ Writes the entries added since the last flush to the cache file.
+        """
+        with self._lock:
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+    def get_stats(self):
+        stats = dict(self._requests)
+        stats.update({'entries': len(self._entries or {}), 'size': self._size})
+        return stats
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = OrderedDict()
+            try:
+                with open(self.path, 'r', encoding='utf-8') as cache_file:
+                    self._entries = OrderedDict(json.load(cache_file))
+            except (IOError, OSError, ValueError) as ex:
+                logger.debug('GitHub HTTP cache not loaded: %s', ex)
+            self._size = sum(len(entry['body']) for entry in self._entries.values())
+        return self._entries
+
+    def _save(self):
+        try:
+            cache_dir = os.path.dirname(self.path)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            # Cached payloads may come from private repositories, mkstemp keeps the file readable by the user only.
+            # Each process writes its own temporary file, the last one replacing the cache file wins.
+            fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(self.path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as cache_file:
+                    json.dump(list(self._entries.items()), cache_file)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except (IOError, OSError) as ex:
+            logger.debug('GitHub HTTP cache not saved: %s', ex)
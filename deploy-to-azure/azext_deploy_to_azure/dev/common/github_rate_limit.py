@@ -0,0 +1,119 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import time
+import random
+import threading
+from datetime import datetime
+from knack.log import get_logger
+from knack.util import CLIError
+
+logger = get_logger(__name__)
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+RATE_LIMIT_MAX_RETRIES = 3
+# Longest wait for the rate limit, the command fails instead of waiting longer
+RATE_LIMIT_MAX_WAIT = 60
+# Below this many remaining requests, calls are spread evenly until the rate limit window resets
+_LOW_BUDGET_THRESHOLD = 50
+_SECONDARY_BACKOFF_BASE = 5
+_SECONDARY_BACKOFF_MAX = 60
+_HTTP_FORBIDDEN_STATUS = 403
+_HTTP_TOO_MANY_REQUESTS_STATUS = 429
+_HTTP_NOT_MODIFIED_STATUS = 304
+
+
+class GithubRateLimiter():
+    """ GithubRateLimiter
+    Tracks the primary rate limit budget reported in the X-RateLimit-* response headers,
+    paces requests when the budget runs low and computes the wait before retrying
+    requests rejected by the primary or secondary rate limits.
+    """
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ Blocks as long as needed to keep the remaining budget from running out before the reset.
+        Raises CLIError if the budget is exhausted for longer than RATE_LIMIT_MAX_WAIT.
+        """
+        with self._lock:
+            delay = self._get_pacing_delay()
+            if self.remaining:
+                self.remaining = self.remaining - 1
+        _check_wait(delay)
+        if delay > 0:
+            if delay > 1:
+                logger.warning('GitHub API rate limit is almost exhausted, waiting %s seconds.', int(delay))
+            time.sleep(delay)
+
+    def update(self, response):
+        headers = response.headers
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            if response.status_code == _HTTP_NOT_MODIFIED_STATUS:
+                # conditional requests answered with 304 do not count against the rate limit
+                with self._lock:
+                    if self.remaining is not None:
+                        self.remaining = self.remaining + 1
+            return
+        with self._lock:
+            self.limit = int(headers.get('X-RateLimit-Limit', self.limit or 0))
+            self.remaining = int(remaining)
+            self.reset = int(reset)
+
+    def get_retry_delay(self, response, attempt):
+        """ Returns seconds to wait before retrying a request rejected by a rate limit,
+        None if the response is not a rate limit error.
+        Raises CLIError if GitHub asks to wait longer than RATE_LIMIT_MAX_WAIT.
+        """
+        if response.status_code not in (_HTTP_FORBIDDEN_STATUS, _HTTP_TOO_MANY_REQUESTS_STATUS):
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                delay = max(float(retry_after), 0)
+            except ValueError:
+                delay = None
+            if delay is not None:
+                _check_wait(delay)
+                return delay
+        if response.headers.get('X-RateLimit-Remaining') == '0' and self.reset:
+            delay = max(self.reset - time.time(), 0) + 1
+            _check_wait(delay)
+            return delay
+        if 'rate limit' in (response.text or '').lower():
+            # Secondary rate limit without a hint, back off exponentially with full jitter
+            backoff = min(_SECONDARY_BACKOFF_BASE * (2 ** attempt), _SECONDARY_BACKOFF_MAX)
+            return random.uniform(backoff / 2, backoff)
+        return None
+
+    def get_budget(self):
+        """ Returns the last known primary rate limit budget.
+        limit, remaining : None until the first response has been received
+        reset : Epoch seconds at which the budget is replenished
+        """
+        with self._lock:
+            return {'limit': self.limit, 'remaining': self.remaining, 'reset': self.reset}
+
+    def _get_pacing_delay(self):
+        if self.remaining is None or self.reset is None or self.remaining > _LOW_BUDGET_THRESHOLD:
+            return 0
+        seconds_to_reset = self.reset - time.time()
+        if seconds_to_reset <= 0:
+            self.remaining = None
+            return 0
+        if self.remaining <= 0:
+            return seconds_to_reset + 1
+        return min(seconds_to_reset / self.remaining, RATE_LIMIT_MAX_WAIT)
+
+
+def _check_wait(delay):
+    if delay > RATE_LIMIT_MAX_WAIT:
+        reset_time = datetime.fromtimestamp(time.time() + delay).strftime('%Y-%m-%d %H:%M:%S')
+        raise CLIError('GitHub API rate limit exceeded. Try again after {}.'.format(reset_time))
@@ -0,0 +1,111 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import hmac
+import json
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+WEBHOOK_EVENTS = ['check_run', 'workflow_run']
+_HTTP_ACCEPTED_STATUS = 202
+_HTTP_UNAUTHORIZED_STATUS = 401
+
+
+def get_webhook_signature(secret, body):
+    """ Signature GitHub sends in the X-Hub-Signature-256 header of webhook deliveries.
+    """
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+class WorkflowWebhookReceiver():
+    """ WorkflowWebhookReceiver
+    Local HTTP receiver for the check_run and workflow_run webhook events of a workflow run.
+    GitHub reaches it through a tunnel or relay supplied by the user. Deliveries that are not
+    signed with the webhook secret are rejected.
+    :param secret: Secret the webhook was registered with.
+    :type secret: str
+    :param check_run_id: Check run to wait for.
+    :type check_run_id: int
+    :param check_suite_id: Check suite of the check run, identifies the workflow run to wait for.
+    :type check_suite_id: int
+    :param port: Local port to listen on, 0 picks a free port.
+    :type port: int
+    """
+    def __init__(self, secret, check_run_id=None, check_suite_id=None, port=0, host='127.0.0.1'):
+        self.secret = secret
+        self.check_run_id = check_run_id
+        self.check_suite_id = check_suite_id
+        self.result = None
+        self._completed = threading.Event()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+
+    def start(self):
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        logger.debug('Listening for GitHub webhook events on port %s', self.port)
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def wait(self, timeout=None):
+        """ Waits up to timeout seconds for the completion event.
+        Returns status, conclusion of the completed run or None if no completion event arrived.
+        """
+        if self._completed.wait(timeout):
+            return self.result
+        return None
+
+    def verify_signature(self, body, signature):
+        if not signature:
+            return False
+        return hmac.compare_digest(get_webhook_signature(self.secret, body), signature)
+
+    def handle_event(self, event, payload):
+        if event == 'check_run':
+            run = payload.get('check_run') or {}
+            matches = run.get('id') == self.check_run_id
+        elif event == 'workflow_run':
+            run = payload.get('workflow_run') or {}
+            matches = self.check_suite_id is not None and run.get('check_suite_id') == self.check_suite_id
+        else:
+            return
+        if matches and run.get('status') == 'completed':
+            logger.debug('Received %s completion event for the workflow.', event)
+            self.result = (run.get('status'), run.get('conclusion'))
+            self._completed.set()
+
+
+def _make_handler(receiver):
+    class _WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if not receiver.verify_signature(body, self.headers.get('X-Hub-Signature-256')):
+                logger.debug('Rejected GitHub webhook delivery with an invalid signature.')
+                self._reply(_HTTP_UNAUTHORIZED_STATUS)
+                return
+            try:
+                payload = json.loads(body.decode('utf-8'))
+            except ValueError:
+                payload = {}
+            receiver.handle_event(self.headers.get('X-GitHub-Event'), payload)
+            self._reply(_HTTP_ACCEPTED_STATUS)
+
+        def _reply(self, status_code):
+            self.send_response(status_code)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            logger.debug('Webhook receiver: ' + format, *args)
+    return _WebhookHandler
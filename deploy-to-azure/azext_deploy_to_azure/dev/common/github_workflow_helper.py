@@ -7,40 +7,82 @@
 from knack.util import CLIError
 from knack.log import get_logger
 
-from azext_deploy_to_azure.dev.common.github_api_helper import get_check_run_status_and_conclusion
+from azext_deploy_to_azure.dev.common.github_api_helper import (get_check_run, get_check_run_status_and_conclusion,
+                                                                create_repo_webhook, delete_repo_webhook)
+from azext_deploy_to_azure.dev.common.github_webhook_receiver import WorkflowWebhookReceiver, WEBHOOK_EVENTS
+from azext_deploy_to_azure.dev.common.github_client import get_github_client
 from azext_deploy_to_azure.dev.common.prompting import prompt_not_empty
+from azext_deploy_to_azure.dev.common.const import GITHUB_WORKFLOW_PATH
 
 logger = get_logger(__name__)
 
+MAX_POLL_INTERVAL = 30
+WEBHOOK_PORT_DEFAULT = 8787
+_WEBHOOK_FALLBACK_POLL_INTERVAL = 120
+_MIN_POLL_INTERVAL = 2
+_SPINNER_INTERVAL = 0.5
 
-def poll_workflow_status(repo_name, check_run_id):
+
+def poll_workflow_status(repo_name, check_run_id, max_poll_interval=MAX_POLL_INTERVAL, timeout=None,
+                         webhook_url=None, webhook_port=None):
+    """ Waits for the check run to complete.
+    The spinner refreshes every half second while the check run is polled with exponential
+    backoff up to max_poll_interval seconds.
+    When webhook_url is given, a local receiver listens on webhook_port for the check_run and
+    workflow_run events GitHub delivers to webhook_url, and completes as soon as the completion
+    event arrives. Polling continues at a slower rate in case no event arrives.
+    :param max_poll_interval: Maximum seconds between two polls of the check run.
+    :type max_poll_interval: int
+    :param timeout: Seconds to wait for completion before giving up. Waits indefinitely if None.
+    :type timeout: int
+    :param webhook_url: Public URL of a tunnel or relay forwarding to webhook_port on this machine.
+    :type webhook_url: str
+    :param webhook_port: Local port for the webhook receiver. Default is 8787
+    :type webhook_port: int
+    """
     import colorama
     import humanfriendly
     import time
-    check_run_status = None
-    check_run_status, check_run_conclusion = get_check_run_status_and_conclusion(repo_name, check_run_id)
-    if check_run_status == 'queued':
-        # When workflow status is Queued
-        colorama.init()
-        with humanfriendly.Spinner(label="Workflow is in queue") as spinner:  # pylint: disable=no-member
-            while True:
-                spinner.step()
-                time.sleep(0.5)
-                check_run_status, check_run_conclusion = get_check_run_status_and_conclusion(repo_name, check_run_id)
-                if check_run_status in ('in_progress', 'completed'):
-                    break
-        colorama.deinit()
-    if check_run_status == 'in_progress':
-        # When workflow status is inprogress
-        colorama.init()
-        with humanfriendly.Spinner(label="Workflow is in progress") as spinner:  # pylint: disable=no-member
-            while True:
-                spinner.step()
-                time.sleep(0.5)
-                check_run_status, check_run_conclusion = get_check_run_status_and_conclusion(repo_name, check_run_id)
-                if check_run_status == 'completed':
-                    break
-        colorama.deinit()
+    deadline = time.time() + timeout if timeout else None
+    receiver, hook_id = None, None
+    if webhook_url:
+        receiver, hook_id = _start_webhook_receiver(repo_name, check_run_id, webhook_url, webhook_port)
+        if receiver:
+            max_poll_interval = max(max_poll_interval, _WEBHOOK_FALLBACK_POLL_INTERVAL)
+    try:
+        check_run_status, check_run_conclusion = get_check_run_status_and_conclusion(repo_name, check_run_id)
+        while check_run_status != 'completed':
+            label = 'Workflow is in queue' if check_run_status == 'queued' else 'Workflow is in progress'
+            previous_status = check_run_status
+            poll_interval = _MIN_POLL_INTERVAL
+            next_poll = time.time() + poll_interval
+            colorama.init()
+            try:
+                with humanfriendly.Spinner(label=label) as spinner:  # pylint: disable=no-member
+                    while check_run_status == previous_status:
+                        spinner.step()
+                        event_result = receiver.wait(_SPINNER_INTERVAL) if receiver else None
+                        if event_result:
+                            check_run_status, check_run_conclusion = event_result
+                            break
+                        if not receiver:
+                            time.sleep(_SPINNER_INTERVAL)
+                        now = time.time()
+                        if deadline and now >= deadline:
+                            raise CLIError('Workflow did not complete within {} seconds. Please check the '
+                                           '\'Actions\' tab in your GitHub repo for its status.'.format(timeout))
+                        if now >= next_poll:
+                            check_run_status, check_run_conclusion = get_check_run_status_and_conclusion(
+                                repo_name, check_run_id)
+                            poll_interval = min(poll_interval * 2, max_poll_interval)
+                            next_poll = now + poll_interval
+            finally:
+                colorama.deinit()
+    finally:
+        if receiver:
+            receiver.stop()
+            delete_repo_webhook(repo_name, hook_id)
+    get_github_client().log_connection_stats()
     print('GitHub workflow completed.')
     if check_run_conclusion == 'success':
         print('Workflow succeeded')
@@ -48,9 +90,44 @@ def poll_workflow_status(repo_name, check_run_id):
         raise CLIError('Workflow status: {}'.format(check_run_conclusion))
 
 
+def _start_webhook_receiver(repo_name, check_run_id, webhook_url, webhook_port):
+    """ Starts the local receiver and registers the repository webhook delivering to it.
+    Returns receiver, hook_id or None, None if webhook mode could not be set up.
+    """
+    import secrets
+    secret = secrets.token_hex(20)
+    webhook_port = webhook_port or WEBHOOK_PORT_DEFAULT
+    # workflow_run events of the same commit may belong to other workflows, the check suite identifies ours
+    check_suite_id = (get_check_run(repo_name, check_run_id).get('check_suite') or {}).get('id')
+    try:
+        receiver = WorkflowWebhookReceiver(secret, check_run_id=check_run_id, check_suite_id=check_suite_id,
+                                           port=webhook_port).start()
+    except (IOError, OSError) as ex:
+        logger.warning('Could not start the webhook receiver on port %s, waiting for the workflow by polling. '
+                       'Error: %s', webhook_port, ex)
+        return None, None
+    try:
+        hook_id = create_repo_webhook(repo_name, webhook_url, secret, WEBHOOK_EVENTS)
+    except CLIError as ex:
+        receiver.stop()
+        logger.warning('Could not register the webhook, waiting for the workflow by polling. %s', ex)
+        return None, None
+    logger.warning('Waiting for workflow events delivered to %s', webhook_url)
+    return receiver, hook_id
+
+
 def get_new_workflow_yaml_name():
     logger.warning('A yaml file main.yml already exists in the .github/workflows folder.')
     new_workflow_yml_name = prompt_not_empty(
         msg='Enter a new name for workflow yml file: ',
         help_string='e.g. /new_main.yml to add in the .github/workflows folder.')
     return new_workflow_yml_name
+
+
+def resolve_workflow_yaml_path(repo_context, workflow_file):
+    """ Keeps the workflow at its path when the repository already has it with the same content, as when
+    up runs again, otherwise asks for a new name if another file exists at that path.
+    """
+    if repo_context.file_exists(workflow_file.path) and not repo_context.is_file_up_to_date(workflow_file):
+        workflow_file.path = GITHUB_WORKFLOW_PATH + get_new_workflow_yaml_name()
+    return workflow_file
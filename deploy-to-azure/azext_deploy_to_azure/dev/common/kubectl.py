@@ -2,24 +2,107 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
+import json
+import subprocess
+import threading
 from knack.log import get_logger
 from knack.util import CLIError
 from azext_deploy_to_azure.dev.common.utils import which
 
 logger = get_logger(__name__)
 
+# Seconds to wait for Azure to assign the public address of the load balancer
+SERVICE_ADDRESS_TIMEOUT = 600
 
-def get_deployment_IP_port(release_name, language):
-    if not which('kubectl'):
+
+def get_service_endpoints(release_name, timeout=SERVICE_ADDRESS_TIMEOUT, client=None):
+    """ Waits until every LoadBalancer service of the release has a public address.
+    :param release_name: Name of the helm release, services of the chart are prefixed with it.
+    :type release_name: str
+    :param timeout: Seconds to wait for the addresses.
+    :type timeout: int
+    :param client: Client of the cluster API server, kubectl and its current context are used if not given.
+    :type client: KubernetesClient
+    :return: Public IP or hostname and the ports of each service, by service name.
+    :rtype: dict
+    """
+    if client is None and not which('kubectl'):
         raise CLIError('Can not find kubectl executable in PATH')
+    services = {}
+    service_list = client.list_services() if client else _list_services_with_kubectl()
+    for service in service_list.get('items', []):
+        _update_service(services, release_name, service)
+    # the release created its services before the workflow completed, none of them will show up later
+    if not services:
+        raise CLIError('Could not find a LoadBalancer service of the release {}.'.format(release_name))
+    if all(address for address, _ in services.values()):
+        return services
+
+    logger.warning('Waiting for the public address of the service...')
+    if client:
+        resource_version = service_list.get('metadata', {}).get('resourceVersion')
+        events = client.watch_services(resource_version=resource_version, timeout=timeout)
+    else:
+        events = _watch_services_with_kubectl(timeout)
+    try:
+        for service in events:
+            _update_service(services, release_name, service)
+            if all(address for address, _ in services.values()):
+                return services
+    finally:
+        events.close()
+    pending = sorted(name for name, (address, _) in services.items() if not address)
+    raise CLIError('Timed out waiting for the public address of the services: {}'.format(', '.join(pending)))
+
+
+def _list_services_with_kubectl():
     try:
-        import subprocess
-        import json
-        service_name = release_name + '-' + language.lower()
-        service_details = subprocess.check_output('kubectl get service {} -o json'.format(service_name), shell=True)
-        service_obj = json.loads(service_details)
-        deployment_ip = service_obj['status']['loadBalancer']['ingress'][0]['ip']
-        port = service_obj['spec']['ports'][0]['port']
-        return deployment_ip, port
+        return json.loads(subprocess.check_output(['kubectl', 'get', 'services', '-o', 'json']))
     except subprocess.CalledProcessError as err:
-        raise CLIError('Could not find app/service: {}'.format(err))
+        raise CLIError('Could not find app/service: {}'.format(err)) from err
+
+
+def _watch_services_with_kubectl(timeout):
+    # the watch prints the current state of every service, then each change
+    with subprocess.Popen(['kubectl', 'get', 'services', '--watch', '-o', 'json'],
+                          stdout=subprocess.PIPE, universal_newlines=True) as process:
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        try:
+            yield from _read_json_stream(process.stdout)
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+    if process.returncode > 0:
+        raise CLIError('Could not watch the services with kubectl.')
+
+
+def _update_service(services, release_name, service):
+    name = service.get('metadata', {}).get('name', '')
+    spec = service.get('spec', {})
+    if not (name == release_name or name.startswith(release_name + '-')) or spec.get('type') != 'LoadBalancer':
+        return
+    ingress = (service.get('status', {}).get('loadBalancer', {}).get('ingress') or [{}])[0]
+    address = ingress.get('ip') or ingress.get('hostname')
+    services[name] = (address, [port['port'] for port in spec.get('ports', [])])
+
+
+def _read_json_stream(stream):
+    """ Yields the objects of a stream of concatenated JSON documents, as printed by kubectl get --watch -o json.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    for line in stream:
+        buffer += line
+        # documents are indented, one ends with a closing brace at the start of a line
+        if not line.startswith('}'):
+            continue
+        buffer = buffer.lstrip()
+        while buffer:
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except ValueError:
+                break
+            buffer = buffer[end:].lstrip()
+            yield from obj.get('items', [obj])
@@ -0,0 +1,121 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import ssl
+import json
+import base64
+import requests
+from requests.adapters import HTTPAdapter
+from knack.log import get_logger
+from knack.util import CLIError
+
+logger = get_logger(__name__)
+
+DEFAULT_NAMESPACE = 'default'
+_POOL_SIZE = 10
+_CONNECT_TIMEOUT = 10
+_REQUEST_TIMEOUT = 30
+
+
+class KubernetesClient:
+    """ Minimal client of the Kubernetes API server, keeping its connections open across requests.
+    """
+
+    def __init__(self, server, ssl_context, token=None):
+        self.server = server.rstrip('/')
+        self._session = requests.Session()
+        self._session.mount('https://', _SSLContextAdapter(ssl_context, pool_maxsize=_POOL_SIZE))
+        if token:
+            self._session.headers['Authorization'] = 'Bearer {}'.format(token)
+
+    @classmethod
+    def from_kubeconfig(cls, kubeconfig):
+        """ Creates a client for the current context of a kubeconfig, keeping the credentials in memory.
+        The user must authenticate with a bearer token. ssl can only load a client certificate from a file,
+        so users with only a client certificate are left to kubectl rather than writing their key to disk.
+        :param kubeconfig: Parsed kubeconfig.
+        :type kubeconfig: dict
+        :return: The client, or None if the user authenticates in a way only kubectl supports.
+        """
+        context_name = kubeconfig.get('current-context')
+        context = _get_named(kubeconfig, 'context', context_name)
+        cluster = _get_named(kubeconfig, 'cluster', context.get('cluster'))
+        user = _get_named(kubeconfig, 'user', context.get('user'))
+        if 'exec' in user or 'auth-provider' in user:
+            logger.debug('The user of the context %s authenticates through a plugin.', context_name)
+            return None
+        if not user.get('token'):
+            logger.warning('The cluster credentials have no token, they are merged into your kubeconfig '
+                           'for kubectl instead of being kept in memory.')
+            return None
+        ssl_context = ssl.create_default_context()
+        if cluster.get('certificate-authority-data'):
+            ssl_context = ssl.create_default_context(
+                cadata=base64.b64decode(cluster['certificate-authority-data']).decode('ascii'))
+        return cls(cluster['server'], ssl_context, token=user['token'])
+
+    def list_services(self, namespace=DEFAULT_NAMESPACE):
+        response = self._session.get(self._services_url(namespace), timeout=(_CONNECT_TIMEOUT, _REQUEST_TIMEOUT))
+        _check_response(response)
+        return response.json()
+
+    def watch_services(self, namespace=DEFAULT_NAMESPACE, resource_version=None, timeout=None):
+        """ Yields the services of the namespace as they change, until the server ends the watch after timeout.
+        """
+        params = {'watch': 'true'}
+        if resource_version:
+            params['resourceVersion'] = resource_version
+        if timeout:
+            params['timeoutSeconds'] = int(timeout)
+        response = self._session.get(self._services_url(namespace), params=params, stream=True,
+                                     timeout=(_CONNECT_TIMEOUT, timeout + _REQUEST_TIMEOUT if timeout else None))
+        try:
+            _check_response(response)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get('type') == 'ERROR':
+                    raise CLIError('Watching the services failed: {}'.format(event['object'].get('message')))
+                yield event['object']
+        finally:
+            response.close()
+
+    def close(self):
+        self._session.close()
+
+    def _services_url(self, namespace):
+        return '{}/api/v1/namespaces/{}/services'.format(self.server, namespace)
+
+
+class _SSLContextAdapter(HTTPAdapter):
+    """ Transport adapter verifying the API server with the certificate authority of the kubeconfig.
+    """
+
+    def __init__(self, ssl_context, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+        # trust only the certificate authority of the cluster, not the default bundle
+        conn.ca_certs = None
+        conn.ca_cert_dir = None
+
+
+def _get_named(kubeconfig, kind, name):
+    for item in kubeconfig.get(kind + 's') or []:
+        if item.get('name') == name:
+            return item.get(kind) or {}
+    raise CLIError('Could not find the {} {} in the cluster credentials.'.format(kind, name))
+
+
+def _check_response(response):
+    if response.status_code != 200:
+        raise CLIError('Kubernetes API request failed with status {}. {}'.format(response.status_code, response.text))
@@ -0,0 +1,96 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor
+from knack.log import get_logger
+from azext_deploy_to_azure.dev.common.github_api_helper import (get_languages_for_repo, get_default_branch,
+                                                                check_file_exists, list_repo_secret_names,
+                                                                get_file_blob_sha)
+from azext_deploy_to_azure.dev.common.github_graphql import probe_repository
+
+logger = get_logger(__name__)
+
+_PREFLIGHT_MAX_WORKERS = 8
+
+
+class RepoContext():
+    """ RepoContext
+    Repository metadata gathered by the preflight checks.
+    :param repo_name: Repository id in the owner/repo form.
+    :type repo_name: str
+    :param languages: Language breakdown of the repository, ordered by size.
+    :type languages: dict
+    :param default_branch: Name of the default branch.
+    :type default_branch: str
+    :param existing_files: Checked file path to whether it exists in the repository.
+    :type existing_files: dict
+    :param secret_names: Names of all secrets in the repository, listed on first use when None.
+    :type secret_names: set
+    :param file_shas: Checked file path to its git blob sha, None if it does not exist.
+    :type file_shas: dict
+    """
+    def __init__(self, repo_name, languages, default_branch, existing_files=None, secret_names=None,
+                 file_shas=None):
+        self.repo_name = repo_name
+        self.languages = languages
+        self.default_branch = default_branch
+        self.existing_files = existing_files or {}
+        self.secret_names = secret_names
+        self.file_shas = file_shas or {}
+
+    def file_exists(self, path):
+        if path not in self.existing_files:
+            self.existing_files[path] = check_file_exists(self.repo_name, path)
+        return self.existing_files[path]
+
+    def is_file_up_to_date(self, file):
+        """ Whether the file is in the default branch with the same content.
+        :type file: azext_deploy_to_azure.dev.common.github_api_helper.Files
+        """
+        if file.path not in self.file_shas:
+            self.file_shas[file.path] = get_file_blob_sha(self.repo_name, file.path)
+        return self.file_shas[file.path] == file.blob_sha
+
+    def get_secret_names(self):
+        if self.secret_names is None:
+            self.secret_names = list_repo_secret_names(self.repo_name)
+        return self.secret_names
+
+
+def run_repo_preflight(repo_name, file_paths=None, list_secrets=False):
+    """ Runs the independent repository checks concurrently.
+    Languages, default branch and file existence come from one GraphQL query, falling back to
+    the REST API. Secrets are only visible through the REST API and are listed alongside.
+    The PAT must already be resolved since the checks run on worker threads.
+    :param file_paths: Paths to check for existence on the default branch.
+    :type file_paths: list
+    :param list_secrets: Whether to list the names of the repository secrets.
+    :type list_secrets: bool
+    :rtype: RepoContext
+    """
+    file_paths = file_paths or []
+    with ThreadPoolExecutor(max_workers=_PREFLIGHT_MAX_WORKERS) as executor:
+        secrets_future = executor.submit(list_repo_secret_names, repo_name) if list_secrets else None
+        probe = probe_repository(repo_name, file_paths)
+        if probe:
+            repo_context = RepoContext(repo_name=repo_name, languages=probe['languages'],
+                                       default_branch=probe['default_branch'],
+                                       existing_files=probe['existing_files'],
+                                       file_shas=probe['file_shas'])
+        else:
+            logger.debug('Falling back to the REST API for repository discovery.')
+            languages_future = executor.submit(get_languages_for_repo, repo_name)
+            default_branch_future = executor.submit(get_default_branch, repo_name)
+            file_futures = {path: executor.submit(check_file_exists, repo_name, path) for path in file_paths}
+            repo_context = RepoContext(
+                repo_name=repo_name,
+                languages=languages_future.result(),
+                default_branch=default_branch_future.result(),
+                existing_files={path: future.result() for path, future in file_futures.items()})
+        if secrets_future:
+            repo_context.secret_names = secrets_future.result()
+    logger.debug('Preflight checks for %s: files %s, secrets %s', repo_name,
+                 repo_context.existing_files, repo_context.secret_names)
+    return repo_context
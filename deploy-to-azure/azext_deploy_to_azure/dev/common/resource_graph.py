@@ -0,0 +1,90 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+from knack.log import get_logger
+from azext_deploy_to_azure.dev.common.utils import get_extension_config, EXTENSION_CONFIG_SECTION
+
+logger = get_logger(__name__)
+
+RESOURCE_GRAPH_URL = '/providers/Microsoft.ResourceGraph/resources?api-version=2021-03-01'
+AKS_RESOURCE_TYPE = 'microsoft.containerservice/managedclusters'
+ACR_RESOURCE_TYPE = 'microsoft.containerregistry/registries'
+FUNCTIONAPP_RESOURCE_TYPE = 'microsoft.web/sites'
+GROUP_RESOURCE_TYPE = 'microsoft.resources/subscriptions/resourcegroups'
+RESOURCE_GRAPH_BACKEND = 'resource_graph'
+_CONFIG_BACKEND_OPTION = 'discovery_backend'
+_PAGE_SIZE = 1000
+# Only the columns the up commands read, resourceGroup is taken from the id to keep its casing
+_PROJECTION = ("id, name, type, location, kind, resourceGroup = tostring(split(id, '/')[4]), "
+               "defaultHostName = tostring(properties.defaultHostName)")
+
+
+def is_resource_graph_enabled():
+    """ Resource discovery goes through Azure Resource Graph when enabled with
+    `az config set deploy_to_azure.discovery_backend=resource_graph`.
+    """
+    backend = get_extension_config().get(EXTENSION_CONFIG_SECTION, _CONFIG_BACKEND_OPTION, fallback=None)
+    return backend == RESOURCE_GRAPH_BACKEND
+
+
+def query_resources(subscription_id, resource_types, names=None):
+    """ Lists the resources of several types with a single Resource Graph query, paging through the results.
+    :param subscription_id: Subscription to query.
+    :type subscription_id: str
+    :param resource_types: Lower case ARM resource types, e.g. [AKS_RESOURCE_TYPE, ACR_RESOURCE_TYPE].
+    :type resource_types: list
+    :param names: Resource type to the resource name to filter on, listing only that resource.
+    :type names: dict
+    :return: Resource type to the list of resources of that type.
+    :rtype: dict
+    """
+    from azure.cli.core import get_default_cli
+    from azure.cli.core.util import send_raw_request
+    cli_ctx = get_default_cli()
+    request_body = {
+        'subscriptions': [subscription_id],
+        'query': get_resources_query(resource_types, names),
+        'options': {'$top': _PAGE_SIZE, 'resultFormat': 'objectArray'}
+    }
+    resources = {resource_type: [] for resource_type in resource_types}
+    while True:
+        logger.debug('Resource Graph query: %s', request_body['query'])
+        response = send_raw_request(cli_ctx, 'POST', RESOURCE_GRAPH_URL, body=json.dumps(request_body))
+        result = response.json()
+        for resource in result['data']:
+            resources.setdefault(resource['type'].lower(), []).append(resource)
+        skip_token = result.get('$skipToken')
+        if not skip_token:
+            return resources
+        request_body['options']['$skipToken'] = skip_token
+
+
+def get_resources_query(resource_types, names=None):
+    names = names or {}
+    clauses = []
+    for resource_type in resource_types:
+        if resource_type == GROUP_RESOURCE_TYPE:
+            continue
+        clause = "type =~ '{}'".format(resource_type)
+        if resource_type == FUNCTIONAPP_RESOURCE_TYPE:
+            clause = clause + " and kind contains 'functionapp'"
+        if names.get(resource_type):
+            clause = clause + " and name =~ '{}'".format(_escape(names[resource_type]))
+        clauses.append('({})'.format(clause))
+    queries = []
+    if clauses:
+        queries.append('Resources | where {} | project {}'.format(' or '.join(clauses), _PROJECTION))
+    if GROUP_RESOURCE_TYPE in resource_types:
+        queries.append("ResourceContainers | where type =~ '{}' | project {}".format(
+            GROUP_RESOURCE_TYPE, _PROJECTION))
+    query = queries[0]
+    if len(queries) > 1:
+        query = '{} | union ({})'.format(queries[0], queries[1])
+    return query + ' | order by name asc'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace("'", "\\'")
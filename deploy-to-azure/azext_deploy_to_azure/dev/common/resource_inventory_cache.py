@@ -0,0 +1,109 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+import time
+import tempfile
+import threading
+from knack.log import get_logger
+from azext_deploy_to_azure.dev.common.utils import get_extension_config, EXTENSION_CONFIG_SECTION
+
+logger = get_logger(__name__)
+
+INVENTORY_CACHE_FILE_NAME = 'resource_inventory_cache.json'
+INVENTORY_CACHE_TTL_DEFAULT = 600
+_CONFIG_TTL_OPTION = 'inventory_cache_ttl'
+
+
+def get_default_inventory_cache_path():
+    from azure.cli.core._environment import get_config_dir
+    return os.path.join(get_config_dir(), 'deploy-to-azure', INVENTORY_CACHE_FILE_NAME)
+
+
+def get_inventory_cache_ttl():
+    """ TTL in seconds of the cached resource lists. Set with
+    `az config set deploy_to_azure.inventory_cache_ttl=<seconds>` or the
+    AZURE_DEPLOY_TO_AZURE_INVENTORY_CACHE_TTL environment variable, 0 disables the cache.
+    """
+    try:
+        return get_extension_config().getint(EXTENSION_CONFIG_SECTION, _CONFIG_TTL_OPTION,
+                                             fallback=INVENTORY_CACHE_TTL_DEFAULT)
+    except ValueError:
+        logger.warning('Ignoring invalid %s.%s setting.', EXTENSION_CONFIG_SECTION, _CONFIG_TTL_OPTION)
+        return INVENTORY_CACHE_TTL_DEFAULT
+
+
+class ResourceInventoryCache():
+    """ ResourceInventoryCache
+    Persistent cache of Azure resource lists keyed by tenant, subscription and resource type.
+    Entries older than the TTL are ignored.
+    :param path: Cache file, defaults to the Azure CLI config directory.
+    :type path: str
+    :param ttl: Seconds a resource list stays valid, defaults to the configured TTL.
+    :type ttl: int
+    """
+    def __init__(self, path=None, ttl=None):
+        self.path = path or get_default_inventory_cache_path()
+        self.ttl = ttl if ttl is not None else get_inventory_cache_ttl()
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id, subscription_id, resource_type):
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._load().get(_get_key(tenant_id, subscription_id, resource_type))
+        if entry is None or time.time() - entry['timestamp'] > self.ttl:
+            return None
+        return entry['resources']
+
+    def put(self, tenant_id, subscription_id, resource_type, resources):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            entries = self._load()
+            now = time.time()
+            for key in [key for key, entry in entries.items() if now - entry['timestamp'] > self.ttl]:
+                del entries[key]
+            entries[_get_key(tenant_id, subscription_id, resource_type)] = {'timestamp': now,
+                                                                            'resources': resources}
+            self._save()
+
+    def invalidate(self, tenant_id, subscription_id, resource_type):
+        with self._lock:
+            if self._load().pop(_get_key(tenant_id, subscription_id, resource_type), None) is not None:
+                self._save()
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.path, 'r', encoding='utf-8') as cache_file:
+                    self._entries = json.load(cache_file)
+            except (IOError, OSError, ValueError) as ex:
+                logger.debug('Resource inventory cache not loaded: %s', ex)
+        return self._entries
+
+    def _save(self):
+        try:
+            cache_dir = os.path.dirname(self.path)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            # each process writes its own temporary file, the last one replacing the cache file wins
+            fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(self.path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as cache_file:
+                    json.dump(self._entries, cache_file)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except (IOError, OSError) as ex:
+            logger.debug('Resource inventory cache not saved: %s', ex)
+
+
+def _get_key(tenant_id, subscription_id, resource_type):
+    return '{}/{}/{}'.format(tenant_id, subscription_id, resource_type)
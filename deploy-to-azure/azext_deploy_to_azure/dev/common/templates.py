@@ -0,0 +1,59 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import re
+from functools import lru_cache
+from azext_deploy_to_azure.dev.common.const import (ACR_PLACEHOLDER, APP_NAME_PLACEHOLDER, ARTIFACT_ID_PLACEHOLDER,
+                                                    FUNCTIONAPP_NAME_PLACEHOLDER, PORT_NUMBER_PLACEHOLDER,
+                                                    CLUSTER_PLACEHOLDER, RG_PLACEHOLDER, LOCATION_PLACEHOLDER,
+                                                    RELEASE_PLACEHOLDER)
+
+PLACEHOLDERS = (ACR_PLACEHOLDER, APP_NAME_PLACEHOLDER, ARTIFACT_ID_PLACEHOLDER, FUNCTIONAPP_NAME_PLACEHOLDER,
+                PORT_NUMBER_PLACEHOLDER, CLUSTER_PLACEHOLDER, RG_PLACEHOLDER, LOCATION_PLACEHOLDER,
+                RELEASE_PLACEHOLDER)
+# longest first, functionapp_name_place_holder contains app_name_place_holder
+_PLACEHOLDER_PATTERN = re.compile('|'.join(re.escape(placeholder)
+                                           for placeholder in sorted(PLACEHOLDERS, key=len, reverse=True)))
+
+
+class Template:
+    """ Template split once into its literal text and placeholders, rendered in a single pass.
+    Values are never scanned for placeholders, so a value containing one is inserted as is.
+    """
+    __slots__ = ['_segments']
+
+    def __init__(self, text):
+        # literal text at even indexes, placeholders at odd indexes
+        self._segments = []
+        position = 0
+        for match in _PLACEHOLDER_PATTERN.finditer(text):
+            self._segments.append(text[position:match.start()])
+            self._segments.append(match.group(0))
+            position = match.end()
+        self._segments.append(text[position:])
+
+    @property
+    def placeholders(self):
+        return set(self._segments[1::2])
+
+    def render(self, values):
+        """ Renders the template, placeholders without a value are left in place.
+        :param values: Placeholder to the value substituted for it.
+        :type values: dict
+        :rtype: str
+        """
+        segments = list(self._segments)
+        for index in range(1, len(segments), 2):
+            segments[index] = str(values.get(segments[index], segments[index]))
+        return ''.join(segments)
+
+
+@lru_cache(maxsize=None)
+def compile_template(text):
+    return Template(text)
+
+
+def render_template(text, values):
+    return compile_template(text).render(values)
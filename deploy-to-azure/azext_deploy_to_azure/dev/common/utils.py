@@ -10,6 +10,7 @@ from knack.util import CLIError
 logger = get_logger(__name__)
 
 FILE_ENCODING_TYPES = ['ascii', 'utf-16be', 'utf-16le', 'utf-8']
+EXTENSION_CONFIG_SECTION = 'deploy_to_azure'
 
 
 def read_file_content(file_path, encoding):
@@ -79,6 +80,15 @@ def which(binary):
     return None
 
 
+def get_extension_config():
+    """ Azure CLI config, extension settings live in the deploy_to_azure section and can be set with
+    `az config set deploy_to_azure.<option>=<value>` or AZURE_DEPLOY_TO_AZURE_<OPTION> environment variables.
+    """
+    from knack.config import CLIConfig
+    from azure.cli.core._config import GLOBAL_CONFIG_DIR, ENV_VAR_PREFIX
+    return CLIConfig(config_dir=GLOBAL_CONFIG_DIR, config_env_var_prefix=ENV_VAR_PREFIX)
+
+
 # Decorators
 def singleton(myclass):
     instance = [None]
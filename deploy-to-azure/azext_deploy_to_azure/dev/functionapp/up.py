@@ -9,20 +9,22 @@ from knack.prompting import prompt
 from azext_deploy_to_azure.dev.common.git import resolve_repository
 from azext_deploy_to_azure.dev.common.github_api_helper import (Files, get_work_flow_check_runID,
                                                                 push_files_to_repository,
-                                                                get_languages_for_repo,
-                                                                get_github_pat_token,
-                                                                get_default_branch,
-                                                                check_file_exists)
+                                                                get_github_pat_token)
+from azext_deploy_to_azure.dev.common.preflight import run_repo_preflight
+from azext_deploy_to_azure.dev.common.azure_cli_resources import (set_account_context, prefetch_resource_inventories,
+                                                                  FUNCTIONAPP_INVENTORY)
 from azext_deploy_to_azure.dev.common.github_workflow_helper import poll_workflow_status
 from azext_deploy_to_azure.dev.common.github_azure_secrets import get_azure_credentials_functionapp
-from azext_deploy_to_azure.dev.common.const import CHECKIN_MESSAGE_FUNCTIONAPP
+from azext_deploy_to_azure.dev.common.const import (CHECKIN_MESSAGE_FUNCTIONAPP, GITHUB_WORKFLOW_PATH,
+                                                    WORKFLOW_FILE_NAME, HOST_JSON_PATH, WORKFLOW_JOB_NAME)
 
 logger = get_logger(__name__)
 functionapp_token_prefix = "FunctionAppUpCLIExt_"
 
 
-def functionapp_deploy(app_name=None, repository=None,
-                       branch_name=None, do_not_wait=False):
+def functionapp_deploy(cmd, app_name=None, repository=None,
+                       branch_name=None, do_not_wait=False, webhook_url=None, webhook_port=None,
+                       refresh=False):
     """Setup GitHub Action to build and deploy to Azure FunctionApp
     :param repository: GitHub repository URL e.g. https://github.com/azure/azure-cli.
     :type repository: str
@@ -32,13 +34,27 @@ def functionapp_deploy(app_name=None, repository=None,
     :type branch_name:str
     :param do_not_wait : Do not wait for workflow completion.
     :type do_not_wait bool
+    :param webhook_url: Public URL of a tunnel forwarding to webhook_port, to be notified of workflow completion.
+    :type webhook_url: str
+    :param webhook_port: Local port on which to receive the workflow webhook events. Default is 8787
+    :type webhook_port: int
+    :param refresh: List the Azure resources again instead of using the cached lists.
+    :type refresh: bool
     """
+    # --subscription selects the subscription, otherwise the default one is used
+    set_account_context(cmd.cli_ctx.data.get('subscription_id'))
+    # list the Azure resources in the background while the repository is set up
+    prefetch_resource_inventories([FUNCTIONAPP_INVENTORY], refresh=refresh, names={FUNCTIONAPP_INVENTORY: app_name},
+                                  cli_ctx=cmd.cli_ctx)
     repo_name, repository = resolve_repository(repository)
 
     get_github_pat_token(token_prefix=functionapp_token_prefix + repo_name, display_warning=True)
     logger.warning('Setting up your workflow.')
 
-    languages = get_languages_for_repo(repo_name)
+    repo_context = run_repo_preflight(repo_name,
+                                      file_paths=[GITHUB_WORKFLOW_PATH + WORKFLOW_FILE_NAME, HOST_JSON_PATH],
+                                      list_secrets=True)
+    languages = repo_context.languages
     if not languages:
         raise CLIError('Language detection failed for this repository.')
     language = choose_supported_language(languages)
@@ -51,9 +67,10 @@ def functionapp_deploy(app_name=None, repository=None,
     params = get_params_for_language(language)
 
     # assuming the host.json is in the root directory for now
-    ensure_function_app(repo_name=repo_name)
+    ensure_function_app(repo_context=repo_context)
 
-    from azext_deploy_to_azure.dev.common.azure_cli_resources import get_functionapp_details
+    from azext_deploy_to_azure.dev.common.azure_cli_resources import (get_functionapp_details,
+                                                                      get_role_assignment_scope)
     app_details = get_functionapp_details(app_name)
     logger.debug(app_details)
     app_name = app_details['name']
@@ -61,28 +78,27 @@ def functionapp_deploy(app_name=None, repository=None,
     default_host_name = app_details['defaultHostName']
 
     # create azure service principal and display json on the screen for user to configure it as Github secrets
-    get_azure_credentials_functionapp(repo_name, app_name)
+    get_azure_credentials_functionapp(repo_name, app_name, [get_role_assignment_scope(app_details)], repo_context)
 
     print('')
-    files = get_functionapp_yaml_template_for_repo(app_name, repo_name, language, platform, params)
+    files = get_functionapp_yaml_template_for_repo(app_name, repo_context, language, platform, params)
 
     # File checkin
     for file_name in files:
-        logger.debug("Checkin file path: %s", file_name.path)
-        logger.debug("Checkin file content: %s", file_name.content)
+        logger.debug("Checkin file %s: %s", file_name.path, file_name.get_digest())
 
-    default_branch = get_default_branch(repo_name)
     workflow_commit_sha = push_files_to_repository(
-        files=files, default_branch=default_branch, repo_name=repo_name, branch_name=branch_name,
+        files=files, default_branch=repo_context.default_branch, repo_name=repo_name, branch_name=branch_name,
         message=CHECKIN_MESSAGE_FUNCTIONAPP)
-    print('Creating workflow...')
-    check_run_id = get_work_flow_check_runID(repo_name, workflow_commit_sha)
-    workflow_url = 'https://github.com/{repo_id}/runs/{checkID}'.format(repo_id=repo_name, checkID=check_run_id)
-    print('GitHub Action workflow has been created - {}'.format(workflow_url))
+    if workflow_commit_sha:
+        print('Creating workflow...')
+        check_run_id = get_work_flow_check_runID(repo_name, workflow_commit_sha, check_name=WORKFLOW_JOB_NAME)
+        workflow_url = 'https://github.com/{repo_id}/runs/{checkID}'.format(repo_id=repo_name, checkID=check_run_id)
+        print('GitHub Action workflow has been created - {}'.format(workflow_url))
 
-    if not do_not_wait:
-        poll_workflow_status(repo_name, check_run_id)
-        print('Your app is deployed at: https://{}'.format(default_host_name))
+        if not do_not_wait:
+            poll_workflow_status(repo_name, check_run_id, webhook_url=webhook_url, webhook_port=webhook_port)
+            print('Your app is deployed at: https://{}'.format(default_host_name))
 
 
 def get_params_for_language(language):
@@ -94,29 +110,24 @@ def get_params_for_language(language):
     return params
 
 
-def ensure_function_app(repo_name, path=None):
+def ensure_function_app(repo_context, path=None):
     if path:
         path_to_host = path
     else:
-        path_to_host = 'host.json'
-    if check_file_exists(repo_name, path_to_host):
+        path_to_host = HOST_JSON_PATH
+    if repo_context.file_exists(path_to_host):
         logger.debug("Host.json was found at %s", path_to_host)
     else:
         raise CLIError('host.json could not be located at {}.'.format(path_to_host))
 
 
-def get_functionapp_yaml_template_for_repo(app_name, repo_name, language, platform, params):
+def get_functionapp_yaml_template_for_repo(app_name, repo_context, language, platform, params):
     files_to_return = []
-    github_workflow_path = '.github/workflows/'
     # Read template file
-    yaml_file_name = 'main.yml'
-    workflow_yaml = github_workflow_path + yaml_file_name
-    if check_file_exists(repo_name, workflow_yaml):
-        from azext_deploy_to_azure.dev.common.github_workflow_helper import get_new_workflow_yaml_name
-        yaml_file_name = get_new_workflow_yaml_name()
-        workflow_yaml = github_workflow_path + yaml_file_name
+    workflow_yaml = GITHUB_WORKFLOW_PATH + WORKFLOW_FILE_NAME
     from azext_deploy_to_azure.dev.common.const import (APP_NAME_PLACEHOLDER, FUNCTIONAPP_NAME_PLACEHOLDER,
                                                         ARTIFACT_ID_PLACEHOLDER)
+    from azext_deploy_to_azure.dev.common.templates import compile_template
     if language == 'Java':
         pom_functionapp_name = params.get('functionAppName', None)
         if not pom_functionapp_name:
@@ -124,16 +135,15 @@ def get_functionapp_yaml_template_for_repo(app_name, repo_name, language, platfo
         pom_artifact_id = params.get('artifactId', None)
         if not pom_artifact_id:
             pom_artifact_id = prompt('Artifact Id from <project> in pom.xml: ')
-        workflow_file = Files(path=workflow_yaml,
-                              content=get_language_to_workflow_mapping(language, platform)
-                              .replace(APP_NAME_PLACEHOLDER, app_name)
-                              .replace(FUNCTIONAPP_NAME_PLACEHOLDER, pom_functionapp_name)
-                              .replace(ARTIFACT_ID_PLACEHOLDER, pom_artifact_id))
+        values = {APP_NAME_PLACEHOLDER: app_name, FUNCTIONAPP_NAME_PLACEHOLDER: pom_functionapp_name,
+                  ARTIFACT_ID_PLACEHOLDER: pom_artifact_id}
     else:
-        workflow_file = Files(path=workflow_yaml,
-                              content=get_language_to_workflow_mapping(language, platform)
-                              .replace(APP_NAME_PLACEHOLDER, app_name))
-    files_to_return.append(workflow_file)
+        values = {APP_NAME_PLACEHOLDER: app_name}
+    workflow_file = Files(path=workflow_yaml,
+                          template=compile_template(get_language_to_workflow_mapping(language, platform)),
+                          values=values)
+    from azext_deploy_to_azure.dev.common.github_workflow_helper import resolve_workflow_yaml_path
+    files_to_return.append(resolve_workflow_yaml_path(repo_context, workflow_file))
     return files_to_return
 
 
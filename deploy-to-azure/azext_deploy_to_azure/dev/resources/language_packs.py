@@ -0,0 +1,102 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+""" Language packs: Dockerfile, .dockerignore and helm chart checked in for each supported language.
+The files of every pack are listed in packs/manifest.json, generated at build time by setup.py, so that
+deploying reads only the files it needs without walking the packs directory. Run this module to regenerate
+the manifest checked in the source tree after changing a pack.
+"""
+
+import os
+import json
+import hashlib
+from functools import lru_cache
+
+PACKS_DIRECTORY = 'packs'
+MANIFEST_FILE_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+DOCKERFILE_ROLE = 'dockerfile'
+DOCKERIGNORE_ROLE = 'dockerignore'
+CHART_ROLE = 'chart'
+VALUES_ROLE = 'values'
+_ROLES = {'Dockerfile': DOCKERFILE_ROLE, '.dockerignore': DOCKERIGNORE_ROLE, 'charts/values.yaml': VALUES_ROLE}
+
+
+def get_pack_files(language, role=None):
+    """ Lists the files of the pack of a language, as recorded in the manifest.
+    :param language: Language of the pack, e.g. Python.
+    :type language: str
+    :param role: Only list the files with this role, e.g. CHART_ROLE.
+    :type role: str
+    :return: Entries with the path of the file in the pack, its role and sha256.
+    :rtype: list
+    """
+    pack = load_manifest()['packs'].get(language.lower(), [])
+    return [entry for entry in pack if role is None or entry['role'] == role]
+
+
+def read_pack_file(language, path):
+    """ Reads a file of a pack through importlib.resources, which also works from a zipped wheel.
+    """
+    resource = _get_packs_root().joinpath(language.lower())
+    for part in path.split('/'):
+        resource = resource.joinpath(part)
+    return resource.read_text(encoding='utf-8')
+
+
+@lru_cache(maxsize=None)
+def load_manifest():
+    return json.loads(_get_packs_root().joinpath(MANIFEST_FILE_NAME).read_text(encoding='utf-8'))
+
+
+def _get_packs_root():
+    from importlib.resources import files
+    return files(__package__).joinpath(PACKS_DIRECTORY)
+
+
+def build_manifest(packs_path):
+    """ Lists the files of every pack under packs_path, sorted so that the manifest is reproducible.
+    :rtype: dict
+    """
+    packs = {}
+    for language in sorted(os.listdir(packs_path)):
+        language_path = os.path.join(packs_path, language)
+        if not os.path.isdir(language_path) or language == '__pycache__':
+            continue
+        entries = []
+        for root, dirs, files in os.walk(language_path):
+            dirs[:] = sorted(directory for directory in dirs if directory != '__pycache__')
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                path = os.path.relpath(file_path, language_path).replace(os.path.sep, '/')
+                with open(file_path, 'rb') as pack_file:
+                    # the same on checkouts converting line endings to CRLF
+                    digest = hashlib.sha256(pack_file.read().replace(b'\r\n', b'\n')).hexdigest()
+                entries.append({'path': path, 'role': _get_role(path), 'sha256': digest})
+        packs[language] = entries
+    return {'version': MANIFEST_VERSION, 'packs': packs}
+
+
+def write_manifest(packs_path, target_path=None):
+    """ Writes the manifest of the packs under packs_path into target_path, packs_path itself by default.
+    """
+    manifest_path = os.path.join(target_path or packs_path, MANIFEST_FILE_NAME)
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(build_manifest(packs_path), manifest_file, indent=2, sort_keys=True)
+        manifest_file.write('\n')
+    return manifest_path
+
+
+def _get_role(path):
+    if path in _ROLES:
+        return _ROLES[path]
+    if path.startswith('charts/'):
+        return CHART_ROLE
+    return None
+
+
+if __name__ == '__main__':
+    print(write_manifest(os.path.join(os.path.dirname(os.path.abspath(__file__)), PACKS_DIRECTORY)))
@@ -0,0 +1,199 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+try:
+    # Attempt to load mock (works on Python 3.3 and above)
+    from unittest.mock import patch, MagicMock
+except ImportError:
+    # Attempt to load mock (works on Python version below 3.3)
+    from mock import patch, MagicMock
+from knack.util import CLIError
+from azext_deploy_to_azure.dev.common.resource_inventory_cache import ResourceInventoryCache
+from azext_deploy_to_azure.dev.common.azure_cli_resources import (invoke_az_command, get_resource_inventory,
+                                                                  prefetch_resource_inventories, get_aks_details,
+                                                                  AKS_INVENTORY, ACR_INVENTORY, GROUP_INVENTORY,
+                                                                  create_aks_cluster, create_acr, wait_for_provisioning,
+                                                                  stop_provisioning, _PENDING_OPERATIONS)
+
+
+def _account(subscription_id):
+    account = MagicMock()
+    account.subscription_id = subscription_id
+    account.tenant_id = 'tenant'
+    account.get_subscription_args.return_value = ['--subscription', subscription_id]
+    return account
+
+
+class TestAzureCliResourcesMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        get_resource_inventory().cache = ResourceInventoryCache(path=os.path.join(self.cache_dir, 'cache.json'),
+                                                                ttl=600)
+        get_resource_inventory().reset()
+
+    def tearDown(self):
+        stop_provisioning()
+        get_resource_inventory().reset()
+        shutil.rmtree(self.cache_dir)
+
+    @patch('azure.cli.core.get_default_cli')
+    def test_invoke_az_command_returns_result(self, mock_get_default_cli):
+        cli = mock_get_default_cli.return_value
+        cli.invoke.return_value = 0
+        cli.result.result = [{'name': 'cluster', 'resourceGroup': 'group'}]
+
+        self.assertEqual(invoke_az_command(['aks', 'list']), [{'name': 'cluster', 'resourceGroup': 'group'}])
+        self.assertEqual(cli.invoke.call_args[0][0], ['aks', 'list', '-o', 'none'])
+
+    @patch('azure.cli.core.get_default_cli')
+    def test_invoke_az_command_raises_on_failure(self, mock_get_default_cli):
+        cli = mock_get_default_cli.return_value
+        cli.invoke.return_value = 1
+        cli.result.error = Exception('Please run az login')
+
+        with self.assertRaises(CLIError):
+            invoke_az_command(['aks', 'list'])
+
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.get_account_context')
+    @patch('azure.cli.core.util.send_raw_request')
+    @patch('azure.cli.core.get_default_cli')
+    def test_inventories_are_listed_concurrently(self, _, mock_send_raw_request, mock_get_account_context):
+        mock_get_account_context.return_value = _account('id')
+        # each listing only returns once all three are in flight
+        listings_in_flight = threading.Barrier(3, timeout=5)
+        threads = []
+
+        def _send(cli_ctx, method, url, body=None):
+            threads.append(threading.current_thread())
+            listings_in_flight.wait()
+            name = url.split('?')[0].split('/')[-1].lower()
+            response = MagicMock()
+            response.json.return_value = {'value': [{'id': '/subscriptions/id/resourceGroups/group/' + name,
+                                                     'name': name + '1', 'location': 'westus'}]}
+            return response
+        mock_send_raw_request.side_effect = _send
+        cli_ctx = MagicMock()
+
+        prefetch_resource_inventories([AKS_INVENTORY, ACR_INVENTORY, GROUP_INVENTORY], cli_ctx=cli_ctx)
+
+        self.assertEqual(get_aks_details('MANAGEDCLUSTERS1')['resourceGroup'], 'group')
+        self.assertEqual(get_resource_inventory().get(ACR_INVENTORY)[0]['name'], 'registries1')
+        self.assertEqual(get_resource_inventory().get(GROUP_INVENTORY)[0]['name'], 'resourcegroups1')
+        self.assertEqual(len(set(threads)), 3)
+        self.assertNotIn(threading.main_thread(), threads)
+        # the worker threads are released when the command finishes
+        event_name, handler = cli_ctx.register_event.call_args[0]
+        self.assertEqual(event_name, 'Cli.PostExecute')
+        with patch.object(get_resource_inventory(), 'shutdown') as mock_shutdown:
+            handler(cli_ctx)
+        mock_shutdown.assert_called_once_with()
+
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.get_account_context')
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.list_arm_resources')
+    def test_inventory_is_cached_per_subscription(self, mock_invoke, mock_get_account_context):
+        mock_get_account_context.return_value = _account('id')
+        mock_invoke.return_value = [{'name': 'aks1', 'resourceGroup': 'group'}]
+        get_aks_details('aks1')
+        get_resource_inventory().reset()
+
+        self.assertEqual(get_aks_details('aks1')['name'], 'aks1')
+        self.assertEqual(mock_invoke.call_count, 1)
+
+        get_resource_inventory().reset()
+        mock_invoke.return_value = [{'name': 'aks1', 'resourceGroup': 'group'},
+                                    {'name': 'aks2', 'resourceGroup': 'group'}]
+        self.assertEqual(get_aks_details('aks2')['name'], 'aks2')
+        self.assertEqual(mock_invoke.call_count, 2)
+
+        get_resource_inventory().reset()
+        mock_get_account_context.return_value = _account('other')
+        get_aks_details('aks1')
+        self.assertEqual(mock_invoke.call_count, 3)
+        self.assertTrue(mock_invoke.call_args[0][0].startswith(
+            '/subscriptions/other/providers/Microsoft.ContainerService/managedClusters?'))
+
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources._PROVISIONING_POLL_INTERVAL', 0)
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.get_account_context')
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.invoke_az_command')
+    def test_cluster_is_created_in_background(self, mock_invoke, mock_get_account_context):
+        mock_get_account_context.return_value = _account('id')
+        creation_started = threading.Event()
+        states = iter([None, 'Creating', 'Succeeded'])
+
+        def _invoke(args):
+            if args[1] == 'create':
+                creation_started.set()
+                return None
+            state = next(states)
+            if state is None:
+                raise CLIError("Command az aks show failed. (ResourceNotFound) The Resource "
+                               "'Microsoft.ContainerService/managedClusters/aks1' was not found.")
+            return {'name': 'aks1', 'provisioningState': state}
+        mock_invoke.side_effect = _invoke
+
+        cluster_details = create_aks_cluster('aks1', 'group')
+
+        self.assertEqual(cluster_details, {'name': 'aks1', 'resourceGroup': 'group'})
+        self.assertTrue(creation_started.wait(5))
+        wait_for_provisioning(timeout=5)
+        self.assertEqual(mock_invoke.call_args_list[0][0][0],
+                         ['aks', 'create', '--name', 'aks1', '-g', 'group', '--no-wait', '--subscription', 'id'])
+        self.assertEqual(mock_invoke.call_count, 4)
+
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources._send_arm_request')
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.list_arm_resources',
+           return_value=[{'name': 'group', 'location': 'westus'}])
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.get_account_context')
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.invoke_az_command')
+    def test_registry_is_created_with_an_arm_request(self, mock_invoke, mock_get_account_context, _,
+                                                     mock_send_arm_request):
+        mock_get_account_context.return_value = _account('id')
+        mock_invoke.return_value = {'name': 'acr1', 'provisioningState': 'Succeeded'}
+
+        with patch('azext_deploy_to_azure.dev.common.azure_cli_resources._PROVISIONING_POLL_INTERVAL', 0):
+            acr_details = create_acr('acr1', 'group', 'Basic')
+            wait_for_provisioning(timeout=5)
+
+        self.assertEqual(acr_details, {'name': 'acr1', 'resourceGroup': 'group', 'location': 'westus'})
+        method, url, body = mock_send_arm_request.call_args[0]
+        self.assertEqual((method, url.split('?')[0]), (
+            'PUT', '/subscriptions/id/resourceGroups/group/providers/Microsoft.ContainerRegistry/registries/acr1'))
+        self.assertEqual(json.loads(body), {'location': 'westus', 'sku': {'name': 'Basic'}})
+        # az is only invoked to poll the registry, not for the long running creation
+        self.assertEqual([call[0][0][:2] for call in mock_invoke.call_args_list], [['acr', 'show']])
+
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.logger')
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources._PROVISIONING_POLL_INTERVAL', 0.01)
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.get_account_context')
+    @patch('azext_deploy_to_azure.dev.common.azure_cli_resources.invoke_az_command')
+    def test_unfinished_creation_is_reported_when_the_command_ends(self, mock_invoke, mock_get_account_context,
+                                                                   mock_logger):
+        mock_get_account_context.return_value = _account('id')
+        mock_invoke.return_value = {'name': 'aks1', 'provisioningState': 'Creating'}
+        cli_ctx = MagicMock()
+        prefetch_resource_inventories([], cli_ctx=cli_ctx)
+        create_aks_cluster('aks1', 'group')
+        operation = _PENDING_OPERATIONS[0]
+        self.assertFalse(operation.daemon)
+
+        # the command failed before waiting for the cluster
+        cli_ctx.register_event.call_args[0][1](cli_ctx)
+
+        self.assertFalse(operation.is_alive())
+        self.assertFalse(_PENDING_OPERATIONS)
+        self.assertIn('AKS cluster aks1', mock_logger.warning.call_args[0])
+        with self.assertRaises(CLIError):
+            operation.result()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,232 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import unittest
+try:
+    # Attempt to load mock (works on Python 3.3 and above)
+    from unittest.mock import patch, MagicMock
+except ImportError:
+    # Attempt to load mock (works on Python version below 3.3)
+    from mock import patch, MagicMock
+from knack.util import CLIError
+from azext_deploy_to_azure.dev.common.github_api_helper import (Files, commit_files_to_github_branch,
+                                                                push_files_github, create_repo_secrets, create_blob,
+                                                                get_blob_request_length, get_work_flow_check_runID,
+                                                                get_check_run_status_and_conclusion)
+
+
+def _response(status_code, body):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = body
+    response.text = json.dumps(body)
+    return response
+
+
+class TestGithubApiHelperMethods(unittest.TestCase):
+
+    def _mock_branch(self, client, files):
+        client.cached_get.return_value = _response(200, {'ref': 'refs/heads/master', 'object': {'sha': 'base_commit'}})
+        tree = [{'path': path, 'type': 'blob', 'sha': file.blob_sha} for path, file in files.items()]
+        client.get.side_effect = lambda url, **kwargs: _response(200, {'tree': tree, 'truncated': False}) \
+            if '/git/trees/base_tree' in url else _response(200, {'sha': 'base_commit', 'tree': {'sha': 'base_tree'}})
+
+    @patch('azext_deploy_to_azure.dev.common.github_api_helper.get_github_client')
+    def test_commit_files_creates_single_commit(self, mock_get_client):
+        client = mock_get_client.return_value
+        self._mock_branch(client, {'Dockerfile': Files(path='Dockerfile', content='FROM node'),
+                                   'charts/Chart.yaml': Files(path='charts/Chart.yaml', content='name: app')})
+        client.post.side_effect = [
+            _response(201, {'sha': 'blob1'}),
+            _response(201, {'sha': 'blob2'}),
+            _response(201, {'sha': 'new_tree'}),
+            _response(201, {'sha': 'new_commit'})
+        ]
+        client.patch.return_value = _response(200, {})
+        files = [Files(path='Dockerfile', content='FROM python'),
+                 Files(path='charts/Chart.yaml', content='name: app'),
+                 Files(path='.github/workflows//main.yml', content='name: CI')]
+
+        commit_sha = commit_files_to_github_branch(files, 'org/repo', 'master', 'message')
+
+        self.assertEqual(commit_sha, 'new_commit')
+        tree_request = client.post.call_args_list[2][1]['json']
+        self.assertEqual(tree_request['base_tree'], 'base_tree')
+        self.assertEqual([item['path'] for item in tree_request['tree']], ['Dockerfile', '.github/workflows/main.yml'])
+        self.assertEqual([item['sha'] for item in tree_request['tree']], ['blob1', 'blob2'])
+        commit_request = client.post.call_args_list[3][1]['json']
+        self.assertEqual(commit_request['parents'], ['base_commit'])
+        self.assertEqual(client.patch.call_count, 1)
+        self.assertEqual(client.patch.call_args[1]['json']['sha'], 'new_commit')
+
+    @patch('azext_deploy_to_azure.dev.common.github_api_helper.get_github_client')
+    def test_unchanged_files_are_not_pushed(self, mock_get_client):
+        client = mock_get_client.return_value
+        files = [Files(path='Dockerfile', content='FROM python'),
+                 Files(path='.github/workflows//main.yml', content='name: CI')]
+        self._mock_branch(client, {'Dockerfile': files[0], '.github/workflows/main.yml': files[1]})
+
+        self.assertIsNone(push_files_github(files, 'org/repo', 'master', commit_to_branch=True))
+        self.assertIsNone(push_files_github(files, 'org/repo', 'master', commit_to_branch=False))
+        self.assertFalse(client.post.called)
+        self.assertFalse(client.patch.called)
+
+    @patch('azext_deploy_to_azure.dev.common.github_api_helper.get_github_client')
+    def test_binary_content_is_streamed_base64_encoded_with_its_length(self, mock_get_client):
+        import io
+        import requests
+        from base64 import b64decode
+        content = b'\x00\x01\x02\xff\xfe' * 3 + b'\x00'
+        bodies = []
+
+        def _post(url, data=None, **kwargs):
+            request = requests.Request('POST', url, data=data, headers=kwargs.get('headers')).prepare()
+            self.assertEqual(request.headers['Content-Length'], str(len(data)))
+            self.assertNotIn('Transfer-Encoding', request.headers)
+            bodies.append(list(data))
+            return _response(201, {'sha': 'blob'})
+        mock_get_client.return_value.post.side_effect = _post
+
+        with patch('azext_deploy_to_azure.dev.common.github_api_helper._BLOB_CHUNK_SIZE', 4):
+            self.assertEqual(create_blob('org/repo', io.BytesIO(content)), 'blob')
+
+        self.assertGreater(len(bodies[0]), 3)
+        body_bytes = b''.join(bodies[0])
+        self.assertEqual(len(body_bytes), get_blob_request_length(len(content)))
+        body = json.loads(body_bytes.decode('utf-8'))
+        self.assertEqual(body['encoding'], 'base64')
+        self.assertEqual(b64decode(body['content']), content)
+
+    @patch('azext_deploy_to_azure.dev.common.github_api_helper.get_github_client')
+    def test_binary_file_is_committed_from_its_source(self, mock_get_client):
+        import os
+        import tempfile
+        from base64 import b64decode
+        content = b'\x00\x01\x02\xff\xfe' * 3
+        fd, source = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as source_file:
+            source_file.write(content)
+        self.addCleanup(os.remove, source)
+        client = mock_get_client.return_value
+        self._mock_branch(client, {})
+        blob_bodies = []
+
+        def _post(url, data=None, **kwargs):
+            if url.endswith('/git/blobs'):
+                blob_bodies.append((len(data), b''.join(data)))
+                return _response(201, {'sha': 'blob'})
+            return _response(201, {'sha': 'new_tree' if url.endswith('/git/trees') else 'new_commit'})
+        client.post.side_effect = _post
+        client.patch.return_value = _response(200, {})
+        file = Files(path='charts/app.tgz', source=source)
+
+        with patch('azext_deploy_to_azure.dev.common.github_api_helper._BLOB_CHUNK_SIZE', 4):
+            self.assertEqual(commit_files_to_github_branch([file], 'org/repo', 'master', 'message'), 'new_commit')
+
+        self.assertIsNone(file.content)
+        self.assertEqual((file.size, file.blob_sha), (15, 'c6aa6ff1cd7dbf93387004f4ad25e3a32ffadeb3'))
+        length, body = blob_bodies[0]
+        self.assertEqual(length, len(body))
+        self.assertEqual(b64decode(json.loads(body.decode('utf-8'))['content']), content)
+
+    @patch('azext_deploy_to_azure.dev.common.github_api_helper.get_github_client')
+    def test_create_secrets_fetches_public_key_once(self, mock_get_client):
+        from base64 import b64encode, b64decode
+        from nacl import public
+        private_key = public.PrivateKey.generate()
+        client = mock_get_client.return_value
+        client.cached_get.return_value = _response(200, {
+            'key_id': 'key_id', 'key': b64encode(bytes(private_key.public_key)).decode('utf-8')})
+        client.put.side_effect = lambda url, **kwargs: _response(403 if url.endswith('/DENIED') else 201, {})
+        secrets = {'AZURE_CREDENTIALS': '{}', 'REGISTRY_USERNAME': 'user', 'DENIED': 'value'}
+
+        results = create_repo_secrets('org/repo', secrets)
+
+        self.assertEqual(results, {'AZURE_CREDENTIALS': True, 'REGISTRY_USERNAME': True, 'DENIED': False})
+        self.assertEqual(client.cached_get.call_count, 1)
+        self.assertEqual(client.put.call_count, 3)
+        unseal_box = public.SealedBox(private_key)
+        for call in client.put.call_args_list:
+            body = call[1]['json']
+            self.assertEqual(body['key_id'], 'key_id')
+            secret_name = call[0][0].rsplit('/', 1)[1]
+            self.assertEqual(unseal_box.decrypt(b64decode(body['encrypted_value'])).decode('utf-8'),
+                             secrets[secret_name])
+
+    @patch('azext_deploy_to_azure.dev.common.github_api_helper.time')
+    @patch('azext_deploy_to_azure.dev.common.github_api_helper.get_github_client')
+    def test_check_run_discovery_gives_up_at_deadline(self, mock_get_client, mock_time):
+        clock = [1000.0]
+        mock_time.time.side_effect = lambda: clock[0]
+        mock_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        mock_get_client.return_value.get.return_value = _response(200, {'total_count': 0, 'check_runs': []})
+
+        with self.assertRaises(CLIError):
+            get_work_flow_check_runID('org/repo', 'commit_sha', check_name='build-and-deploy', timeout=20)
+
+        sleeps = [call[0][0] for call in mock_time.sleep.call_args_list]
+        self.assertEqual(sleeps, [1, 2, 4, 8, 5])
+        url = mock_get_client.return_value.get.call_args[0][0]
+        self.assertIn('/commits/commit_sha/check-runs?', url)
+        self.assertIn('check_name=build-and-deploy', url)
+        self.assertIn('app_id=15368', url)
+        mock_get_client.return_value.cached_get.assert_not_called()
+
+    @patch.dict('os.environ', {'GITHUB_PAT': 'test_token'})
+    def test_unchanged_check_run_is_served_from_the_http_cache(self):
+        import os
+        import shutil
+        import tempfile
+        import requests
+        from azext_deploy_to_azure.dev.common.github_client import get_github_client
+        from azext_deploy_to_azure.dev.common.github_http_cache import GithubHttpCache
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        client = get_github_client()
+        client.reset()
+        self.addCleanup(client.reset)
+        client.http_cache = GithubHttpCache(path=os.path.join(cache_dir, 'cache.json'))
+        sent_headers = []
+
+        def _request(method, url, headers=None, **kwargs):
+            sent_headers.append(headers)
+            response = requests.Response()
+            if 'If-None-Match' in headers:
+                # GitHub does not count a 304 against the rate limit
+                response.status_code = 304
+                return response
+            response.status_code = 200
+            response.headers.update({'ETag': '"v1"', 'Content-Type': 'application/json',
+                                     'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4990',
+                                     'X-RateLimit-Reset': '1900000000'})
+            response._content = json.dumps({'status': 'in_progress', 'conclusion': None}).encode('utf-8')
+            return response
+
+        with patch.object(client.session, 'request', side_effect=_request):
+            first = get_check_run_status_and_conclusion('org/repo', 42)
+            second = get_check_run_status_and_conclusion('org/repo', 42)
+
+        self.assertEqual(first, ('in_progress', None))
+        self.assertEqual(second, ('in_progress', None))
+        self.assertEqual(sent_headers[1]['If-None-Match'], '"v1"')
+        self.assertEqual(client.get_rate_limit_budget()['remaining'], 4990)
+
+    def test_files_render_lazily_with_git_blob_sha(self):
+        from azext_deploy_to_azure.dev.common.const import PORT_NUMBER_PLACEHOLDER
+        from azext_deploy_to_azure.dev.common.templates import Template
+        template = MagicMock(wraps=Template('EXPOSE {}\n'.format(PORT_NUMBER_PLACEHOLDER)))
+        file = Files(path='Dockerfile', template=template, values={PORT_NUMBER_PLACEHOLDER: '8080'})
+        self.assertFalse(template.render.called)
+
+        # git hash-object of the rendered content
+        self.assertEqual(file.blob_sha, '39bdefb7cde2bc5afa7173c2d69930da3cc60be9')
+        self.assertEqual(file.size, 12)
+        self.assertEqual(file.content, 'EXPOSE 8080\n')
+        self.assertFalse(hasattr(file, '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import unittest
+try:
+    # Attempt to load mock (works on Python 3.3 and above)
+    from unittest.mock import patch
+except ImportError:
+    # Attempt to load mock (works on Python version below 3.3)
+    from mock import patch
+from knack.util import CLIError
+from azext_deploy_to_azure.dev.common.github_azure_secrets import get_azure_credentials
+
+_CREDENTIALS = {'appId': 'client_id', 'password': 'client_secret', 'tenant': 'tenant_id'}
+_SCOPES = ['/subscriptions/id/resourceGroups/group/providers/Microsoft.ContainerService/managedClusters/aks1',
+           '/subscriptions/id/resourceGroups/group']
+# hash of the resource group of the first scope
+_SP_NAME = 'deploy-to-azure-org-repo-aks1-664acdbc'
+_SP_NOTES = 'Deploys a GitHub repository to Azure, created by the deploy-to-azure CLI extension.'
+
+
+class _Clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now = self.now + seconds
+
+
+def _az(service_principals, assigned_scopes=(), update_failures=0):
+    failures = [update_failures]
+
+    def invoke(args):
+        if args[:3] == ['ad', 'sp', 'update'] and failures[0]:
+            failures[0] = failures[0] - 1
+            raise CLIError("Resource 'client_id' does not exist or one of its queried reference-property objects "
+                           "are not present.")
+        if args[:3] == ['ad', 'sp', 'list']:
+            return service_principals
+        if args[:3] == ['role', 'assignment', 'list']:
+            scope = args[args.index('--scope') + 1]
+            return [{'scope': scope}] if scope in assigned_scopes else []
+        if args[:2] == ['role', 'assignment'] or args[:3] in (['ad', 'sp', 'update'], ['ad', 'app', 'delete']):
+            return {}
+        return _CREDENTIALS
+    return invoke
+
+
+@patch('azext_deploy_to_azure.dev.common.github_azure_secrets.get_account_context')
+@patch('azext_deploy_to_azure.dev.common.github_azure_secrets.wait_for_role_propagation')
+@patch('azext_deploy_to_azure.dev.common.github_azure_secrets.create_repo_secrets')
+@patch('azext_deploy_to_azure.dev.common.github_azure_secrets.list_repo_secret_names')
+@patch('azext_deploy_to_azure.dev.common.github_azure_secrets.invoke_az_command')
+class TestGithubAzureSecretsMethods(unittest.TestCase):
+
+    def _get_azure_credentials(self, mock_invoke, mock_list_secret_names, mock_create_secrets,
+                               mock_get_account_context):
+        mock_list_secret_names.return_value = set()
+        mock_create_secrets.side_effect = lambda repo, secrets: {name: True for name in secrets}
+        mock_get_account_context.return_value.subscription_id = 'subscription_id'
+        get_azure_credentials('Org/repo', 'aks1', _SCOPES)
+        return [call[0][0] for call in mock_invoke.call_args_list], mock_create_secrets.call_args[0][1]
+
+    def test_one_service_principal_supplies_all_secrets(self, mock_invoke, mock_list_secret_names,
+                                                        mock_create_secrets, mock_wait_for_propagation,
+                                                        mock_get_account_context):
+        mock_invoke.side_effect = _az([])
+
+        az_calls, secrets = self._get_azure_credentials(mock_invoke, mock_list_secret_names, mock_create_secrets,
+                                                        mock_get_account_context)
+
+        sp_args = az_calls[1]
+        self.assertEqual(sp_args[:3], ['ad', 'sp', 'create-for-rbac'])
+        self.assertEqual(sp_args[sp_args.index('--name') + 1], _SP_NAME)
+        self.assertEqual(sp_args[sp_args.index('--scopes') + 1:], _SCOPES)
+        self.assertEqual(az_calls[2], ['ad', 'sp', 'update', '--id', 'client_id', '--set', 'notes=' + _SP_NOTES])
+        auth_details = json.loads(secrets['AZURE_CREDENTIALS'])
+        self.assertEqual((auth_details['clientId'], auth_details['clientSecret'], auth_details['tenantId'],
+                          auth_details['subscriptionId']),
+                         ('client_id', 'client_secret', 'tenant_id', 'subscription_id'))
+        self.assertEqual(secrets['REGISTRY_USERNAME'], 'client_id')
+        self.assertEqual(secrets['REGISTRY_PASSWORD'], 'client_secret')
+        mock_wait_for_propagation.assert_called_once_with(auth_details, _SCOPES)
+
+    def test_new_service_principal_is_marked_once_visible(self, mock_invoke, mock_list_secret_names,
+                                                          mock_create_secrets, mock_wait_for_propagation,
+                                                          mock_get_account_context):
+        mock_invoke.side_effect = _az([], update_failures=2)
+        clock = _Clock()
+
+        with patch('time.time', clock.time), patch('time.sleep', clock.sleep):
+            az_calls, _ = self._get_azure_credentials(mock_invoke, mock_list_secret_names, mock_create_secrets,
+                                                      mock_get_account_context)
+
+        self.assertEqual(len([args for args in az_calls if args[:3] == ['ad', 'sp', 'update']]), 3)
+        self.assertFalse([args for args in az_calls if args[:3] == ['ad', 'app', 'delete']])
+        mock_wait_for_propagation.assert_called_once()
+
+    def test_service_principal_that_can_not_be_marked_is_deleted(self, mock_invoke, mock_list_secret_names,
+                                                                  mock_create_secrets, mock_wait_for_propagation,
+                                                                  mock_get_account_context):
+        mock_invoke.side_effect = _az([], update_failures=100)
+        clock = _Clock()
+
+        with patch('time.time', clock.time), patch('time.sleep', clock.sleep):
+            with self.assertRaises(CLIError):
+                self._get_azure_credentials(mock_invoke, mock_list_secret_names, mock_create_secrets,
+                                            mock_get_account_context)
+
+        self.assertEqual(mock_invoke.call_args[0][0], ['ad', 'app', 'delete', '--id', 'client_id'])
+        mock_create_secrets.assert_not_called()
+        mock_wait_for_propagation.assert_not_called()
+
+    def test_existing_service_principal_is_rotated(self, mock_invoke, mock_list_secret_names,
+                                                   mock_create_secrets, mock_wait_for_propagation,
+                                                   mock_get_account_context):
+        mock_invoke.side_effect = _az([{'displayName': _SP_NAME + '-other', 'appId': 'other', 'id': 'other'},
+                                       {'displayName': _SP_NAME, 'appId': 'client_id', 'id': 'object_id',
+                                        'notes': _SP_NOTES}], assigned_scopes=_SCOPES[:1])
+
+        az_calls, secrets = self._get_azure_credentials(mock_invoke, mock_list_secret_names, mock_create_secrets,
+                                                        mock_get_account_context)
+
+        self.assertEqual(az_calls[0], ['ad', 'sp', 'list', '--display-name', _SP_NAME])
+        self.assertEqual(az_calls[1], ['ad', 'sp', 'credential', 'reset', '--id', 'client_id'])
+        self.assertFalse([args for args in az_calls if 'create-for-rbac' in args])
+        # only the scope without a contributor role assignment gets one
+        created = [args for args in az_calls if args[:3] == ['role', 'assignment', 'create']]
+        self.assertEqual([args[args.index('--scope') + 1] for args in created], _SCOPES[1:])
+        self.assertTrue(all('object_id' in args for args in az_calls[2:]))
+        self.assertEqual(secrets['REGISTRY_PASSWORD'], 'client_secret')
+        mock_wait_for_propagation.assert_called_once()
+
+    def test_service_principal_of_someone_else_is_not_reset(self, mock_invoke, mock_list_secret_names,
+                                                            mock_create_secrets, mock_wait_for_propagation,
+                                                            mock_get_account_context):
+        mock_invoke.side_effect = _az([{'displayName': _SP_NAME, 'appId': 'client_id', 'id': 'object_id'}])
+
+        with self.assertRaises(CLIError):
+            self._get_azure_credentials(mock_invoke, mock_list_secret_names, mock_create_secrets,
+                                        mock_get_account_context)
+
+        self.assertFalse([args for args in (call[0][0] for call in mock_invoke.call_args_list)
+                          if args[:4] == ['ad', 'sp', 'credential', 'reset']])
+        mock_create_secrets.assert_not_called()
+        mock_wait_for_propagation.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
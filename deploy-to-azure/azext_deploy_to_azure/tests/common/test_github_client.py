@@ -0,0 +1,163 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+try:
+    # Attempt to load mock (works on Python 3.3 and above)
+    from unittest.mock import patch, MagicMock
+except ImportError:
+    # Attempt to load mock (works on Python version below 3.3)
+    from mock import patch, MagicMock
+from knack.util import CLIError
+from azext_deploy_to_azure.dev.common.github_client import get_github_client
+from azext_deploy_to_azure.dev.common.github_rate_limit import GithubRateLimiter
+from azext_deploy_to_azure.dev.common.github_http_cache import GithubHttpCache, get_http_cache_key
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    auth_headers = []
+    limited_requests = []
+
+    def do_GET(self):
+        self.auth_headers.append(self.headers.get('Authorization'))
+        if self.path.endswith('/limited') and not self.limited_requests:
+            self.limited_requests.append(self.path)
+            body = b'{"message": "You have exceeded a secondary rate limit."}'
+            self.send_response(403)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'{"default_branch": "master"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', '"v1"')
+        self.send_header('X-RateLimit-Limit', '5000')
+        self.send_header('X-RateLimit-Remaining', '4990')
+        self.send_header('X-RateLimit-Reset', '1900000000')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class TestGithubClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{}/repos/org/repo'.format(self.server.server_port)
+        get_github_client().reset()
+
+    def tearDown(self):
+        get_github_client().session.close()
+        get_github_client().reset()
+        self.server.shutdown()
+        self.server.server_close()
+
+    @patch.dict(os.environ, {'GITHUB_PAT': 'test_token'})
+    def test_requests_reuse_pooled_connection(self):
+        client = get_github_client()
+        self.assertIs(client, get_github_client())
+        before = client.get_connection_stats()
+        for _ in range(5):
+            response = client.get(self.url, token_prefix='org/repo')
+            self.assertEqual(response.status_code, 200)
+        after = client.get_connection_stats()
+        self.assertEqual(after['requests'] - before['requests'], 5)
+        self.assertEqual(after['connections'] - before['connections'], 1)
+        self.assertTrue(all(header and header.startswith('Basic ') for header in _KeepAliveHandler.auth_headers))
+
+    @patch.dict(os.environ, {'GITHUB_PAT': 'test_token'})
+    def test_cached_get_revalidates_with_etag(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        client = get_github_client()
+        client.http_cache = GithubHttpCache(path=os.path.join(cache_dir, 'cache.json'))
+        first = client.cached_get(self.url, token_prefix='org/repo')
+        second = client.cached_get(self.url, token_prefix='org/repo')
+        self.assertEqual(first.json(), {'default_branch': 'master'})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), {'default_branch': 'master'})
+        self.assertEqual(client.http_cache.get_stats()['hits'], 1)
+        self.assertEqual(client.http_cache.get_stats()['misses'], 1)
+        # a new process picks up the validators persisted when the command exits
+        client.http_cache.flush()
+        self.assertEqual(os.listdir(cache_dir), ['cache.json'])
+        persisted = GithubHttpCache(path=os.path.join(cache_dir, 'cache.json'))
+        self.assertEqual(persisted.get(get_http_cache_key(self.url, 'test_token'))['etag'], '"v1"')
+
+    @patch.dict(os.environ, {'GITHUB_PAT': 'test_token'})
+    def test_rate_limited_get_is_retried(self):
+        client = get_github_client()
+        response = client.get(self.url + '/limited', token_prefix='org/repo')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(_KeepAliveHandler.limited_requests), 1)
+        self.assertEqual(client.get_rate_limit_budget(), {'limit': 5000, 'remaining': 4990, 'reset': 1900000000})
+
+    @patch('azext_deploy_to_azure.dev.common.github_credential_manager.GithubCredentialManager')
+    def test_token_is_resolved_once_by_concurrent_requests(self, mock_credential_manager):
+        resolving = threading.Event()
+
+        def _get_token(**_):
+            resolving.set()
+            # the other thread must wait for this one instead of prompting as well
+            threading.Event().wait(0.1)
+            return 'test_token'
+        mock_credential_manager.return_value.get_token.side_effect = _get_token
+        client = get_github_client()
+        other = threading.Thread(target=client.authenticate, args=('org/repo',))
+        other.start()
+        resolving.wait(5)
+        self.assertEqual(client.authenticate('org/repo'), 'test_token')
+        other.join()
+        mock_credential_manager.return_value.get_token.assert_called_once()
+
+    def test_rate_limit_wait_is_capped(self):
+        limiter = GithubRateLimiter()
+        response = MagicMock(status_code=403, text='')
+        response.headers = {'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '0',
+                            'X-RateLimit-Reset': str(int(time.time()) + 3600)}
+        limiter.update(response)
+        with self.assertRaises(CLIError):
+            limiter.get_retry_delay(response, 0)
+        with self.assertRaises(CLIError):
+            limiter.acquire()
+        response.headers = {'Retry-After': '30'}
+        self.assertEqual(limiter.get_retry_delay(response, 0), 30)
+
+    def test_http_cache_evicts_least_recently_used(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        cache = GithubHttpCache(path=os.path.join(cache_dir, 'cache.json'), max_size=10)
+        response = MagicMock()
+        response.headers = {'ETag': '"v1"'}
+        response.text = '123456'
+        cache.put('first', response)
+        cache.put('second', response)
+        self.assertIsNone(cache.get('first'))
+        self.assertIsNotNone(cache.get('second'))
+
+
+if __name__ == '__main__':
+    unittest.main()
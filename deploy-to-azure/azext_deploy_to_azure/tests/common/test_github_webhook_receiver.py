@@ -0,0 +1,52 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import unittest
+import requests
+from azext_deploy_to_azure.dev.common.github_webhook_receiver import (WorkflowWebhookReceiver,
+                                                                      get_webhook_signature)
+
+_SECRET = 'webhook_secret'
+
+
+class TestWorkflowWebhookReceiver(unittest.TestCase):
+
+    def setUp(self):
+        self.receiver = WorkflowWebhookReceiver(_SECRET, check_run_id=42, check_suite_id=5).start()
+        self.url = 'http://127.0.0.1:{}/'.format(self.receiver.port)
+
+    def tearDown(self):
+        self.receiver.stop()
+
+    def _post(self, event, payload, secret=_SECRET):
+        body = json.dumps(payload).encode('utf-8')
+        headers = {'X-GitHub-Event': event, 'Content-Type': 'application/json',
+                   'X-Hub-Signature-256': get_webhook_signature(secret, body)}
+        return requests.post(self.url, data=body, headers=headers)
+
+    def test_completion_event_ends_wait(self):
+        self.assertEqual(self._post('check_run', {'check_run': {'id': 42, 'status': 'in_progress'}}).status_code, 202)
+        self.assertIsNone(self.receiver.wait(0.1))
+        self.assertEqual(self._post('check_run', {'check_run': {'id': 7, 'status': 'completed',
+                                                                'conclusion': 'failure'}}).status_code, 202)
+        self.assertIsNone(self.receiver.wait(0.1))
+        # another workflow triggered by the same commit
+        self._post('workflow_run', {'workflow_run': {'check_suite_id': 6, 'head_sha': 'head_sha',
+                                                     'status': 'completed', 'conclusion': 'failure'}})
+        self.assertIsNone(self.receiver.wait(0.1))
+        self._post('workflow_run', {'workflow_run': {'check_suite_id': 5, 'head_sha': 'head_sha',
+                                                     'status': 'completed', 'conclusion': 'success'}})
+        self.assertEqual(self.receiver.wait(1), ('completed', 'success'))
+
+    def test_unsigned_event_is_rejected(self):
+        response = self._post('check_run', {'check_run': {'id': 42, 'status': 'completed', 'conclusion': 'success'}},
+                              secret='wrong_secret')
+        self.assertEqual(response.status_code, 401)
+        self.assertIsNone(self.receiver.wait(0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
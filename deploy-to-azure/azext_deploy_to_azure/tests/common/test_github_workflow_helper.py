@@ -0,0 +1,50 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import unittest
+try:
+    # Attempt to load mock (works on Python 3.3 and above)
+    from unittest.mock import patch
+except ImportError:
+    # Attempt to load mock (works on Python version below 3.3)
+    from mock import patch
+from azext_deploy_to_azure.dev.common.github_workflow_helper import poll_workflow_status
+
+
+class _Clock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now = self.now + seconds
+
+
+class TestGithubWorkflowHelperMethods(unittest.TestCase):
+
+    @patch('azext_deploy_to_azure.dev.common.github_workflow_helper.get_github_client')
+    @patch('azext_deploy_to_azure.dev.common.github_workflow_helper.get_check_run_status_and_conclusion')
+    def test_poll_backs_off_until_the_check_run_completes(self, mock_get_status, _):
+        clock = _Clock()
+        poll_times = []
+
+        def _get_status(repo_name, check_run_id):
+            poll_times.append(clock.now)
+            if len(poll_times) < 8:
+                return 'in_progress', None
+            return 'completed', 'success'
+        mock_get_status.side_effect = _get_status
+
+        with patch('time.time', clock.time), patch('time.sleep', clock.sleep):
+            poll_workflow_status('org/repo', 42, max_poll_interval=10)
+
+        intervals = [round(later - earlier) for earlier, later in zip(poll_times, poll_times[1:])]
+        self.assertEqual(intervals, [2, 4, 8, 10, 10, 10, 10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import unittest
+try:
+    # Attempt to load mock (works on Python 3.3 and above)
+    from unittest.mock import patch, MagicMock
+except ImportError:
+    # Attempt to load mock (works on Python version below 3.3)
+    from mock import patch, MagicMock
+from knack.util import CLIError
+from azext_deploy_to_azure.dev.common.kubectl import get_service_endpoints
+
+
+def _service(name, ports, ingress=None):
+    return {
+        'metadata': {'name': name},
+        'spec': {'type': 'LoadBalancer', 'ports': [{'port': port} for port in ports]},
+        'status': {'loadBalancer': {'ingress': ingress} if ingress else {}}
+    }
+
+
+class TestKubectlMethods(unittest.TestCase):
+
+    @patch('azext_deploy_to_azure.dev.common.kubectl.subprocess.Popen')
+    @patch('azext_deploy_to_azure.dev.common.kubectl.subprocess.check_output')
+    @patch('azext_deploy_to_azure.dev.common.kubectl.which', return_value=True)
+    def test_watch_returns_once_every_service_has_an_address(self, _, mock_check_output, mock_popen):
+        mock_check_output.return_value = json.dumps({'items': [
+            _service('release-python', [80]),
+            _service('release-admin', [8080, 8443]),
+            _service('other-python', [80])
+        ]})
+        events = [_service('release-python', [80], [{'ip': '10.0.0.1'}]),
+                  _service('release-admin', [8080, 8443], [{'hostname': 'admin.example.com'}]),
+                  _service('release-python', [80])]
+        stream = ''.join(json.dumps(event, indent=4) + '\n' for event in events)
+        mock_popen.return_value.__enter__.return_value = mock_popen.return_value
+        mock_popen.return_value.stdout = iter(stream.splitlines(True))
+        mock_popen.return_value.poll.return_value = None
+        mock_popen.return_value.returncode = 0
+
+        endpoints = get_service_endpoints('release', timeout=5)
+
+        self.assertEqual(endpoints, {'release-python': ('10.0.0.1', [80]),
+                                     'release-admin': ('admin.example.com', [8080, 8443])})
+        mock_popen.return_value.kill.assert_called_once()
+
+    @patch('azext_deploy_to_azure.dev.common.kubectl.subprocess')
+    @patch('azext_deploy_to_azure.dev.common.kubectl.which', return_value=False)
+    def test_watch_through_api_server_client(self, _, mock_subprocess):
+        client = MagicMock()
+        client.list_services.return_value = {'metadata': {'resourceVersion': '42'},
+                                             'items': [_service('release-python', [80])]}
+        client.watch_services.return_value = (event for event in
+                                              [_service('release-python', [80], [{'ip': '10.0.0.1'}])])
+
+        endpoints = get_service_endpoints('release', timeout=5, client=client)
+
+        self.assertEqual(endpoints, {'release-python': ('10.0.0.1', [80])})
+        client.watch_services.assert_called_once_with(resource_version='42', timeout=5)
+        self.assertFalse(mock_subprocess.method_calls)
+
+    @patch('azext_deploy_to_azure.dev.common.kubectl.which', return_value=False)
+    def test_release_without_load_balancer_fails_without_watching(self, _):
+        client = MagicMock()
+        client.list_services.return_value = {'metadata': {'resourceVersion': '42'},
+                                             'items': [_service('other-python', [80])]}
+
+        with self.assertRaises(CLIError):
+            get_service_endpoints('release', timeout=5, client=client)
+
+        client.watch_services.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import ssl
+import json
+import base64
+import unittest
+try:
+    # Attempt to load mock (works on Python 3.3 and above)
+    from unittest.mock import patch, MagicMock
+except ImportError:
+    # Attempt to load mock (works on Python version below 3.3)
+    from mock import patch, MagicMock
+from knack.util import CLIError
+from azext_deploy_to_azure.dev.common.kubernetes_client import KubernetesClient, _SSLContextAdapter
+
+
+def _encode(value):
+    return base64.b64encode(value.encode('ascii')).decode('ascii')
+
+
+def _kubeconfig(user):
+    return {
+        'current-context': 'aks1',
+        'contexts': [{'name': 'other', 'context': {'cluster': 'other', 'user': 'other'}},
+                     {'name': 'aks1', 'context': {'cluster': 'aks1', 'user': 'clusterUser'}}],
+        'clusters': [{'name': 'aks1', 'cluster': {'server': 'https://aks1.hcp.eastus.azmk8s.io:443/',
+                                                  'certificate-authority-data': _encode('ca')}}],
+        'users': [{'name': 'clusterUser', 'user': user}]
+    }
+
+
+def _watch_response(events):
+    response = MagicMock()
+    response.status_code = 200
+    response.iter_lines.return_value = [json.dumps(event).encode('utf-8') if event else b'' for event in events]
+    return response
+
+
+@patch('azext_deploy_to_azure.dev.common.kubernetes_client.ssl.create_default_context')
+class TestKubernetesClientFromKubeconfig(unittest.TestCase):
+
+    def test_token_authenticates_the_client(self, mock_create_context):
+        mock_create_context.return_value = ssl.create_default_context()
+        with patch('ssl.SSLContext.load_cert_chain') as mock_load_cert_chain:
+            client = KubernetesClient.from_kubeconfig(_kubeconfig({'token': 'token',
+                                                                   'client-certificate-data': _encode('cert'),
+                                                                   'client-key-data': _encode('key')}))
+
+        self.assertEqual(client.server, 'https://aks1.hcp.eastus.azmk8s.io:443')
+        mock_create_context.assert_called_with(cadata='ca')
+        self.assertEqual(client._session.headers['Authorization'], 'Bearer token')
+        mock_load_cert_chain.assert_not_called()
+        client.close()
+
+    def test_client_certificate_user_is_left_to_kubectl(self, mock_create_context):
+        client = KubernetesClient.from_kubeconfig(_kubeconfig({'client-certificate-data': _encode('cert'),
+                                                               'client-key-data': _encode('key')}))
+
+        self.assertIsNone(client)
+        mock_create_context.assert_not_called()
+
+    def test_plugin_user_is_left_to_kubectl(self, mock_create_context):
+        client = KubernetesClient.from_kubeconfig(_kubeconfig({'exec': {'command': 'kubelogin'}}))
+
+        self.assertIsNone(client)
+        mock_create_context.assert_not_called()
+
+
+class TestKubernetesClientMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.client = KubernetesClient('https://server/', ssl.create_default_context(), token='token')
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_only_the_cluster_certificate_authority_is_trusted(self):
+        conn = MagicMock()
+        _SSLContextAdapter(ssl.create_default_context()).cert_verify(conn, 'https://server', True, None)
+
+        self.assertIsNone(conn.ca_certs)
+        self.assertIsNone(conn.ca_cert_dir)
+
+    def test_watch_yields_the_services_of_each_event(self):
+        service = {'metadata': {'name': 'release-python'}}
+        response = _watch_response([{'type': 'ADDED', 'object': service}, None,
+                                    {'type': 'MODIFIED', 'object': service}])
+        with patch.object(self.client._session, 'get', return_value=response) as mock_get:
+            services = list(self.client.watch_services(resource_version='42', timeout=5))
+
+        self.assertEqual(services, [service, service])
+        self.assertEqual(mock_get.call_args[0][0], 'https://server/api/v1/namespaces/default/services')
+        self.assertEqual(mock_get.call_args[1]['params'],
+                         {'watch': 'true', 'resourceVersion': '42', 'timeoutSeconds': 5})
+        response.close.assert_called_once()
+
+    def test_watch_error_event_raises(self):
+        response = _watch_response([{'type': 'ERROR', 'object': {'message': 'too old resource version'}}])
+        with patch.object(self.client._session, 'get', return_value=response):
+            with self.assertRaises(CLIError):
+                list(self.client.watch_services(resource_version='42', timeout=5))
+
+        response.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import unittest
+from azext_deploy_to_azure.dev.resources import language_packs
+
+
+class TestLanguagePacksMethods(unittest.TestCase):
+
+    def test_manifest_matches_packs(self):
+        packs_path = os.path.join(os.path.dirname(os.path.abspath(language_packs.__file__)),
+                                  language_packs.PACKS_DIRECTORY)
+
+        # run python azext_deploy_to_azure/dev/resources/language_packs.py to regenerate it after changing a pack
+        self.assertEqual(language_packs.load_manifest(), language_packs.build_manifest(packs_path))
+        for language in ('Java', 'JavaScript', 'Python'):
+            roles = [entry['role'] for entry in language_packs.get_pack_files(language)]
+            self.assertEqual(sorted(set(roles)), sorted([language_packs.DOCKERFILE_ROLE,
+                                                         language_packs.DOCKERIGNORE_ROLE,
+                                                         language_packs.CHART_ROLE, language_packs.VALUES_ROLE]))
+
+
+if __name__ == '__main__':
+    unittest.main()
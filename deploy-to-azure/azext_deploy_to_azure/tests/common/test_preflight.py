@@ -0,0 +1,82 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+try:
+    # Attempt to load mock (works on Python 3.3 and above)
+    from unittest.mock import patch
+except ImportError:
+    # Attempt to load mock (works on Python version below 3.3)
+    from mock import patch
+from azext_deploy_to_azure.dev.common.preflight import run_repo_preflight
+
+
+class _FakeGraphQLHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.requests.append((self.command, self.path, request))
+        repository = {
+            'defaultBranchRef': {'name': 'main'},
+            'languages': {'edges': [{'size': 300, 'node': {'name': 'Python'}},
+                                    {'size': 10, 'node': {'name': 'Dockerfile'}}]},
+        }
+        for name, value in request['variables'].items():
+            if name.startswith('file'):
+                repository[name] = {'oid': 'blob_sha'} if value == 'HEAD:Dockerfile' else None
+        body = json.dumps({'data': {'repository': repository}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.requests.append((self.command, self.path, None))
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class TestPreflightMethods(unittest.TestCase):
+
+    def setUp(self):
+        _FakeGraphQLHandler.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeGraphQLHandler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.graphql_url = 'http://127.0.0.1:{}/graphql'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @patch.dict(os.environ, {'GITHUB_PAT': 'test_token'})
+    def test_repository_discovery_takes_single_request(self):
+        with patch('azext_deploy_to_azure.dev.common.github_graphql.GITHUB_GRAPHQL_URL', self.graphql_url):
+            repo_context = run_repo_preflight('org/repo', file_paths=['.github/workflows/main.yml', 'Dockerfile'])
+
+        self.assertEqual(len(_FakeGraphQLHandler.requests), 1)
+        self.assertEqual(_FakeGraphQLHandler.requests[0][:2], ('POST', '/graphql'))
+        self.assertEqual(list(repo_context.languages.keys()), ['Python', 'Dockerfile'])
+        self.assertEqual(repo_context.default_branch, 'main')
+        self.assertFalse(repo_context.file_exists('.github/workflows/main.yml'))
+        self.assertTrue(repo_context.file_exists('Dockerfile'))
+        self.assertEqual(len(_FakeGraphQLHandler.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
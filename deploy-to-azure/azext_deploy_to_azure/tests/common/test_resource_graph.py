@@ -0,0 +1,52 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import unittest
+try:
+    # Attempt to load mock (works on Python 3.3 and above)
+    from unittest.mock import patch, MagicMock
+except ImportError:
+    # Attempt to load mock (works on Python version below 3.3)
+    from mock import patch, MagicMock
+from azext_deploy_to_azure.dev.common.resource_graph import (query_resources, AKS_RESOURCE_TYPE, ACR_RESOURCE_TYPE,
+                                                             GROUP_RESOURCE_TYPE)
+
+
+def _page(data, skip_token=None):
+    response = MagicMock()
+    response.json.return_value = {'data': data, '$skipToken': skip_token}
+    return response
+
+
+class TestResourceGraphMethods(unittest.TestCase):
+
+    @patch('azure.cli.core.get_default_cli')
+    @patch('azure.cli.core.util.send_raw_request')
+    def test_single_query_pages_through_results(self, mock_send_raw_request, _mock_get_default_cli):
+        mock_send_raw_request.side_effect = [
+            _page([{'name': 'aks1', 'type': AKS_RESOURCE_TYPE, 'resourceGroup': 'Group'}], skip_token='page2'),
+            _page([{'name': 'group', 'type': GROUP_RESOURCE_TYPE, 'resourceGroup': 'group'}])
+        ]
+
+        resources = query_resources('subscription_id', [AKS_RESOURCE_TYPE, ACR_RESOURCE_TYPE, GROUP_RESOURCE_TYPE],
+                                    names={ACR_RESOURCE_TYPE: 'registry'})
+
+        self.assertEqual([resource['name'] for resource in resources[AKS_RESOURCE_TYPE]], ['aks1'])
+        self.assertEqual(resources[ACR_RESOURCE_TYPE], [])
+        self.assertEqual([resource['name'] for resource in resources[GROUP_RESOURCE_TYPE]], ['group'])
+        self.assertEqual(mock_send_raw_request.call_count, 2)
+        first_request = json.loads(mock_send_raw_request.call_args_list[0][1]['body'])
+        second_request = json.loads(mock_send_raw_request.call_args_list[1][1]['body'])
+        self.assertEqual(first_request['subscriptions'], ['subscription_id'])
+        self.assertIn("type =~ '{}' and name =~ 'registry'".format(ACR_RESOURCE_TYPE), first_request['query'])
+        self.assertIn('| project ', first_request['query'])
+        self.assertIn('ResourceContainers', first_request['query'])
+        self.assertNotIn('$skipToken', first_request['options'])
+        self.assertEqual(second_request['options']['$skipToken'], 'page2')
+
+
+if __name__ == '__main__':
+    unittest.main()
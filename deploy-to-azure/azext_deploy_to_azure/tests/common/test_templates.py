@@ -0,0 +1,28 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import unittest
+from azext_deploy_to_azure.dev.common.const import (ACR_PLACEHOLDER, APP_NAME_PLACEHOLDER,
+                                                    FUNCTIONAPP_NAME_PLACEHOLDER, PORT_NUMBER_PLACEHOLDER)
+from azext_deploy_to_azure.dev.common.templates import compile_template, render_template
+
+
+class TestTemplatesMethods(unittest.TestCase):
+
+    def test_placeholders_are_rendered_in_one_pass(self):
+        text = 'image: {}.azurecr.io/{}\npackage: target/{}\nport: {}'.format(
+            ACR_PLACEHOLDER, APP_NAME_PLACEHOLDER, FUNCTIONAPP_NAME_PLACEHOLDER, PORT_NUMBER_PLACEHOLDER)
+
+        rendered = render_template(text, {ACR_PLACEHOLDER: 'registry' + APP_NAME_PLACEHOLDER,
+                                          APP_NAME_PLACEHOLDER: 'app',
+                                          FUNCTIONAPP_NAME_PLACEHOLDER: 'functions'})
+
+        self.assertEqual(rendered, 'image: registry{}.azurecr.io/app\npackage: target/functions\nport: {}'.format(
+            APP_NAME_PLACEHOLDER, PORT_NUMBER_PLACEHOLDER))
+        self.assertIs(compile_template(text), compile_template(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,7 @@ import os
 import re
 from codecs import open
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 
 NAME = 'deploy-to-azure'
 
@@ -33,15 +34,34 @@ CLASSIFIERS = [
     'Intended Audience :: Developers',
     'Intended Audience :: System Administrators',
     'Programming Language :: Python',
-    'Programming Language :: Python :: 2',
-    'Programming Language :: Python :: 2.7',
     'Programming Language :: Python :: 3',
-    'Programming Language :: Python :: 3.4',
-    'Programming Language :: Python :: 3.5',
-    'Programming Language :: Python :: 3.6',
+    'Programming Language :: Python :: 3 :: Only',
+    'Programming Language :: Python :: 3.9',
+    'Programming Language :: Python :: 3.10',
+    'Programming Language :: Python :: 3.11',
+    'Programming Language :: Python :: 3.12',
     'License :: OSI Approved :: MIT License',
 ]
 
+
+class BuildPyWithPackManifest(build_py):
+    """Regenerates the manifest listing the files of the language packs in the build directory,
+    the manifest checked in the source tree is left as it is."""
+
+    def run(self):
+        import importlib.util
+        build_py.run(self)
+        resources_path = os.path.join('azext_deploy_to_azure', 'dev', 'resources')
+        spec = importlib.util.spec_from_file_location('language_packs',
+                                                      os.path.join(resources_path, 'language_packs.py'))
+        language_packs = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(language_packs)
+        packs_path = os.path.join(resources_path, language_packs.PACKS_DIRECTORY)
+        target_path = os.path.join(self.build_lib, packs_path)
+        self.mkpath(target_path)
+        language_packs.write_manifest(packs_path, target_path=target_path)
+
+
 with open('README.rst', 'r', encoding='utf-8') as f:
     README = f.read()
 with open('HISTORY.rst', 'r', encoding='utf-8') as f:
@@ -60,5 +80,7 @@ setup(
     package_data={'azext_deploy_to_azure': ['azext_metadata.json']},
     packages=find_packages(exclude=["*.test", "*.test.*", "test.*", "test"]),
     include_package_data=True,
+    cmdclass={'build_py': BuildPyWithPackManifest},
+    python_requires='>=3.9',
     install_requires=REQUIRES
 )
@@ -0,0 +1,52 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""Compares the wall time of Azure resource lookups made through `az ... -o json` subprocesses
+with the same lookups made in process through azure-cli-core.
+
+Needs a logged in az and the extension importable, e.g. after `pip install -e deploy-to-azure`:
+
+    python scripts/benchmark_az_lookups.py --runs 3
+"""
+
+import argparse
+import json
+import subprocess
+import time
+
+from azext_deploy_to_azure.dev.common.azure_cli_resources import invoke_az_command
+
+LOOKUPS = [
+    ['group', 'list'],
+    ['aks', 'list'],
+    ['acr', 'list'],
+    ['functionapp', 'list'],
+]
+
+
+def _time_call(func, args):
+    start = time.perf_counter()
+    func(args)
+    return time.perf_counter() - start
+
+
+def _subprocess_lookup(args):
+    return json.loads(subprocess.check_output(['az'] + args + ['-o', 'json']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help='Number of timed runs per lookup.')
+    runs = parser.parse_args().runs
+
+    print('{:<20} {:>14} {:>14}'.format('lookup', 'subprocess (s)', 'in-process (s)'))
+    for args in LOOKUPS:
+        subprocess_times = [_time_call(_subprocess_lookup, args) for _ in range(runs)]
+        in_process_times = [_time_call(invoke_az_command, args) for _ in range(runs)]
+        print('{:<20} {:>14.2f} {:>14.2f}'.format(' '.join(args), min(subprocess_times), min(in_process_times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""Compares the peak RSS of uploading files of growing size, with the content embedded in a JSON
+document against a file backed Files committed by commit_files_to_github_branch, which streams the blob.
+
+Each measurement runs in a fresh process and nothing is sent to GitHub, a fake client consumes the
+request bodies as a socket would. Linux and macOS only, the extension must be importable, e.g. after
+`pip install -e deploy-to-azure`:
+
+    python scripts/benchmark_blob_upload_memory.py --sizes 1 16 64
+"""
+
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+
+from azext_deploy_to_azure.dev.common.github_api_helper import Files, commit_files_to_github_branch
+
+_WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024.0 / (1024.0 if sys.platform == 'darwin' else 1.0)
+
+
+def _in_memory_body(path):
+    with open(path, 'rb') as source:
+        content = source.read()
+    body = json.dumps({'content': base64.b64encode(content).decode('ascii'), 'encoding': 'base64'})
+    return len(body.encode('utf-8'))
+
+
+class _Response():
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.reason = 'OK'
+        self.text = json.dumps(body)
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class _FakeGithubClient():
+    """ Answers the requests of a commit to a branch with an empty tree, counting the blob bytes sent.
+    """
+    def __init__(self):
+        self.blob_bytes = 0
+
+    def cached_get(self, url, **kwargs):
+        return _Response(200, {'ref': 'refs/heads/master', 'object': {'sha': 'base_commit'}})
+
+    def get(self, url, **kwargs):
+        if '/git/trees/' in url:
+            return _Response(200, {'tree': [], 'truncated': False})
+        return _Response(200, {'sha': 'base_commit', 'tree': {'sha': 'base_tree'}})
+
+    def post(self, url, data=None, **kwargs):
+        if data is not None:
+            # the chunks are dropped as a socket would consume them
+            self.blob_bytes = self.blob_bytes + sum(len(chunk) for chunk in data)
+        return _Response(201, {'sha': 'sha'})
+
+    def patch(self, url, **kwargs):
+        return _Response(200, {})
+
+
+def _streamed_body(path):
+    client = _FakeGithubClient()
+    with patch('azext_deploy_to_azure.dev.common.github_api_helper.get_github_client', return_value=client):
+        commit_files_to_github_branch([Files(path='charts/app.tgz', source=path)], 'org/repo', 'master', 'benchmark')
+    return client.blob_bytes
+
+
+def _measure(mode, path):
+    body_size = _in_memory_body(path) if mode == 'in-memory' else _streamed_body(path)
+    print('{} {:.1f}'.format(body_size, _peak_rss_mb()))
+
+
+def _write_file(path, size_mb):
+    with open(path, 'wb') as target:
+        for _ in range(size_mb):
+            target.write(os.urandom(_WRITE_CHUNK_SIZE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 16, 64], help='File sizes in MB.')
+    parser.add_argument('--measure', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        _measure(*args.measure)
+        return
+
+    print('{:>10} {:>16} {:>16}'.format('size (MB)', 'in-memory (MB)', 'streamed (MB)'))
+    for size_mb in args.sizes:
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            _write_file(path, size_mb)
+            peaks = []
+            for mode in ('in-memory', 'streamed'):
+                output = subprocess.check_output([sys.executable, __file__, '--measure', mode, path])
+                peaks.append(float(output.split()[1]))
+            print('{:>10} {:>16.1f} {:>16.1f}'.format(size_mb, peaks[0], peaks[1]))
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
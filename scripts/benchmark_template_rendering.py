@@ -0,0 +1,61 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+"""Compares rendering every workflow template and language pack file with chained str.replace calls
+against rendering the compiled templates in a single pass.
+
+Needs the extension importable, e.g. after `pip install -e deploy-to-azure`:
+
+    python scripts/benchmark_template_rendering.py --runs 1000
+"""
+
+import argparse
+import os
+import timeit
+
+from azext_deploy_to_azure.dev.common.templates import PLACEHOLDERS, compile_template
+from azext_deploy_to_azure.dev.resources import resourcefiles
+
+PACKS_PATH = os.path.join(os.path.dirname(os.path.abspath(resourcefiles.__file__)), 'packs')
+VALUES = {placeholder: 'value_{}'.format(index) for index, placeholder in enumerate(PLACEHOLDERS)}
+
+
+def _load_templates():
+    templates = [value for name, value in vars(resourcefiles).items() if name.endswith('_TEMPLATE')]
+    for root, _, files in os.walk(PACKS_PATH):
+        for file_name in files:
+            with open(os.path.join(root, file_name)) as template_file:
+                templates.append(template_file.read())
+    return templates
+
+
+def _render_with_replace(templates):
+    for text in templates:
+        for placeholder, value in VALUES.items():
+            text = text.replace(placeholder, value)
+
+
+def _render_compiled(templates):
+    for text in templates:
+        compile_template(text).render(VALUES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=1000, help='Number of renderings of all the templates.')
+    runs = parser.parse_args().runs
+
+    templates = _load_templates()
+    print('{} templates, {} characters'.format(len(templates), sum(len(text) for text in templates)))
+    first_compile = timeit.timeit(lambda: _render_compiled(templates), number=1)
+    print('{:<20} {:>12}'.format('renderer', 'per run (us)'))
+    for name, func in [('str.replace chain', _render_with_replace), ('compiled', _render_compiled)]:
+        elapsed = timeit.timeit(lambda func=func: func(templates), number=runs)
+        print('{:<20} {:>12.1f}'.format(name, elapsed / runs * 1e6))
+    print('{:<20} {:>12.1f}'.format('first compile', first_compile * 1e6))
+
+
+if __name__ == '__main__':
+    main()